@@ -0,0 +1,99 @@
+"""
+Comprobación de regresión del plan de consulta de las líneas vigentes de una receta.
+
+Crea el esquema completo en un esquema temporal, lo llena con `--filas` líneas de cant_ing
+(1.000.000 por defecto, que el trigger resume en cant_ing_actual), ejecuta EXPLAIN sobre
+`CURRENT_LINES_SQL` y falla si las líneas se recorren secuencialmente en vez de por índice. Todo ocurre en una transacción que se revierte,
+por lo que la base de datos queda intacta.
+
+Uso (desde la carpeta Turing):
+    python -m benchmarks.explain_cant_ing [--filas 1000000]
+"""
+import argparse
+import json
+import sys
+
+from psycopg2 import sql
+
+from data.data_injection import migrations
+from data.db import CURRENT_LINES_SQL, get_db
+
+SCHEMA = "bench_explain"
+INDEX_NODES = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+
+def seed(cur, filas, ingredientes=1000, recetas=2000, schema=SCHEMA):
+    """
+    Crea el esquema en `schema` y genera datos sintéticos.
+
+    Args:
+        cur (psycopg2.cursor): Cursor dentro de la transacción de la comprobación.
+        filas (int): Líneas de cant_ing a generar.
+        ingredientes (int): Ingredientes a generar.
+        recetas (int): Recetas a generar.
+        schema (str): Esquema donde se crean las tablas; queda como search_path de la transacción.
+    """
+    cur.execute(sql.SQL("CREATE SCHEMA {0}; SET LOCAL search_path TO {0}").format(sql.Identifier(schema)))
+    for migration in migrations:
+        for statement in migration["sql"]:
+            cur.execute(statement)
+    cur.execute("""
+        INSERT INTO ingredientes (nombre, cantidad, kg_gr, precio)
+        SELECT 'ing' || g, 1000, 'gr', random() FROM generate_series(1, %s) g
+    """, (ingredientes,))
+    cur.execute("""
+        INSERT INTO receta (nombre, porcentaje_venta, precio_venta, unidades_x_receta, cantidad_Receta, cant_x_paquete)
+        SELECT 'receta' || g, 30, 1, 10, 1, 1 FROM generate_series(1, %s) g
+    """, (recetas,))
+    cur.execute("""
+        INSERT INTO cant_ing (id_ingrediente, id_receta, cantidad, precio, created_at)
+        SELECT 1 + (random() * (%s - 1))::int, 1 + (random() * (%s - 1))::int, random() * 500, random(),
+               now() - random() * interval '365 days'
+        FROM generate_series(1, %s)
+    """, (ingredientes, recetas, filas))
+    cur.execute("ANALYZE ingredientes; ANALYZE receta; ANALYZE cant_ing; ANALYZE cant_ing_actual")
+
+
+def scan_nodes(plan):
+    """
+    Recorre el árbol del plan y devuelve los nodos que leen las líneas de receta.
+
+    Args:
+        plan (dict): Nodo del plan en formato JSON de EXPLAIN.
+
+    Returns:
+        list: Tuplas (tipo de nodo, nombre del índice o None).
+    """
+    found = []
+    if plan.get("Relation Name", "").startswith("cant_ing") or plan.get("Index Name", "").startswith("cant_ing"):
+        found.append((plan["Node Type"], plan.get("Index Name")))
+    for child in plan.get("Plans", []):
+        found.extend(scan_nodes(child))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    db = get_db()
+    with db.pool.connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                seed(cur, args.filas)
+                cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + CURRENT_LINES_SQL, (42,))
+                plan = cur.fetchone()[0][0]
+        finally:
+            conn.rollback()
+
+    nodes = scan_nodes(plan["Plan"])
+    print(json.dumps({"filas": args.filas, "tiempo_ms": plan["Execution Time"], "nodos": nodes}))
+    if not any(node in INDEX_NODES for node, _ in nodes) or any(node == "Seq Scan" for node, _ in nodes):
+        print("REGRESION: las lineas de receta no se leen por indice", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Comprobación de escalado lineal del armado de líneas de receta.
+
+Mide `armar_lineas` más `Cant_ing_x_receta.total_ing_costo` sobre planillas de tamaño creciente
+(con un catálogo igual de grande) y falla si el tiempo por línea de la planilla más grande supera
+en más de `--tolerancia` veces al de la más chica, que es lo que ocurre con un armado cuadrático.
+No usa la base de datos.
+
+Uso (desde la carpeta Turing):
+    python -m benchmarks.lineas_receta [--tamanos 100 200 400 800 1600 3200] [--tolerancia 2]
+"""
+import argparse
+import json
+import sys
+import time
+
+from hooks.cant_ing_receta import Cant_ing_x_receta, armar_lineas
+
+
+def catalogo_sintetico(n):
+    """
+    Genera un catálogo de `n` ingredientes con la forma de `Cantidad_Ing.select_option_updated_date`.
+
+    Args:
+        n (int): Número de ingredientes.
+
+    Returns:
+        list: Tuplas (id, fecha, nombre, cantidad, kg_gr, precio).
+    """
+    return [(i, None, f"ing{i}", 1000, "gr", 0.001 * (i % 97 + 1)) for i in range(1, n + 1)]
+
+
+def medir(n, repeticiones=5):
+    """
+    Mide el mejor tiempo de armar y costear una planilla de `n` líneas.
+
+    Args:
+        n (int): Líneas de la planilla y tamaño del catálogo.
+        repeticiones (int): Repeticiones; se toma la más rápida.
+
+    Returns:
+        float: Segundos.
+    """
+    catalogo = catalogo_sintetico(n)
+    cantidades = {str(item[0]): str(10 + item[0] % 50) for item in catalogo}
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        lineas = armar_lineas(cantidades, catalogo, 1)
+        Cant_ing_x_receta(lineas).total_ing_costo
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[100, 200, 400, 800, 1600, 3200])
+    parser.add_argument("--tolerancia", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    tamanos = sorted(args.tamanos)
+    tiempos = {n: medir(n) for n in tamanos}
+    por_linea = {n: tiempos[n] / n * 1e6 for n in tamanos}
+    razon = por_linea[tamanos[-1]] / por_linea[tamanos[0]]
+    print(json.dumps({"us_por_linea": por_linea, "razon": razon}))
+    if razon > args.tolerancia:
+        print("REGRESION: el armado de lineas no escala en forma lineal", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
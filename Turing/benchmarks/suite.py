@@ -0,0 +1,231 @@
+"""
+Suite de benchmarks de la capa de datos y del costeo.
+
+Para cada tamaño (1.000, 10.000 y 100.000 ingredientes y líneas de receta por defecto) crea el
+esquema completo en un esquema temporal, lo llena con datos sintéticos y mide las operaciones de
+`PostgresDatabaseManager`, el costeo de `Receta` y `Cant_ing_x_receta` y el armado de filas de las
+pantallas. Todo ocurre en una transacción por tamaño que se revierte, por lo que la base de datos
+queda intacta. Los resultados se escriben en JSON y, si hay una línea base guardada, se marca como
+regresión cada medición cuya mediana la supere en más de `--tolerancia`.
+
+Uso (desde la carpeta Turing):
+    python -m benchmarks.suite [--tamanos 1000 10000 100000] [--salida resultados.json]
+                               [--base benchmarks/baseline.json] [--guardar-base]
+                               [--tolerancia 0.25] [--margen-ms 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import flet as ft
+
+from benchmarks.explain_cant_ing import seed
+from components.keyed_table import Keyed_Table
+from data.db import PostgresDatabaseManager
+from hooks.cant_ing_receta import Cant_ing_x_receta, armar_lineas
+from hooks.receta import Receta
+
+SCHEMA = "bench_suite"
+BASE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class _Rollback(Exception):
+    """Se lanza al final de cada tamaño para revertir su transacción."""
+
+
+def medir(funcion, repeticiones, calentamiento=3):
+    """
+    Ejecuta `funcion(i)` `repeticiones` veces, tras `calentamiento` ejecuciones que no se cuentan
+    (preparación de sentencias, cachés del servidor), y resume los tiempos.
+
+    Args:
+        funcion (callable): Recibe el número de repetición.
+        repeticiones (int): Veces que se mide.
+        calentamiento (int): Ejecuciones previas descartadas.
+
+    Returns:
+        dict: 'n', 'mediana_ms', 'p95_ms' y 'min_ms'.
+    """
+    for i in range(calentamiento):
+        funcion(-1 - i)
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "n": repeticiones,
+        "mediana_ms": statistics.median(tiempos),
+        "p95_ms": tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))],
+        "min_ms": tiempos[0],
+    }
+
+
+def escenarios(db, tamano, repeticiones):
+    """
+    Mide cada operación sobre el esquema ya sembrado.
+
+    Args:
+        db (PostgresDatabaseManager): Gestor dentro de la transacción del tamaño.
+        tamano (int): Ingredientes y líneas sembrados.
+        repeticiones (int): Repeticiones de las operaciones de una fila.
+
+    Returns:
+        dict: Resultado de `medir` por escenario.
+    """
+    # Las operaciones sobre todo el catálogo se repiten menos.
+    pocas = max(10, repeticiones // 20)
+    ingredientes = db.selection("ingredientes")
+    recetas = db.selection("receta")
+    ids_ing = [r[0] for r in ingredientes]
+    ids_rec = [r[0] for r in recetas]
+    catalogo = [(i, f_u, n, c, p, kg) for (i, f, f_u, n, c, p, kg) in ingredientes]
+    cantidades = {str(item[0]): "10" for item in catalogo}
+    tabla = Keyed_Table(columns=[ft.DataColumn(label=ft.Text(c)) for c in ("id", "fecha", "nombre", "cantidad", "kg_gr", "precio")])
+    paginas = [None]
+
+    def pagina(i):
+        # Como `Form_Ingrediente.show_data`: página por clave, tuplas sin `created_at` y reconciliación.
+        filas, siguiente = db.selection_page("ingredientes", after=paginas[i % len(paginas)], page_size=50)
+        if siguiente is not None and len(paginas) < 20:
+            paginas.append(siguiente)
+        tabla.sync([(i, f_u, n, c, p, kg) for (i, f, f_u, n, c, p, kg) in filas])
+
+    def recetas_pantalla(i):
+        # Como `Receta_Frame.show_data`: página de recetas y su desglose de costo calculado en el servidor.
+        filas, _ = db.selection_page("receta", page_size=50)
+        datos = [(i, f_u, n, p_v, p, und, c_r, c_p, c) for (i, f, f_u, n, p_v, p, und, c_r, c_p, c) in filas]
+        db.costo_recetas([d[0] for d in datos])
+
+    return {
+        "insert_1000": medir(lambda i: db.insert("ingredientes", [
+            {"nombre": f"nuevo_{i}_{j}", "cantidad": 1000, "kg_gr": "gr", "precio": 0.01} for j in range(1000)
+        ]), pocas),
+        "selection_todo": medir(lambda i: db.selection("ingredientes"), pocas),
+        "selection_id": medir(
+            lambda i: db.selection("receta", "WHERE id = %s", param=[ids_rec[i % len(ids_rec)]]), repeticiones
+        ),
+        "selection_lineas": medir(lambda i: db.selection("cant_ing", ids_rec[i % len(ids_rec)], True), repeticiones),
+        "update_ingrediente": medir(
+            lambda i: db.update("ingredientes", ids_ing[i % len(ids_ing)], None, {"precio": 0.001 * i}), repeticiones
+        ),
+        "update_receta": medir(lambda i: db.update("receta", ids_rec[i % len(ids_rec)], 1.0 + i), repeticiones),
+        "costo_total_p_receta": medir(
+            lambda i: Receta.from_data(recetas[i % len(recetas)], db=db).costo_total_p_receta, repeticiones
+        ),
+        "total_ing_costo": medir(
+            lambda i: Cant_ing_x_receta(armar_lineas(cantidades, catalogo, 1), db=db).total_ing_costo,
+            pocas
+        ),
+        "costo_recetas_todas": medir(lambda i: db.costo_recetas(), pocas),
+        "show_data_ingredientes": medir(pagina, repeticiones),
+        "show_data_recetas": medir(recetas_pantalla, repeticiones),
+    }
+
+
+def correr(db, tamano, repeticiones):
+    """
+    Siembra un tamaño en una transacción, corre los escenarios y la revierte.
+
+    Args:
+        db (PostgresDatabaseManager): Gestor propio de la suite.
+        tamano (int): Ingredientes y líneas a sembrar.
+        repeticiones (int): Repeticiones de las operaciones de una fila.
+
+    Returns:
+        dict: Resultado por escenario.
+    """
+    resultado = {}
+    try:
+        with db.transaction():
+            with db.cursor() as cur:
+                seed(cur, tamano, ingredientes=tamano, recetas=max(10, tamano // 100), schema=SCHEMA)
+            resultado = escenarios(db, tamano, repeticiones)
+            raise _Rollback
+    except _Rollback:
+        pass
+    return resultado
+
+
+def comparar(actual, base, tolerancia, margen_ms=0.1):
+    """
+    Compara las medianas con la línea base. Una medición es regresión si supera a la base en más
+    de `tolerancia` y además en más de `margen_ms`, para no confundir con ruido las variaciones de
+    las operaciones de fracciones de milisegundo.
+
+    Args:
+        actual (dict): {tamaño: {escenario: medición}} de esta corrida.
+        base (dict): Lo mismo, de la línea base.
+        tolerancia (float): Aumento relativo permitido de la mediana.
+        margen_ms (float): Aumento absoluto permitido de la mediana.
+
+    Returns:
+        list: Regresiones como dicts con tamaño, escenario, base, actual y razón.
+    """
+    regresiones = []
+    for tamano, escenarios_actuales in actual.items():
+        for nombre, medicion in escenarios_actuales.items():
+            anterior = base.get(tamano, {}).get(nombre)
+            if not anterior or anterior["mediana_ms"] <= 0:
+                continue
+            razon = medicion["mediana_ms"] / anterior["mediana_ms"]
+            if razon > 1 + tolerancia and medicion["mediana_ms"] - anterior["mediana_ms"] > margen_ms:
+                regresiones.append({
+                    "tamano": tamano, "escenario": nombre, "base_ms": anterior["mediana_ms"],
+                    "actual_ms": medicion["mediana_ms"], "razon": razon,
+                })
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--salida", help="archivo JSON de resultados; por defecto se escriben en la salida estándar")
+    parser.add_argument("--base", default=BASE, help="línea base con la que se compara")
+    parser.add_argument("--guardar-base", action="store_true", help="guarda esta corrida como línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--margen-ms", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    # Gestor propio: sus sentencias preparadas y su caché no se mezclan con las de la aplicación.
+    db = PostgresDatabaseManager(os.getenv("BENCH_DB", "turing"))
+    resultados = {str(n): correr(db, n, args.repeticiones) for n in args.tamanos}
+    reporte = {
+        "meta": {
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "maquina": platform.node(),
+            "repeticiones": args.repeticiones,
+        },
+        "resultados": resultados,
+        "regresiones": [],
+    }
+    if os.path.exists(args.base) and not args.guardar_base:
+        with open(args.base, encoding="utf-8") as archivo:
+            base = json.load(archivo)["resultados"]
+        reporte["regresiones"] = comparar(resultados, base, args.tolerancia, args.margen_ms)
+
+    texto = json.dumps(reporte, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+    if args.guardar_base:
+        with open(args.base, "w", encoding="utf-8") as archivo:
+            archivo.write(texto)
+
+    for r in reporte["regresiones"]:
+        print(f"REGRESION: {r['escenario']} con {r['tamano']} filas: {r['base_ms']:.3f} ms -> "
+              f"{r['actual_ms']:.3f} ms ({r['razon']:.2f}x)", file=sys.stderr)
+    return 1 if reporte["regresiones"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,39 @@
+import asyncio
+import importlib
+import logging
+import os
+from collections import OrderedDict
 import flet as ft
-from screens.form_ingrediente import Form_Ingrediente
-from screens.cantidad_ing_x_r import Cantidad_Ing
-from data.db import PostgresDatabaseManager
-from screens.receta_frame import Receta_Frame
+from data.async_db import AsyncDatabaseManager
+from data.db import get_db
+from utils.profiling import profiled
+from utils.startup import startup
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class App(ft.Stack):
     """
     Clase principal de la aplicación que gestiona la navegación entre diferentes pantallas y controla la interfaz de usuario.
 
     Atributos:
-        data (PostgresDatabaseManager): Gestor de la base de datos PostgreSQL.
+        data (StorageBackend): Gestor compartido de la base de datos (`get_db`), inyectado en cada pantalla.
+        adb (AsyncDatabaseManager): Fachada asíncrona de `data` para cargar datos sin bloquear la interfaz.
         frame_container (ft.Column): Contenedor que alberga la pantalla actualmente visible.
-        frames (dict): Diccionario que asocia nombres de pantallas con sus respectivas clases.
+        frames (dict): Diccionario que asocia nombres de pantallas con el módulo y la clase que las
+            definen. Cada módulo se importa la primera vez que se muestra su pantalla. "diagnostico"
+            no tiene botón: se abre con Ctrl+Shift+D.
+        frame_cache (OrderedDict): Pantallas ya creadas por nombre, de la menos a la más reciente,
+            hasta FRAME_CACHE_SIZE (4 por defecto). Al volver a una se reutiliza la instancia y sólo
+            se refrescan sus datos (`Base_frame.refresh`).
         current_frame (ft.Page): Instancia de la pantalla actualmente visible.
+        nav_buttons (list): Botones de navegación; quedan deshabilitados hasta que la base de datos
+            está lista.
+        estado (ft.Text): Estado de la conexión mientras no está lista.
+        btn_reintentar (ft.ElevatedButton): Vuelve a intentar la conexión si falló.
+
+    La ventana se pinta sin esperar a la base de datos: la conexión y la revisión del esquema
+    (`init_data`) corren en segundo plano al montarse la aplicación (`conectar`).
 
     """
     def __init__(self, **kwargs):
@@ -23,17 +44,27 @@ class App(ft.Stack):
             **kwargs: Argumentos adicionales para la inicialización.
         """
         super().__init__(**kwargs)
-        self.data = PostgresDatabaseManager("turing")
-        self.data.init_data()
-        
+        self.data = get_db()
+        self.adb = AsyncDatabaseManager(self.data)
+
         self.frame_container = ft.Column()
         self.frames = {
-            "home": Form_Ingrediente,
-            "cant": Cantidad_Ing,
-            "receta": Receta_Frame
+            "home": ("screens.form_ingrediente", "Form_Ingrediente"),
+            "cant": ("screens.cantidad_ing_x_r", "Cantidad_Ing"),
+            "receta": ("screens.receta_frame", "Receta_Frame"),
+            "diagnostico": ("screens.diagnostico", "Diagnostico_Frame")
         }
+        self.frame_cache = OrderedDict()
+        self.frame_cache_size = max(1, int(os.getenv("FRAME_CACHE_SIZE", "4")))
         self.current_frame = None
-        
+        self.nav_buttons = [
+            ft.ElevatedButton(text="Ingredientes", disabled=True, on_click=lambda e: self.show_frame("home")),
+            ft.ElevatedButton(text="Receta", disabled=True, on_click=lambda e: self.show_frame("receta")),
+            ft.ElevatedButton(text="Cantidad_ingredientes", disabled=True, on_click=self.show_cantidades),
+        ]
+        self.estado = ft.Text("Conectando con la base de datos...")
+        self.btn_reintentar = ft.ElevatedButton(text="Reintentar", icon=ft.icons.REFRESH, visible=False, on_click=self.conectar)
+
         self.frame_container.controls.append(
             ft.Container(
                 content=ft.Column(
@@ -66,52 +97,141 @@ class App(ft.Stack):
         """
         return ft.Column(
             controls=[
-                ft.Row(
-                    controls=[
-                        ft.ElevatedButton(text="Ingredientes", on_click=lambda e: self.show_frame("home")),
-                        ft.ElevatedButton(text="Receta", on_click=lambda e: self.show_frame("receta")),
-                        ft.ElevatedButton(text="Cantidad_ingredientes", on_click=lambda e: self.show_frame("cant", self.data.selection("ingredientes"))),
-                    ]
-                ),
+                ft.Row(controls=self.nav_buttons),
+                ft.Row(controls=[self.estado, self.btn_reintentar]),
                 self.frame_container
             ]
         )
 
-    def update_frame(self, frame_class, param=None):
+    def did_mount(self):
+        """
+        Registra el atajo de teclado del panel de diagnóstico al montar la aplicación y lanza la
+        conexión con la base de datos en segundo plano.
+        """
+        self.page.on_keyboard_event = self.on_keyboard
+        self.page.update()
+        self.page.run_task(self.conectar)
+
+    def _abrir_conexion(self):
+        """
+        Abre la primera conexión del gestor (o la toma del pool) sin ejecutar nada más.
+        """
+        with self.data.cursor():
+            pass
+
+    @traced(cat="ui")
+    async def conectar(self, e=None):
+        """
+        Se conecta con la base de datos y lleva el esquema a la última versión fuera del bucle de
+        eventos, mostrando el estado mientras tanto. Al terminar habilita la navegación y emite el
+        reporte de tiempos del arranque; si falla muestra el error y el botón para reintentar.
+        """
+        self.estado.value = "Conectando con la base de datos..."
+        self.estado.visible = True
+        self.btn_reintentar.visible = False
+        self.update()
+        try:
+            with startup.stage("conexion"):
+                await self.adb.run(self._abrir_conexion)
+            with startup.stage("esquema"):
+                await self.adb.run(self.data.init_data)
+        except Exception as ex:
+            logger.exception("no se pudo conectar con la base de datos")
+            self.estado.value = f"Sin conexion con la base de datos: {ex}"
+            self.btn_reintentar.visible = True
+            self.update()
+            return
+        for button in self.nav_buttons:
+            button.disabled = False
+        self.estado.visible = False
+        self.update()
+        startup.milestone("interactiva")
+        startup.report()
+
+    def on_keyboard(self, e: ft.KeyboardEvent):
+        """
+        Abre el panel de diagnóstico con Ctrl+Shift+D.
         """
-        Actualiza el contenedor de la pantalla con una nueva instancia de la clase de pantalla especificada.
+        if e.ctrl and e.shift and e.key.upper() == "D":
+            self.show_frame("diagnostico")
+
+    @profiled()
+    @traced(cat="flet")
+    def update_frame(self, frame):
+        """
+        Reemplaza la pantalla visible por `frame`.
 
         Args:
-            frame_class (type): La clase de pantalla que se mostrará.
-            param (optional): Parámetro opcional que se pasará al inicializar la pantalla. Por defecto es None.
+            frame (Base_frame): Pantalla a mostrar.
 
         Modifica:
             self.frame_container.controls: Limpia el contenedor de la pantalla actual y añade la nueva pantalla.
             self.current_frame: Actualiza la instancia de la pantalla actual.
         """
         self.frame_container.controls.clear()
-        if param is None:
-            self.current_frame = frame_class()
-        else:
-            self.current_frame = frame_class(param)
-        self.frame_container.controls.append(self.current_frame.build())
+        self.current_frame = frame
+        # Se monta el marco mismo, no sólo su contenido, para que reciba did_mount y will_unmount.
+        self.frame_container.controls.append(self.current_frame)
         self.update()
 
-    def show_frame(self, frame_name, param=None):
+    def frame_class(self, frame_name):
         """
-        Muestra la pantalla correspondiente al nombre proporcionado. Si se proporciona un parámetro, lo pasa al inicializar la pantalla.
+        Devuelve la clase de una pantalla, importando su módulo si todavía no se importó.
+
+        Args:
+            frame_name (str): El nombre de la pantalla.
+
+        Returns:
+            type or None: La clase de la pantalla, o None si el nombre no existe.
+        """
+        if frame_name not in self.frames:
+            return None
+        module, name = self.frames[frame_name]
+        return getattr(importlib.import_module(module), name)
+
+    @traced(cat="ui")
+    def show_frame(self, frame_name, param=None, **kwargs):
+        """
+        Muestra la pantalla correspondiente al nombre proporcionado. La primera vez la crea, pasándole
+        el parámetro si se proporciona; las siguientes la toma de `frame_cache` y le pide que refresque
+        sus datos con los mismos argumentos.
 
         Args:
             frame_name (str): El nombre de la pantalla a mostrar.
             param (optional): Parámetro opcional que se pasará al inicializar la pantalla. Por defecto es None.
+            **kwargs: Argumentos con nombre adicionales para la pantalla.
 
         Modifica:
             self.frame_container.controls: Actualiza el contenedor de la pantalla con la pantalla solicitada o muestra un mensaje de error si no se encuentra la pantalla.
+            self.frame_cache: Marca la pantalla como la más reciente y descarta la más antigua si se supera el límite.
         """
-        frame_class = self.frames.get(frame_name)
+        args = () if param is None else (param,)
+        frame = self.frame_cache.pop(frame_name, None)
+        if frame is not None:
+            self.frame_cache[frame_name] = frame
+            self.update_frame(frame)
+            self.page.run_task(frame.refresh, *args, **kwargs)
+            return
+        frame_class = self.frame_class(frame_name)
         if frame_class:
-            self.update_frame(frame_class, param)
+            frame = frame_class(*args, db=self.data, **kwargs)
+            self.frame_cache[frame_name] = frame
+            while len(self.frame_cache) > self.frame_cache_size:
+                self.frame_cache.popitem(last=False)
+            self.update_frame(frame)
         else:
             self.frame_container.controls.clear()
             self.frame_container.controls.append(ft.Text("frame not found"))
             self.update()
+
+    @traced(cat="ui")
+    async def show_cantidades(self, e=None):
+        """
+        Muestra la pantalla de cantidades de ingredientes. Carga a la vez, sin bloquear la interfaz,
+        los ingredientes y las recetas que la pantalla necesita para sus opciones.
+        """
+        ingredientes, recetas = await asyncio.gather(
+            self.adb.selection("ingredientes"),
+            self.adb.selection("receta")
+        )
+        self.show_frame("cant", ingredientes, recetas=recetas)
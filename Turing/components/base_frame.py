@@ -1,5 +1,7 @@
 import flet as ft
 from utils.dialog import Dialog
+from utils.profiling import profiled, profiler
+from utils.tracing import traced
 
 class Base_frame(ft.Container):
     """
@@ -8,8 +10,22 @@ class Base_frame(ft.Container):
     Atributos:
         content (ft.Column): Contenedor principal para los controles y componentes del marco.
         dialog (Dialog or None): Instancia del diálogo de notificación actual o None si no hay ninguno.
+        page_size (int): Filas por página en las tablas paginadas del marco.
+        btn_prev (ft.IconButton): Botón para ir a la página anterior.
+        btn_next (ft.IconButton): Botón para ir a la página siguiente.
+        overlay_controls (list): Controles sin lugar en el marco (selectores de archivos...) que se
+            agregan a `page.overlay` mientras el marco está montado.
+
+    Los manejadores de eventos de las subclases quedan perfilados cuando el perfilado está activo
+    (`utils.profiling`), sin decorarlos.
 
     """
+    page_size = 50
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        profiler.wrap_handlers(cls)
+
     def __init__(self, **kwargs):
         """
         Inicializa la clase `Base_frame`. Configura el contenedor principal y el diálogo.
@@ -20,6 +36,12 @@ class Base_frame(ft.Container):
         super().__init__(**kwargs)
         self.content = ft.Column()
         self.dialog = None
+        self._page_keys = [None]  # Clave de inicio de cada página visitada; None es la primera.
+        self._next_key = None
+        self._loaded = False  # Si la tabla ya se cargó alguna vez (`fetch_page`).
+        self.btn_prev = ft.IconButton(icon=ft.icons.NAVIGATE_BEFORE, disabled=True, on_click=self.prev_page)
+        self.btn_next = ft.IconButton(icon=ft.icons.NAVIGATE_NEXT, disabled=True, on_click=self.next_page)
+        self.overlay_controls = []
 
     def build(self):
         """
@@ -30,6 +52,104 @@ class Base_frame(ft.Container):
         """
         return self.content
 
+    def did_mount(self):
+        """
+        Agrega `overlay_controls` a la capa superpuesta de la página al montar el marco.
+        """
+        if self.overlay_controls:
+            self.page.overlay.extend(self.overlay_controls)
+            self.page.update()
+
+    def will_unmount(self):
+        """
+        Quita `overlay_controls` de la página al desmontar el marco.
+        """
+        if self.overlay_controls:
+            for control in self.overlay_controls:
+                if control in self.page.overlay:
+                    self.page.overlay.remove(control)
+            self.page.update()
+
+    async def show_data(self, e=None):
+        """
+        Muestra los datos del marco. Las subclases con tabla la sobrescriben.
+        """
+        pass
+
+    async def refresh(self, *args, **kwargs):
+        """
+        Se llama cuando la aplicación vuelve a mostrar este marco desde su caché, con los mismos
+        argumentos con los que se lo habría creado. Por defecto, si la tabla ya se había cargado,
+        vuelve a mostrar la página actual: las tablas de catálogo sin cambios salen de la caché
+        sin ir a la base de datos y `Keyed_Table.sync` sólo envía las filas que cambiaron. Las
+        subclases que reciben datos al crearse la sobrescriben para actualizarlos.
+        """
+        if self._loaded:
+            await self.show_data()
+
+    async def fetch_page(self, table_name, order_by="id"):
+        """
+        Obtiene la página actual de la tabla con paginación por clave y actualiza el estado de los
+        botones de navegación. Usa la fachada asíncrona `self.adb` de la subclase.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            order_by (str): Columna indexada por la que se ordena.
+
+        Returns:
+            list: Filas de la página actual.
+        """
+        rows, self._next_key = await self.adb.selection_page(
+            table_name, after=self._page_keys[-1], order_by=order_by, page_size=self.page_size
+        )
+        self._loaded = True
+        self.btn_prev.disabled = len(self._page_keys) == 1
+        self.btn_next.disabled = self._next_key is None
+        self.refresh_controls(self.btn_prev, self.btn_next)
+        return rows
+
+    @traced(cat="flet")
+    def refresh_controls(self, *controls):
+        """
+        Envía a la página sólo los controles indicados, si ya están montados, en lugar de todo el marco.
+
+        Args:
+            *controls (ft.Control): Controles a actualizar.
+        """
+        for control in controls:
+            if control.page:
+                control.update()
+
+    @profiled()
+    @traced(cat="ui")
+    async def next_page(self, e=None):
+        """
+        Avanza a la página siguiente si existe y vuelve a mostrar los datos.
+        """
+        if self._next_key is not None:
+            self._page_keys.append(self._next_key)
+            await self.show_data()
+
+    @profiled()
+    @traced(cat="ui")
+    async def prev_page(self, e=None):
+        """
+        Retrocede a la página anterior si existe y vuelve a mostrar los datos.
+        """
+        if len(self._page_keys) > 1:
+            self._page_keys.pop()
+            await self.show_data()
+
+    def pagination_controls(self):
+        """
+        Devuelve la fila con los botones de navegación entre páginas.
+
+        Returns:
+            ft.Row: Fila con los botones anterior y siguiente.
+        """
+        return ft.Row(controls=[self.btn_prev, self.btn_next])
+
+    @traced(cat="flet")
     def show_dialog(self, titulo, content, icon=None, color=None):
         """
         Muestra un diálogo de notificación con el título, contenido, icono y color especificados. Si ya existe un diálogo abierto, lo cierra antes de mostrar el nuevo.
@@ -0,0 +1,176 @@
+import asyncio
+
+import flet as ft
+
+
+class Keyed_Table(ft.DataTable):
+    """
+    DataTable que reconcilia sus filas por clave en lugar de reconstruirlas. Cada fila de datos se
+    identifica con `row_key(row)`; al sincronizar sólo se crean las filas nuevas, se eliminan las que
+    ya no están y se modifican los textos de las que cambiaron. Si sólo cambian valores se envía
+    a Flet la actualización de esas filas, no la tabla completa.
+
+    Con `window` la tabla es virtualizada: conserva todas las filas de datos pero sólo monta en
+    el árbol de controles las `window` filas visibles a partir de `_start`.
+
+    `key` y `offset` son propiedades de los controles de Flet que se envían al cliente (la clave
+    del control y su desplazamiento en pantalla), por eso la clave de las filas y la posición de
+    la ventana se guardan en atributos privados.
+
+    Atributos:
+        _row_key (callable): Función que devuelve la clave única de una fila de datos.
+        actions (list): Tuplas (icono, color, manejador) para los botones de la columna de opciones;
+            el manejador, síncrono o asíncrono, recibe la fila de datos vigente al momento del clic.
+        cell_width (int): Ancho de cada celda de texto.
+        window (int or None): Filas montadas a la vez, o None para montarlas todas.
+        _start (int): Posición de la primera fila montada cuando hay `window`.
+    """
+    def __init__(self, row_key=lambda row: row[0], actions=None, cell_width=150, window=None, **kwargs):
+        """
+        Inicializa la tabla vacía.
+
+        Args:
+            row_key (callable): Función que devuelve la clave única de una fila de datos.
+            actions (list, optional): Tuplas (icono, color, manejador) de la columna de opciones.
+            cell_width (int): Ancho de cada celda de texto.
+            window (int, optional): Filas montadas a la vez en modo virtualizado.
+            **kwargs: Argumentos de `ft.DataTable` (columnas, bordes, colores...).
+        """
+        super().__init__(**kwargs)
+        self._row_key = row_key
+        self.actions = actions or []
+        self.cell_width = cell_width
+        self.window = window
+        self._start = 0
+        self._order = []
+        self._values = {}
+        self._controls = {}
+
+    def _new_row(self, k, row):
+        """
+        Crea el DataRow de una fila de datos.
+
+        Args:
+            k: Clave de la fila.
+            row (tuple): Valores de la fila.
+
+        Returns:
+            ft.DataRow: Fila de controles.
+        """
+        cells = [ft.DataCell(ft.Text(cell, width=self.cell_width, color=ft.colors.BLACK)) for cell in row]
+        if self.actions:
+            cells.append(ft.DataCell(ft.Row(controls=[
+                ft.IconButton(icon=icon, icon_color=color, on_click=self._on_click(k, handler))
+                for icon, color, handler in self.actions
+            ], spacing=15)))
+        return ft.DataRow(cells=cells)
+
+    def _on_click(self, k, handler):
+        """
+        Crea el manejador de clic de un botón de opciones. Si `handler` es asíncrono el manejador
+        también lo es, para que Flet lo espere en su bucle de eventos.
+
+        Args:
+            k: Clave de la fila.
+            handler (callable): Función que recibe la fila de datos vigente.
+
+        Returns:
+            callable: Manejador para `on_click`.
+        """
+        if asyncio.iscoroutinefunction(handler):
+            async def click(e):
+                await handler(self._values[k])
+        else:
+            def click(e):
+                handler(self._values[k])
+        return click
+
+    def _patch_row(self, control, old, new):
+        """
+        Cambia en el DataRow sólo los textos de las celdas cuyo valor cambió.
+
+        Returns:
+            bool: True si alguna celda cambió.
+        """
+        changed = False
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                control.cells[i].content.value = b
+                changed = True
+        return changed
+
+    def _visible_keys(self):
+        if self.window is None:
+            return list(self._order)
+        return self._order[self._start:self._start + self.window]
+
+    def sync(self, data):
+        """
+        Reconcilia la tabla con la lista de filas de datos dada.
+
+        Args:
+            data (list): Filas de datos (tuplas) en el orden a mostrar.
+
+        Modifica:
+            self.rows: Añade, elimina o reordena sólo lo necesario.
+        """
+        order = []
+        values = {}
+        patched = []
+        for row in data:
+            row = tuple(row)
+            k = self._row_key(row)
+            order.append(k)
+            values[k] = row
+            if k not in self._controls:
+                self._controls[k] = self._new_row(k, row)
+            elif self._values[k] != row and self._patch_row(self._controls[k], self._values[k], row):
+                patched.append(self._controls[k])
+        for k in set(self._controls) - set(values):
+            del self._controls[k]
+
+        mounted = self._visible_keys()
+        self._order = order
+        self._values = values
+        if self.window is not None:
+            self._start = max(0, min(self._start, len(order) - self.window))
+        if self._visible_keys() != mounted:
+            self._mount()
+        else:
+            for control in patched:
+                if control.page:
+                    control.update()
+
+    def _mount(self):
+        """
+        Monta en `self.rows` las filas visibles y envía la tabla si ya está en la página.
+        """
+        self.rows = [self._controls[k] for k in self._visible_keys()]
+        if self.page:
+            self.update()
+
+    def scroll(self, delta):
+        """
+        Desplaza la ventana visible `delta` filas en modo virtualizado.
+
+        Args:
+            delta (int): Filas a desplazar; negativo para retroceder.
+        """
+        if self.window is None:
+            return
+        start = max(0, min(self._start + delta, max(0, len(self._order) - self.window)))
+        if start != self._start:
+            self._start = start
+            self._mount()
+
+    def window_controls(self):
+        """
+        Devuelve la fila con los botones para desplazar la ventana visible una ventana completa.
+
+        Returns:
+            ft.Row: Fila con los botones anterior y siguiente.
+        """
+        return ft.Row(controls=[
+            ft.IconButton(icon=ft.icons.KEYBOARD_ARROW_UP, on_click=lambda e: self.scroll(-(self.window or 0))),
+            ft.IconButton(icon=ft.icons.KEYBOARD_ARROW_DOWN, on_click=lambda e: self.scroll(self.window or 0)),
+        ], visible=self.window is not None)
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+
+from data.db import get_db
+
+# Marca el fin de un recorrido en la cola de `AsyncDatabaseManager.iterate`.
+_FIN = object()
+
+
+class AsyncDatabaseManager:
+    """
+    Fachada asíncrona de un `StorageBackend` para los manejadores de eventos de Flet.
+
+    Cada operación se ejecuta en un hilo del ejecutor por defecto de asyncio sobre el gestor
+    compartido: el bucle de eventos de la interfaz nunca espera a la base de datos. Con PostgreSQL
+    cada hilo toma su propia conexión del pool y varias consultas lanzadas con `asyncio.gather`
+    corren a la vez, hasta POOL_MAX conexiones; con SQLite se turnan la conexión del gestor. La
+    caché de catálogo y su invalidación son las mismas del gestor síncrono.
+
+    Tiene una versión asíncrona de cada operación de `StorageBackend`; las que recorren resultados
+    (`stream`, `iter_selection`, `reporte_costos`) se recorren con `async for`. Las funciones de
+    los hooks, que agrupan varias operaciones, se ejecutan con `run`.
+
+    Atributos:
+        db (StorageBackend): Gestor síncrono sobre el que se ejecutan las operaciones.
+    """
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_db()
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Ejecuta en un hilo una función síncrona que accede a la base de datos (por ejemplo un
+        método de los hooks) y devuelve su resultado.
+
+        Args:
+            func (callable): Función a ejecutar.
+            *args: Argumentos posicionales de la función.
+            **kwargs: Argumentos con nombre de la función.
+
+        Returns:
+            El resultado de la función.
+        """
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def iterate(self, func, *args, batch=500, **kwargs):
+        """
+        Recorre en un único hilo un generador síncrono que accede a la base de datos y entrega sus
+        elementos en el bucle de eventos. El generador corre siempre en el mismo hilo (la conexión
+        de `stream` en SQLite no se puede usar desde otro) y pasa los elementos en lotes de `batch`
+        por una cola acotada: si el consumidor se atrasa, el hilo espera y la memoria no crece. Si
+        se deja de recorrer antes del final, el generador se cierra y libera su conexión.
+
+        Args:
+            func (callable): Función que devuelve el generador.
+            *args: Argumentos posicionales de la función.
+            batch (int): Elementos que se pasan al bucle de eventos de una vez.
+            **kwargs: Argumentos con nombre de la función.
+
+        Yields:
+            Cada elemento del generador.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=2)
+        stop = threading.Event()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def produce():
+            items = func(*args, **kwargs)
+            lote = []
+            try:
+                for item in items:
+                    lote.append(item)
+                    if len(lote) >= batch:
+                        put(lote)
+                        lote = []
+                        if stop.is_set():
+                            return
+                if lote:
+                    put(lote)
+            finally:
+                items.close()
+                put(_FIN)
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        terminado = False
+        try:
+            while (lote := await queue.get()) is not _FIN:
+                for item in lote:
+                    yield item
+            terminado = True
+        finally:
+            stop.set()
+            # Se vacía la cola para que el hilo no quede esperando lugar y vea `stop`.
+            while not terminado:
+                terminado = await queue.get() is _FIN
+            await producer
+
+    async def catalog_versions(self):
+        """Versión asíncrona de `StorageBackend.catalog_versions`."""
+        return await self.run(self.db.catalog_versions)
+
+    async def diagnostics(self):
+        """Versión asíncrona de `StorageBackend.diagnostics`."""
+        return await self.run(self.db.diagnostics)
+
+    async def create_table(self, table_name, columns: dict):
+        """Versión asíncrona de `StorageBackend.create_table`."""
+        return await self.run(self.db.create_table, table_name, columns)
+
+    async def insert(self, table_name, values: list):
+        """Versión asíncrona de `StorageBackend.insert`."""
+        return await self.run(self.db.insert, table_name, values)
+
+    async def upsert(self, table_name, values: list, update=True, page_size=5000):
+        """Versión asíncrona de `StorageBackend.upsert`."""
+        return await self.run(self.db.upsert, table_name, values, update=update, page_size=page_size)
+
+    async def bulk_upsert(self, table_name, columns, rows, update=True):
+        """Versión asíncrona de `StorageBackend.bulk_upsert`; `rows` se consume en el hilo."""
+        return await self.run(self.db.bulk_upsert, table_name, columns, rows, update=update)
+
+    async def delete(self, table_name, id_value, condition=None):
+        """Versión asíncrona de `StorageBackend.delete`."""
+        return await self.run(self.db.delete, table_name, id_value, condition)
+
+    async def update(self, table_name, id_tabla, condition, data=None):
+        """Versión asíncrona de `StorageBackend.update`."""
+        return await self.run(self.db.update, table_name, id_tabla, condition, data)
+
+    async def update_column(self, table_name, column, values: list):
+        """Versión asíncrona de `StorageBackend.update_column`."""
+        return await self.run(self.db.update_column, table_name, column, values)
+
+    async def selection(self, table_name, condition=None, boll=False, param: list = []):
+        """Versión asíncrona de `StorageBackend.selection`."""
+        return await self.run(self.db.selection, table_name, condition, boll, param)
+
+    async def selection_page(self, table_name, after=None, order_by="id", page_size=100):
+        """Versión asíncrona de `StorageBackend.selection_page`."""
+        return await self.run(self.db.selection_page, table_name, after, order_by, page_size)
+
+    async def selection_by_ids(self, table_name, ids=None):
+        """Versión asíncrona de `StorageBackend.selection_by_ids`."""
+        return await self.run(self.db.selection_by_ids, table_name, ids)
+
+    async def current_lines_with_prices(self, id_recetas=None):
+        """Versión asíncrona de `StorageBackend.current_lines_with_prices`."""
+        return await self.run(self.db.current_lines_with_prices, id_recetas)
+
+    async def recipes_using(self, id_ingredientes):
+        """Versión asíncrona de `StorageBackend.recipes_using`."""
+        return await self.run(self.db.recipes_using, id_ingredientes)
+
+    async def costo_recetas(self, id_recetas=None):
+        """Versión asíncrona de `StorageBackend.costo_recetas`."""
+        return await self.run(self.db.costo_recetas, id_recetas)
+
+    async def guardar_costo_recetas(self, id_recetas=None):
+        """Versión asíncrona de `StorageBackend.guardar_costo_recetas`."""
+        return await self.run(self.db.guardar_costo_recetas, id_recetas)
+
+    def stream(self, query, params=None, itersize=2000):
+        """Versión asíncrona de `StorageBackend.stream`, para recorrer con `async for`."""
+        return self.iterate(self.db.stream, query, params, itersize=itersize, batch=itersize)
+
+    def iter_selection(self, table_name, order_by="id", itersize=2000):
+        """Versión asíncrona de `StorageBackend.iter_selection`, para recorrer con `async for`."""
+        return self.iterate(self.db.iter_selection, table_name, order_by, itersize=itersize, batch=itersize)
+
+    def reporte_costos(self, itersize=2000):
+        """Versión asíncrona de `StorageBackend.reporte_costos`, para recorrer con `async for`."""
+        return self.iterate(self.db.reporte_costos, itersize=itersize, batch=itersize)
+
+    async def init_data(self):
+        """Versión asíncrona de `StorageBackend.init_data`."""
+        return await self.run(self.db.init_data)
+
@@ -0,0 +1,209 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from data.cache import CatalogCache
+from data.data_injection import cached_tables
+from data.metrics import metrics
+
+# Operaciones públicas que se miden en `data.metrics`; las implementaciones no tienen que decorarlas.
+OPERATIONS = (
+    "catalog_versions", "create_table", "insert", "upsert", "bulk_upsert", "delete", "update", "selection",
+    "update_column", "selection_by_ids", "current_lines_with_prices", "recipes_using", "costo_recetas",
+    "guardar_costo_recetas", "selection_page", "stream", "iter_selection", "reporte_costos", "init_data",
+)
+
+
+class StorageBackend(ABC):
+    """
+    Interfaz común de los gestores de base de datos de la aplicación. Los hooks, las pantallas y
+    la fachada asíncrona sólo usan estos métodos, así que el motor se elige por configuración
+    (`DB_BACKEND`, ver `data.db.get_db`) sin tocar el resto del código.
+
+    Las consultas que reciben los métodos (condiciones de `selection`, parámetros de `stream`)
+    se escriben con marcadores %s; cada implementación los traduce a los de su motor.
+
+    Aquí viven también las partes comunes: la caché de catálogo, su invalidación al escribir y
+    el registro por hilo de la transacción en curso (`self._local.conn`). Las operaciones de
+    `OPERATIONS` quedan medidas por `data.metrics` en toda implementación; `diagnostics()` reúne
+    esas métricas con el estado del gestor.
+
+    Atributos:
+        db_name (str): Nombre de la base de datos.
+        cache (CatalogCache): Caché de las lecturas de catálogo. Se ajusta con CACHE_MAX_ENTRIES y
+            CACHE_PROBE_INTERVAL (segundos entre consultas de versión).
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in OPERATIONS:
+            if name in cls.__dict__:
+                setattr(cls, name, metrics.measured(name)(cls.__dict__[name]))
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._local = threading.local()
+        self.cache = CatalogCache(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "64")),
+            probe_interval=float(os.getenv("CACHE_PROBE_INTERVAL", "5"))
+        )
+
+    def diagnostics(self):
+        """
+        Reúne las métricas de la capa de datos con el estado del gestor, para el panel de diagnóstico.
+
+        Returns:
+            dict: 'backend', 'metrics' (`QueryMetrics.snapshot`) y 'cache' (aciertos y fallos de la
+                caché de catálogo); las implementaciones agregan lo propio.
+        """
+        return {
+            "backend": type(self).__name__,
+            "metrics": metrics.snapshot(),
+            "cache": {"hits": self.cache.hits, "misses": self.cache.misses},
+        }
+
+    @abstractmethod
+    def cursor(self):
+        """
+        Gestor de contexto que entrega un cursor. Al salir del bloque confirma y ante un error
+        revierte; dentro de `transaction()` usa la conexión de la transacción y no confirma.
+        """
+
+    @abstractmethod
+    def transaction(self):
+        """
+        Gestor de contexto de unidad de trabajo: las operaciones del hilo dentro del bloque se
+        confirman juntas al salir o se revierten todas ante una excepción. Se anida uniéndose al
+        exterior y entrega el mismo gestor.
+        """
+
+    def _invalidate(self, table_name):
+        """
+        Invalida la caché de una tabla escrita; dentro de una transacción lo repite al terminarla.
+
+        Args:
+            table_name (str): Nombre de la tabla escrita.
+        """
+        self.cache.invalidate(table_name)
+        dirty = getattr(self._local, "dirty", None)
+        if dirty is not None:
+            dirty.add(table_name)
+
+    @abstractmethod
+    def catalog_versions(self):
+        """
+        Consulta la versión actual de cada tabla de catálogo, para `CatalogCache.probe`.
+
+        Returns:
+            dict: {tabla: versión}.
+        """
+
+    def _cached(self, key, load):
+        """
+        Devuelve el resultado de `load()` para la clave, usando la caché si la tabla es de catálogo.
+
+        Args:
+            key (tuple): Clave de la consulta; su primer elemento es el nombre de la tabla.
+            load (callable): Función que ejecuta la consulta.
+
+        Returns:
+            El resultado de la consulta.
+        """
+        # Dentro de una transacción se lee sin caché: puede ver escrituras aún no confirmadas.
+        if key[0] not in cached_tables or getattr(self._local, "conn", None) is not None:
+            return load()
+        self.cache.probe(self.catalog_versions)
+        value = self.cache.get(key)
+        if value is None:
+            value = load()
+            self.cache.put(key, value)
+        return value
+
+    @abstractmethod
+    def create_table(self, table_name, columns: dict):
+        """Crea una tabla si no existe."""
+
+    @metrics.measured("insert")
+    def insert(self, table_name, values: list):
+        """
+        Inserta registros en una tabla. En tablas con clave única (`conflict_keys`) los registros
+        que ya existen se omiten sin error.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            values (list): Lista de diccionarios con los valores a insertar.
+
+        Returns:
+            list: IDs de los registros insertados.
+        """
+        return self.upsert(table_name, values, update=False)
+
+    @abstractmethod
+    def upsert(self, table_name, values: list, update=True, page_size=5000):
+        """Inserta o actualiza registros según la clave de `conflict_keys`; devuelve sus IDs."""
+
+    @abstractmethod
+    def bulk_upsert(self, table_name, columns, rows, update=True):
+        """Carga un flujo de filas con memoria constante; devuelve (copiadas, fusionadas)."""
+
+    @abstractmethod
+    def delete(self, table_name, id_value, condition=None):
+        """Elimina un registro por ID; devuelve True si se eliminó o {'Error': str}."""
+
+    @abstractmethod
+    def update(self, table_name, id_tabla, condition, data=None):
+        """Actualiza el costo de una receta o las columnas de un ingrediente."""
+
+    @abstractmethod
+    def selection(self, table_name, condition=None, boll=False, param: list = []):
+        """Selecciona toda la tabla, una fila por condición o las líneas vigentes de una receta."""
+
+    @abstractmethod
+    def update_column(self, table_name, column, values: list):
+        """Actualiza una columna en muchos registros a partir de tuplas (id, valor)."""
+
+    @abstractmethod
+    def selection_by_ids(self, table_name, ids=None):
+        """Selecciona los registros con esos IDs, o todos, ordenados por id."""
+
+    @abstractmethod
+    def current_lines_with_prices(self, id_recetas=None):
+        """Devuelve las líneas vigentes de las recetas con el precio actual del ingrediente."""
+
+    @abstractmethod
+    def recipes_using(self, id_ingredientes):
+        """Devuelve los IDs de las recetas que usan alguno de los ingredientes."""
+
+    @abstractmethod
+    def costo_recetas(self, id_recetas=None):
+        """Devuelve el desglose de costo de las recetas calculado en la base de datos."""
+
+    @abstractmethod
+    def guardar_costo_recetas(self, id_recetas=None):
+        """Guarda en `costo_receta` el costo de paquete calculado; devuelve las recetas actualizadas."""
+
+    @abstractmethod
+    def selection_page(self, table_name, after=None, order_by="id", page_size=100):
+        """Selecciona una página por clave; devuelve (filas, clave_siguiente)."""
+
+    @abstractmethod
+    def stream(self, query, params=None, itersize=2000):
+        """Entrega de a una las filas de una consulta sin cargar el resultado en memoria."""
+
+    @abstractmethod
+    def iter_selection(self, table_name, order_by="id", itersize=2000):
+        """Recorre toda la tabla en orden mediante `stream`."""
+
+    @abstractmethod
+    def reporte_costos(self, itersize=2000):
+        """
+        Recorre el reporte de costos: una fila por línea vigente de cada receta con el desglose de
+        costo de la receta; las recetas sin líneas salen con una fila sin ingrediente.
+
+        Yields:
+            tuple: (id_receta, nombre, lineas, costo_ingredientes, ganancia, costo_unitario,
+                costo_paquete, precio_sugerido, ingrediente, cantidad, precio, kg_gr).
+        """
+
+    @abstractmethod
+    def init_data(self):
+        """Lleva el esquema a la última migración; devuelve la versión resultante."""
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """
+    Caché en memoria de consultas sobre las tablas de catálogo (ingredientes y recetas), con
+    tamaño acotado y desalojo LRU.
+
+    Las escrituras hechas por este proceso invalidan la tabla afectada de inmediato. Los cambios
+    hechos desde otras estaciones se detectan comparando las versiones por tabla de
+    `catalogo_version`, que mantienen triggers en la base de datos; esa consulta se hace como
+    mucho una vez cada `probe_interval` segundos, de modo que navegar entre pantallas sin cambios
+    no cuesta consultas.
+
+    Atributos:
+        max_entries (int): Número máximo de resultados guardados.
+        probe_interval (float): Segundos mínimos entre consultas de versión.
+        hits (int): Lecturas servidas desde la caché.
+        misses (int): Lecturas que tuvieron que ir a la base de datos.
+    """
+    def __init__(self, max_entries=64, probe_interval=5.0):
+        self.max_entries = max_entries
+        self.probe_interval = probe_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._last_probe = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Devuelve una copia del resultado guardado para la clave, o None si no está.
+
+        Args:
+            key (tuple): Clave de la consulta; su primer elemento es el nombre de la tabla.
+
+        Returns:
+            list or None: Filas guardadas.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(value)
+
+    def put(self, key, value):
+        """
+        Guarda el resultado de una consulta, desalojando el menos usado si se supera el tamaño.
+
+        Args:
+            key (tuple): Clave de la consulta; su primer elemento es el nombre de la tabla.
+            value (list): Filas a guardar.
+        """
+        with self._lock:
+            self._entries[key] = list(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table_name=None):
+        """
+        Descarta los resultados de una tabla, o todos si no se indica.
+
+        Args:
+            table_name (str, optional): Nombre de la tabla.
+        """
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == table_name]:
+                del self._entries[key]
+
+    def probe(self, fetch_versions):
+        """
+        Si pasó `probe_interval` desde la última vez, consulta las versiones de las tablas e invalida
+        las que cambiaron.
+
+        Args:
+            fetch_versions (callable): Función sin argumentos que devuelve {tabla: versión}.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._last_probe is not None and now - self._last_probe < self.probe_interval:
+                return
+            self._last_probe = now
+        versions = fetch_versions()
+        with self._lock:
+            changed = [t for t, v in versions.items() if self._versions.get(t) != v]
+            self._versions = versions
+        for table_name in changed:
+            self.invalidate(table_name)
+
+    def stats(self):
+        """
+        Devuelve el estado de la caché.
+
+        Returns:
+            dict: Entradas, aciertos, fallos y versiones conocidas.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "versions": dict(self._versions),
+            }
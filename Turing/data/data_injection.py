@@ -4,7 +4,7 @@ tables =[
     "id":"SERIAL PRIMARY KEY",
     "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
     "updated_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
-    "nombre":"TEXT NOT NULL",
+    "nombre":"TEXT NOT NULL UNIQUE",
     "cantidad":"REAL",
     "kg_gr":"TEXT NOT NULL",
     "precio":"REAL",
@@ -37,3 +37,269 @@ tables =[
    
   }
 ]
+
+# Columnas únicas por tabla: son la clave de conflicto de los INSERT ... ON CONFLICT.
+conflict_keys = {
+    "ingredientes": ("nombre",),
+    "receta": ("nombre",),
+}
+
+
+def create_table_sql(table_name, columns: dict):
+    """
+    Genera la sentencia CREATE TABLE IF NOT EXISTS para una tabla de `tables`.
+
+    Args:
+        table_name (str): Nombre de la tabla.
+        columns (dict): Diccionario con nombres de columnas y sus tipos de datos.
+
+    Returns:
+        str: Sentencia DDL.
+    """
+    columns_with_types = ", ".join([f"{col} {typ}" for col, typ in columns.items()])
+    return f'CREATE TABLE IF NOT EXISTS "{table_name}" ({columns_with_types})'
+
+
+# Ingredientes repetidos por nombre, de bases creadas antes de que `nombre` fuera único: por cada
+# nombre se conserva la fila actualizada más recientemente (`keep`), con el precio vigente.
+_INGREDIENTES_REPETIDOS = """
+    SELECT id, FIRST_VALUE(id) OVER (PARTITION BY nombre ORDER BY updated_at DESC NULLS LAST, id DESC) AS keep
+    FROM ingredientes
+"""
+
+# Migraciones del esquema, en orden. Cada versión se aplica una sola vez y queda registrada
+# en la tabla `schema_version`; nunca modificar una versión ya publicada, añadir una nueva.
+# Las sentencias de la versión 1 son idempotentes para adoptar bases creadas antes de las migraciones.
+migrations = [
+    {
+        "version": 1,
+        "descripcion": "esquema inicial: ingredientes, receta y cant_ing",
+        "sql": [create_table_sql(t, c) for t, c in tables[0].items()] + [
+            # Antes del índice único se fusionan los repetidos: sus líneas pasan a la fila que se
+            # conserva y las demás se borran. En una base nueva no hacen nada.
+            f"""
+            UPDATE cant_ing c SET id_ingrediente = r.keep
+            FROM ({_INGREDIENTES_REPETIDOS}) r
+            WHERE c.id_ingrediente = r.id AND r.id <> r.keep
+            """,
+            f"""
+            DELETE FROM ingredientes i
+            USING ({_INGREDIENTES_REPETIDOS}) r
+            WHERE i.id = r.id AND r.id <> r.keep
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS ingredientes_nombre_key ON ingredientes (nombre)",
+        ],
+    },
+    {
+        "version": 2,
+        "descripcion": "indice para las lineas vigentes de cada receta en cant_ing",
+        "sql": [
+            # Cubre el filtro por receta y el orden de DISTINCT ON (id_ingrediente) ... created_at DESC.
+            "CREATE INDEX IF NOT EXISTS cant_ing_receta_ingrediente_fecha_idx "
+            "ON cant_ing (id_receta, id_ingrediente, created_at DESC)",
+        ],
+    },
+    {
+        "version": 3,
+        "descripcion": "indice de dependencias ingrediente -> recetas en cant_ing",
+        "sql": [
+            "CREATE INDEX IF NOT EXISTS cant_ing_ingrediente_receta_idx ON cant_ing (id_ingrediente, id_receta)",
+        ],
+    },
+    {
+        "version": 4,
+        "descripcion": "tabla cant_ing_actual con la linea vigente de cada ingrediente por receta",
+        "sql": [
+            # cant_ing queda como historial de solo inserción; cant_ing_actual guarda la última
+            # línea de cada (receta, ingrediente) y la mantiene un trigger en cada INSERT.
+            """
+            CREATE TABLE IF NOT EXISTS cant_ing_actual (
+                id_receta INTEGER NOT NULL REFERENCES receta (id) ON DELETE CASCADE,
+                id_ingrediente INTEGER NOT NULL REFERENCES ingredientes (id) ON DELETE CASCADE,
+                id_cant_ing INTEGER NOT NULL,
+                cantidad REAL,
+                precio REAL,
+                created_at TIMESTAMP,
+                PRIMARY KEY (id_receta, id_ingrediente)
+            )
+            """,
+            """
+            INSERT INTO cant_ing_actual (id_receta, id_ingrediente, id_cant_ing, cantidad, precio, created_at)
+            SELECT DISTINCT ON (id_receta, id_ingrediente)
+                id_receta, id_ingrediente, id, cantidad, precio, created_at
+            FROM cant_ing
+            WHERE id_receta IS NOT NULL AND id_ingrediente IS NOT NULL
+            ORDER BY id_receta, id_ingrediente, created_at DESC, id DESC
+            ON CONFLICT (id_receta, id_ingrediente) DO NOTHING
+            """,
+            """
+            CREATE OR REPLACE FUNCTION cant_ing_actual_sync() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO cant_ing_actual (id_receta, id_ingrediente, id_cant_ing, cantidad, precio, created_at)
+                VALUES (NEW.id_receta, NEW.id_ingrediente, NEW.id, NEW.cantidad, NEW.precio, NEW.created_at)
+                ON CONFLICT (id_receta, id_ingrediente) DO UPDATE SET
+                    id_cant_ing = EXCLUDED.id_cant_ing,
+                    cantidad = EXCLUDED.cantidad,
+                    precio = EXCLUDED.precio,
+                    created_at = EXCLUDED.created_at
+                WHERE cant_ing_actual.created_at IS NULL OR cant_ing_actual.created_at <= EXCLUDED.created_at;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS cant_ing_actual_sync ON cant_ing",
+            """
+            CREATE TRIGGER cant_ing_actual_sync AFTER INSERT ON cant_ing
+            FOR EACH ROW WHEN (NEW.id_receta IS NOT NULL AND NEW.id_ingrediente IS NOT NULL)
+            EXECUTE FUNCTION cant_ing_actual_sync()
+            """,
+        ],
+    },
+    {
+        "version": 5,
+        "descripcion": "versiones de catalogo para invalidar las caches de las estaciones",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS catalogo_version (
+                tabla TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+            """,
+            "INSERT INTO catalogo_version (tabla) VALUES ('ingredientes'), ('receta') ON CONFLICT DO NOTHING",
+            """
+            CREATE OR REPLACE FUNCTION catalogo_version_bump() RETURNS trigger AS $$
+            BEGIN
+                UPDATE catalogo_version SET version = version + 1 WHERE tabla = TG_TABLE_NAME;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS catalogo_version_bump ON ingredientes",
+            """
+            CREATE TRIGGER catalogo_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ingredientes
+            FOR EACH STATEMENT EXECUTE FUNCTION catalogo_version_bump()
+            """,
+            "DROP TRIGGER IF EXISTS catalogo_version_bump ON receta",
+            """
+            CREATE TRIGGER catalogo_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON receta
+            FOR EACH STATEMENT EXECUTE FUNCTION catalogo_version_bump()
+            """,
+        ],
+    },
+    {
+        "version": 6,
+        "descripcion": "funcion costo_receta con el desglose de costo de las recetas",
+        "sql": [
+            # Fórmula de `Cant_ing_x_receta.total_ing_costo` y `Receta.costo_empaquetado` con el precio
+            # actual de cada ingrediente: línea = precio * cantidad + 0.20 (la panela a 2450/3300),
+            # paquete = (costo unitario * cant_x_paquete + empaque 0.01 + sticker 0.03) + 15% de extras.
+            """
+            CREATE OR REPLACE FUNCTION costo_receta(p_ids INTEGER[] DEFAULT NULL)
+            RETURNS TABLE (
+                id_receta INTEGER,
+                nombre TEXT,
+                lineas INTEGER,
+                costo_ingredientes DOUBLE PRECISION,
+                ganancia DOUBLE PRECISION,
+                costo_unitario DOUBLE PRECISION,
+                costo_paquete DOUBLE PRECISION,
+                precio_sugerido DOUBLE PRECISION
+            ) AS $$
+                WITH totales AS (
+                    SELECT r.id, r.nombre, r.porcentaje_venta, r.unidades_x_receta, r.cant_x_paquete,
+                           count(l.id_ingrediente)::int AS lineas,
+                           coalesce(sum(round((
+                               CASE WHEN i.nombre = 'panela' THEN i.precio::numeric * 2450 / 3300 ELSE i.precio::numeric END
+                               * l.cantidad::numeric + 0.20), 3)), 0)::double precision AS costo_ingredientes
+                    FROM receta r
+                    LEFT JOIN cant_ing_actual l ON l.id_receta = r.id
+                    LEFT JOIN ingredientes i ON i.id = l.id_ingrediente
+                    WHERE p_ids IS NULL OR r.id = ANY(p_ids)
+                    GROUP BY r.id
+                ), unitario AS (
+                    SELECT t.*, t.costo_ingredientes / nullif(t.unidades_x_receta, 0) AS costo_unitario
+                    FROM totales t
+                ), paquete AS (
+                    SELECT u.*, (u.costo_unitario * u.cant_x_paquete + 0.01 + 0.03) * 1.15 AS costo_paquete
+                    FROM unitario u
+                )
+                SELECT p.id, p.nombre, p.lineas, p.costo_ingredientes,
+                       p.porcentaje_venta / 100 * p.costo_ingredientes,
+                       p.costo_unitario, p.costo_paquete,
+                       p.costo_paquete * (1 + p.porcentaje_venta / 100)
+                FROM paquete p
+                ORDER BY p.id
+            $$ LANGUAGE sql STABLE
+            """,
+        ],
+    },
+]
+
+# Marca de tiempo local con milisegundos: el CURRENT_TIMESTAMP de SQLite es UTC y sólo tiene
+# segundos, y cant_ing_actual ordena las líneas de una receta por created_at.
+SQLITE_NOW = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+# Tipos de `tables` que SQLite escribe distinto.
+sqlite_types = {
+    "SERIAL PRIMARY KEY": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "TIMESTAMP DEFAULT CURRENT_TIMESTAMP": f"TIMESTAMP DEFAULT {SQLITE_NOW}",
+}
+
+
+def sqlite_table_sql(table_name, columns: dict):
+    """
+    Genera la sentencia CREATE TABLE IF NOT EXISTS de una tabla de `tables` para SQLite.
+
+    Args:
+        table_name (str): Nombre de la tabla.
+        columns (dict): Diccionario con nombres de columnas y sus tipos de datos.
+
+    Returns:
+        str: Sentencia DDL.
+    """
+    return create_table_sql(table_name, {col: sqlite_types.get(typ, typ) for col, typ in columns.items()})
+
+
+# Migraciones del motor SQLite (`data.sqlite_db`), con la misma regla que `migrations`. La versión 1
+# reúne las versiones 1 a 4 de PostgreSQL. No hacen falta catalogo_version (las estaciones son un
+# solo proceso y los cambios de otras conexiones se ven en PRAGMA data_version) ni la función
+# costo_receta, que el gestor arma como CTE.
+sqlite_migrations = [
+    {
+        "version": 1,
+        "descripcion": "esquema inicial con indices y tabla cant_ing_actual",
+        "sql": [sqlite_table_sql(t, c) for t, c in tables[0].items()] + [
+            "CREATE INDEX IF NOT EXISTS cant_ing_receta_ingrediente_fecha_idx "
+            "ON cant_ing (id_receta, id_ingrediente, created_at DESC)",
+            "CREATE INDEX IF NOT EXISTS cant_ing_ingrediente_receta_idx ON cant_ing (id_ingrediente, id_receta)",
+            """
+            CREATE TABLE IF NOT EXISTS cant_ing_actual (
+                id_receta INTEGER NOT NULL REFERENCES receta (id) ON DELETE CASCADE,
+                id_ingrediente INTEGER NOT NULL REFERENCES ingredientes (id) ON DELETE CASCADE,
+                id_cant_ing INTEGER NOT NULL,
+                cantidad REAL,
+                precio REAL,
+                created_at TIMESTAMP,
+                PRIMARY KEY (id_receta, id_ingrediente)
+            ) WITHOUT ROWID
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS cant_ing_actual_sync AFTER INSERT ON cant_ing
+            FOR EACH ROW WHEN NEW.id_receta IS NOT NULL AND NEW.id_ingrediente IS NOT NULL
+            BEGIN
+                INSERT INTO cant_ing_actual (id_receta, id_ingrediente, id_cant_ing, cantidad, precio, created_at)
+                VALUES (NEW.id_receta, NEW.id_ingrediente, NEW.id, NEW.cantidad, NEW.precio, NEW.created_at)
+                ON CONFLICT (id_receta, id_ingrediente) DO UPDATE SET
+                    id_cant_ing = excluded.id_cant_ing,
+                    cantidad = excluded.cantidad,
+                    precio = excluded.precio,
+                    created_at = excluded.created_at
+                WHERE cant_ing_actual.created_at IS NULL OR cant_ing_actual.created_at <= excluded.created_at;
+            END
+            """,
+        ],
+    },
+]
+
+# Tablas cuyas lecturas completas se guardan en la caché de catálogo (`data.cache`).
+cached_tables = ("ingredientes", "receta")
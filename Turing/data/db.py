@@ -1,61 +1,225 @@
-import psycopg2
-from psycopg2 import sql
-from data.data_injection import tables
+from contextlib import contextmanager
+from psycopg2 import errors, sql
+from psycopg2.extras import execute_values
+from data.backend import StorageBackend
+from data.data_injection import conflict_keys, migrations
+from data.pool import get_pool
+from data.sqlite_db import SqliteDatabaseManager
+from data.statements import PreparingConnection, StatementCache, numbered
 from dotenv import load_dotenv
+import csv
+import io
 import os
+import threading
+import uuid
 
 load_dotenv()
 
-class PostgresDatabaseManager:
+# Clave del candado consultivo que serializa las migraciones entre estaciones.
+MIGRATION_LOCK_ID = 2024070401
+
+class _CopySource:
+    """
+    Archivo de sólo lectura que entrega filas en formato CSV a medida que `copy_expert` las pide,
+    sin tener el lote completo en memoria.
+
+    Atributos:
+        count (int): Filas entregadas hasta el momento.
+    """
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            self.count += 1
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+# Línea vigente de cada ingrediente de una receta. Se lee de cant_ing_actual, que mantiene un
+# trigger sobre cant_ing, con un recorrido de su clave primaria (id_receta, id_ingrediente):
+# el costo no crece con el largo del historial.
+CURRENT_LINES_SQL = """
+    SELECT
+        id_cant_ing,
+        id_ingrediente,
+        id_receta,
+        cantidad,
+        precio
+    FROM
+        cant_ing_actual
+    WHERE
+        id_receta = %s
+    ORDER BY
+        id_ingrediente
+"""
+
+# Una fila por línea vigente de cada receta, con el desglose de costo de la receta que calcula
+# `costo_receta` en el servidor. Las recetas sin líneas salen con una fila sin ingrediente.
+COST_REPORT_SQL = """
+    SELECT c.id_receta, c.nombre, c.lineas, c.costo_ingredientes, c.ganancia, c.costo_unitario,
+           c.costo_paquete, c.precio_sugerido, i.nombre, l.cantidad, i.precio, i.kg_gr
+    FROM costo_receta() c
+    LEFT JOIN cant_ing_actual l ON l.id_receta = c.id_receta
+    LEFT JOIN ingredientes i ON i.id = l.id_ingrediente
+    ORDER BY c.id_receta, l.id_ingrediente
+"""
+
+class PostgresDatabaseManager(StorageBackend):
     """
     Clase para gestionar la conexión y operaciones con una base de datos PostgreSQL.
 
+    Las operaciones toman prestada una conexión del pool compartido del proceso (`data.pool`)
+    y la devuelven al terminar, por lo que todas las instancias reutilizan conexiones abiertas.
+    Crear el gestor no abre ninguna conexión: el pool se obtiene en la primera operación.
+    Para compartir una sola instancia en toda la aplicación usar `get_db()`.
+    Las lecturas de las tablas de `cached_tables` pasan por una caché de catálogo que las
+    escrituras del gestor invalidan. Implementa `StorageBackend`.
+
     Atributos:
         db_name (str): Nombre de la base de datos.
         user (str): Usuario de la base de datos.
         password (str): Contraseña del usuario de la base de datos.
         host (str): Host del servidor de la base de datos.
         port (str): Puerto del servidor de la base de datos.
-        conn (psycopg2.connection): Conexión a la base de datos.
-        cursor (psycopg2.cursor): Cursor para ejecutar consultas en la base de datos.
+        pool (ConnectionPool): Pool de conexiones compartido para estas credenciales (perezoso).
+        cache (CatalogCache): Caché de las lecturas de catálogo (ver `StorageBackend`).
     """
     def __init__(self, db_name):
         """
-        Inicializa la conexión a la base de datos con las credenciales y parámetros proporcionados.
+        Inicializa el gestor con las credenciales del entorno, sin conectarse.
 
         Args:
             db_name (str): Nombre de la base de datos.
         """
-        self.db_name = db_name
+        super().__init__(db_name)
         self.user = os.getenv("USER")
         self.password = os.getenv("PASSWORD")
         self.host = os.getenv("HOST")
         self.port = os.getenv("PORT")
-        self.conn = psycopg2.connect(
-            dbname=self.db_name,
-            user=self.user,
-            password=self.password,
-            host=self.host,
-            port=self.port
+        self._pool = None
+        self.statements = StatementCache(
+            max_entries=int(os.getenv("STATEMENT_CACHE_SIZE", "256")),
+            prepare=os.getenv("PREPARED_STATEMENTS", "1") != "0"
         )
-        self.cursor = self.conn.cursor()
 
-    def connection(self):
+    @property
+    def pool(self):
         """
-        Establece una nueva conexión y cursor a la base de datos. 
+        Pool compartido para las credenciales del gestor, obtenido en el primer uso.
 
         Returns:
-            psycopg2.cursor: Un nuevo cursor para ejecutar consultas.
-        """
-        self.conn = psycopg2.connect(
-            dbname=self.db_name,
-            user=self.user,
-            password=self.password,
-            host=self.host,
-            port=self.port
-        )
-        self.cursor = self.conn.cursor()
-        return self.cursor
+            ConnectionPool: Pool de conexiones.
+        """
+        if self._pool is None:
+            self._pool = get_pool(
+                dbname=self.db_name,
+                user=self.user,
+                password=self.password,
+                host=self.host,
+                port=self.port,
+                connection_factory=PreparingConnection
+            )
+        return self._pool
+
+    @contextmanager
+    def cursor(self):
+        """
+        Presta una conexión del pool y entrega un cursor sobre ella. Al salir del bloque se hace
+        commit y la conexión vuelve al pool; ante un error se revierte. Dentro de `transaction()`
+        usa la conexión de la transacción y no hace commit.
+
+        Yields:
+            psycopg2.cursor: Cursor para ejecutar consultas.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with conn.cursor() as cur:
+                yield cur
+            return
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unidad de trabajo: todas las operaciones del gestor hechas en este hilo dentro del bloque
+        comparten una sola conexión y se confirman juntas al salir. Si el bloque lanza una excepción
+        se revierte todo. Un `transaction()` anidado se une al exterior.
+
+        Ejemplo:
+            with db.transaction():
+                db.insert("cant_ing", lineas)
+                db.update("receta", id_receta, costo)
+
+        Yields:
+            PostgresDatabaseManager: El mismo gestor.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self
+            return
+        with self.pool.connection() as conn:
+            self._local.conn = conn
+            self._local.dirty = set()
+            try:
+                yield self
+                conn.commit()
+            finally:
+                dirty = self._local.dirty
+                self._local.conn = None
+                self._local.dirty = None
+                # Otro hilo o estación pudo guardar en caché datos previos a la confirmación.
+                for table_name in dirty:
+                    self.cache.invalidate(table_name)
+
+    def diagnostics(self):
+        """
+        Agrega a `StorageBackend.diagnostics` el estado del pool y de la caché de sentencias.
+
+        Returns:
+            dict: Diagnóstico del gestor, con 'pool' y 'statements'.
+        """
+        return {**super().diagnostics(), "pool": self.pool.stats(), "statements": self.statements.stats()}
+
+    def catalog_versions(self):
+        """
+        Consulta la versión actual de cada tabla de catálogo.
+
+        Returns:
+            dict: {tabla: versión}.
+        """
+        with self.cursor() as cur:
+            self._execute(cur, ("catalog_versions",), lambda: "SELECT tabla, version FROM catalogo_version")
+            return dict(cur.fetchall())
+
+    def _execute(self, cur, key, build, params=(), prepare=True):
+        """
+        Ejecuta una sentencia a través de `self.statements`: se compone una vez por firma y se
+        prepara en el servidor en cada conexión la primera vez que se usa.
+
+        Args:
+            cur (psycopg2.cursor): Cursor donde se ejecuta.
+            key (tuple): Firma de la sentencia (operación, tabla, columnas...).
+            build (callable): Función sin argumentos que devuelve la sentencia.
+            params (sequence): Valores de los parámetros.
+            prepare (bool): Si False sólo se reutiliza el texto compuesto.
+        """
+        self.statements.execute(cur, key, build, params, prepare)
 
     def create_table(self, table_name, columns: dict):
         """
@@ -65,49 +229,129 @@ class PostgresDatabaseManager:
             table_name (str): Nombre de la tabla.
             columns (dict): Diccionario con nombres de columnas y sus tipos de datos.
         """
-        self.connection()
         columns_with_types = ", ".join([f"{col} {typ}" for col, typ in columns.items()])
         create_table_sql = sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(
             sql.Identifier(table_name),
             sql.SQL(columns_with_types)
         )
-        self.cursor.execute(create_table_sql)
-        self.conn.commit()
-        self.conn.close()
+        with self.cursor() as cur:
+            cur.execute(create_table_sql)
 
-    def insert(self, table_name, values: list):
+    def upsert(self, table_name, values: list, update=True, page_size=5000):
         """
-        Inserta registros en una tabla. Verifica si el registro ya existe antes de insertar.
+        Inserta o actualiza registros en bloque con `INSERT ... ON CONFLICT`, enviando hasta
+        `page_size` filas por sentencia con `execute_values`. Si el lote repite la clave única de la
+        tabla (`conflict_keys`) sólo se envía la última fila de cada clave, como hace `bulk_upsert`:
+        PostgreSQL no deja que un mismo ON CONFLICT DO UPDATE toque dos veces la misma fila.
 
         Args:
             table_name (str): Nombre de la tabla.
-            values (list): Lista de diccionarios con los valores a insertar.
-        """
-        self.connection()
-        keys = ", ".join(values[0].keys())
-        placeholders = ", ".join(["%s"] * len(values[0]))
-        
-        # Verificar si el registro ya existe
-        if table_name in ["ingredientes", "receta"]:
-            self.cursor.execute(
-                sql.SQL("SELECT COUNT(*) FROM {} WHERE nombre = %s").format(sql.Identifier(table_name)),
-                (values[0]["nombre"],)
-            )
-            exists = self.cursor.fetchone()[0] > 0
-        else:
-            exists = False
-        
-        if not exists:
-            query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+            values (list): Lista de diccionarios con los valores; todos con las mismas claves.
+            update (bool): Si True, los registros existentes se actualizan con los valores nuevos;
+                si False, se dejan como están.
+            page_size (int): Filas por sentencia enviada al servidor.
+
+        Returns:
+            list: IDs de los registros insertados o actualizados, en el orden devuelto por el servidor.
+        """
+        if not values:
+            return []
+        keys = list(values[0].keys())
+
+        def build():
+            # Las columnas van sin comillas, como en el DDL de `tables`: así "cantidad_Receta" se
+            # resuelve a la columna en minúsculas que creó PostgreSQL.
+            query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
                 sql.Identifier(table_name),
-                sql.SQL(keys),
-                sql.SQL(placeholders)
+                sql.SQL(", ").join(map(sql.SQL, keys))
+            )
+            return query + self._on_conflict(table_name, keys, update) + sql.SQL(" RETURNING id")
+        data = [tuple(record[k] for k in keys) for record in values]
+        conflict = conflict_keys.get(table_name)
+        if conflict and all(k in keys for k in conflict):
+            posiciones = [keys.index(k) for k in conflict]
+            ultimas = {}
+            for row in data:
+                clave = tuple(row[i] for i in posiciones)
+                ultimas.pop(clave, None)
+                ultimas[clave] = row
+            data = list(ultimas.values())
+        with self.cursor() as cur:
+            # El número de filas varía en cada llamada: se reutiliza el texto, no se prepara.
+            query = cur.template = self.statements.text(("upsert", table_name, tuple(keys), update), build, cur)
+            rows = execute_values(cur, query, data, page_size=page_size, fetch=True)
+        self._invalidate(table_name)
+        return [r[0] for r in rows]
+
+    def _on_conflict(self, table_name, keys, update):
+        """
+        Compone la cláusula ON CONFLICT de un INSERT según la clave única de la tabla (`conflict_keys`).
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            keys (list): Columnas insertadas.
+            update (bool): Si True se actualizan los registros existentes; si False se omiten.
+
+        Returns:
+            sql.Composable: Cláusula, vacía si la tabla no tiene clave única.
+        """
+        conflict = conflict_keys.get(table_name)
+        if not conflict:
+            return sql.SQL("")
+        target = sql.SQL(", ").join(map(sql.SQL, conflict))
+        changes = [k for k in keys if k not in conflict]
+        if update and changes:
+            return sql.SQL(" ON CONFLICT ({}) DO UPDATE SET {}, updated_at = CURRENT_TIMESTAMP").format(
+                target,
+                sql.SQL(", ").join(
+                    sql.SQL("{0} = EXCLUDED.{0}").format(sql.SQL(k)) for k in changes
+                )
             )
-            data = [tuple(record.values()) for record in values]
-            self.cursor.executemany(query, data)
-            self.conn.commit()
-        
-        self.conn.close()
+        return sql.SQL(" ON CONFLICT ({}) DO NOTHING").format(target)
+
+    def bulk_upsert(self, table_name, columns, rows, update=True):
+        """
+        Carga un volumen grande de registros con memoria constante: las filas se envían con
+        `COPY FROM STDIN` a una tabla temporal a medida que se leen, y se llevan a la tabla con un
+        único `INSERT ... SELECT ... ON CONFLICT`. Si una clave única se repite gana la última fila.
+        Todo ocurre en una transacción; dentro de `transaction()` se une a la exterior.
+
+        Args:
+            table_name (str): Nombre de la tabla; debe tener clave en `conflict_keys`.
+            columns (list): Columnas cargadas, incluida la clave única.
+            rows (iterable): Tuplas en el orden de `columns`; se consumen mientras se copian.
+            update (bool): Si True los registros existentes se actualizan; si False se omiten.
+
+        Returns:
+            tuple: (filas copiadas, registros insertados o actualizados).
+        """
+        conflict = conflict_keys[table_name]
+        staging = sql.Identifier(f"staging_{table_name}")
+        cols = sql.SQL(", ").join(map(sql.SQL, columns))
+        source = _CopySource(rows)
+        with self.transaction():
+            with self.cursor() as cur:
+                cur.execute(sql.SQL(
+                    "CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA"
+                ).format(staging, cols, sql.Identifier(table_name)))
+                cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN orden BIGSERIAL").format(staging))
+                cur.copy_expert(
+                    sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(staging, cols).as_string(cur),
+                    source
+                )
+                cur.execute(sql.SQL("""
+                    INSERT INTO {table} ({cols})
+                    SELECT DISTINCT ON ({key}) {cols} FROM {staging} ORDER BY {key}, orden DESC
+                """).format(
+                    table=sql.Identifier(table_name),
+                    cols=cols,
+                    key=sql.SQL(", ").join(map(sql.SQL, conflict)),
+                    staging=staging
+                ) + self._on_conflict(table_name, columns, update))
+                merged = cur.rowcount
+                cur.execute(sql.SQL("DROP TABLE {}").format(staging))
+            self._invalidate(table_name)
+        return source.count, merged
 
     def delete(self, table_name, id_value, condition=None):
         """
@@ -123,31 +367,30 @@ class PostgresDatabaseManager:
             dict: {'Error': str} en caso de error.
         """
         try:
-            self.connection()
-
-            if condition is None:
-                query = sql.SQL("DELETE FROM {} WHERE ID = %s").format(sql.Identifier(table_name))
-                self.cursor.execute(query, (id_value,))
-            else:
-                query = sql.SQL("DELETE FROM {} WHERE ID = %s AND {}").format(
-                    sql.Identifier(table_name),
-                    sql.SQL(condition)
-                )
-                self.cursor.execute(query, (id_value,))
-            
-            self.conn.commit()
-            rows_deleted = self.cursor.rowcount
+            with self.cursor() as cur:
+                if condition is None:
+                    self._execute(
+                        cur, ("delete", table_name),
+                        lambda: sql.SQL("DELETE FROM {} WHERE ID = %s").format(sql.Identifier(table_name)),
+                        (id_value,)
+                    )
+                else:
+                    # La condición suele llevar valores literales: sólo se reutiliza el texto.
+                    self._execute(
+                        cur, ("delete", table_name, condition),
+                        lambda: sql.SQL("DELETE FROM {} WHERE ID = %s AND {}").format(
+                            sql.Identifier(table_name),
+                            sql.SQL(condition)
+                        ),
+                        (id_value,), prepare=False
+                    )
+                rows_deleted = cur.rowcount
+            self._invalidate(table_name)
             return rows_deleted > 0
 
         except Exception as e:
             return {"Error": str(e)}
 
-        finally:
-            if self.cursor:
-                self.cursor.close()
-            if self.conn:
-                self.conn.close()
-
     def update(self, table_name, id_tabla, condition, data=None):
         """
         Actualiza registros en la tabla especificada.
@@ -161,32 +404,35 @@ class PostgresDatabaseManager:
         Returns:
             dict: {'success': int} con el número de filas afectadas, o {'error': str} en caso de error.
         """
-        self.connection()
         if table_name == "receta":
-            query = sql.SQL("""
-                UPDATE receta
-                SET costo_receta = %s
-                WHERE id = %s;
-            """)
             try:
-                self.cursor.execute(query, (condition, id_tabla))
-                self.conn.commit()
-                return {"success": self.cursor.rowcount}
+                with self.cursor() as cur:
+                    self._execute(
+                        cur, ("update", "receta", ("costo_receta",)),
+                        lambda: "UPDATE receta SET costo_receta = %s WHERE id = %s",
+                        (condition, id_tabla)
+                    )
+                    rows = cur.rowcount
+                self._invalidate(table_name)
+                return {"success": rows}
             except Exception as e:
                 return {"error": str(e)}
         elif table_name == "ingredientes":
-            set_clause = ', '.join([f"{key} = %s" for key in data.keys()])
-            query = sql.SQL("""
-                UPDATE {table}
-                SET {set_clause}
-                WHERE id = %s;
-            """).format(
-                table=sql.Identifier(table_name),
-                set_clause=sql.SQL(set_clause)
-            )
-            self.cursor.execute(query, list(data.values()) + [id_tabla])
-            self.conn.commit()
-        self.conn.close()
+            columns = tuple(data.keys())
+
+            def build():
+                set_clause = ', '.join([f"{key} = %s" for key in columns])
+                return sql.SQL("""
+                    UPDATE {table}
+                    SET {set_clause}
+                    WHERE id = %s
+                """).format(
+                    table=sql.Identifier(table_name),
+                    set_clause=sql.SQL(set_clause)
+                )
+            with self.cursor() as cur:
+                self._execute(cur, ("update", table_name, columns), build, list(data.values()) + [id_tabla])
+            self._invalidate(table_name)
 
     def selection(self, table_name, condition=None, boll=False, param: list = []):
         """
@@ -195,131 +441,347 @@ class PostgresDatabaseManager:
         Args:
             table_name (str): Nombre de la tabla.
             condition (str or None): Condición para la selección de datos.
-            boll (bool): Si True, se realiza una consulta con un CTE para seleccionar datos únicos.
+            boll (bool): Si True, `condition` es el id de una receta y se devuelve la línea vigente
+                de cada ingrediente de esa receta (`CURRENT_LINES_SQL`); sólo aplica a "cant_ing".
             param (list): Parámetros adicionales para la consulta.
 
         Returns:
             list: Resultados de la consulta.
             dict: {'404': 'no hay valores'} si no hay resultados.
         """
-        self.connection()
         if condition is None:
-            query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
-            self.cursor.execute(query)
-            return self.cursor.fetchall()
+            def load():
+                with self.cursor() as cur:
+                    self._execute(
+                        cur, ("selection", table_name),
+                        lambda: sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
+                    )
+                    return cur.fetchall()
+            return self._cached((table_name, "all"), load)
         elif condition and not boll:
-            query = sql.SQL("SELECT * FROM {} {}").format(
-                sql.Identifier(table_name),
-                sql.SQL(condition)
-            )
-            self.cursor.execute(query, param)
-            return self.cursor.fetchone()
+            build = lambda: sql.SQL("SELECT * FROM {} {}").format(sql.Identifier(table_name), sql.SQL(condition))
+            placeholders = numbered(condition)[1]
+            with self.cursor() as cur:
+                if placeholders and placeholders == len(param):
+                    # Sólo una condición con marcadores tiene un texto estable que valga guardar y preparar.
+                    self._execute(cur, ("selection", table_name, condition), build, param)
+                else:
+                    # Con los valores escritos en la condición cada llamada es un texto distinto: se
+                    # ejecuta sin pasar por `self.statements` para no llenarlo de sentencias de un uso.
+                    cur.execute(build(), param or None)
+                return cur.fetchone()
         elif condition and boll:
-            query = sql.SQL("""
-            WITH RankedIngredients AS (
-                SELECT
-                    id,
-                    id_ingrediente,
-                    id_receta,
-                    cantidad,
-                    precio,
-                    ROW_NUMBER() OVER (PARTITION BY id_ingrediente ORDER BY created_at DESC) AS rn
-                FROM
-                    {}
-                WHERE
-                    id_receta = %s
-            )
-            SELECT
-                id,
-                id_ingrediente,
-                id_receta,
-                cantidad,
-                precio
-            FROM
-                RankedIngredients
-            WHERE
-                rn = 1;
-            """).format(sql.Identifier(table_name))
-            self.cursor.execute(query, (condition,))
-            return self.cursor.fetchall()
+            with self.cursor() as cur:
+                self._execute(cur, ("current_lines",), lambda: CURRENT_LINES_SQL, (condition,))
+                return cur.fetchall()
         else:
             return {"404": "no hay valores"}
 
+    def update_column(self, table_name, column, values: list):
+        """
+        Actualiza una misma columna en muchos registros con una sola sentencia
+        `UPDATE ... FROM (VALUES ...)`.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            column (str): Columna a actualizar.
+            values (list): Lista de tuplas (id, valor).
+
+        Returns:
+            int: Número de filas actualizadas.
+        """
+        if not values:
+            return 0
+        with self.cursor() as cur:
+            query = self.statements.text(
+                ("update_column", table_name, column),
+                lambda: sql.SQL("""
+                    UPDATE {table} AS t
+                    SET {column} = v.valor, updated_at = CURRENT_TIMESTAMP
+                    FROM (VALUES %s) AS v(id, valor)
+                    WHERE t.id = v.id
+                """).format(table=sql.Identifier(table_name), column=sql.Identifier(column)),
+                cur
+            )
+            cur.template = query
+            execute_values(cur, query, values, page_size=len(values))
+            rows = cur.rowcount
+        self._invalidate(table_name)
+        return rows
+
+    def selection_by_ids(self, table_name, ids=None):
+        """
+        Selecciona los registros cuyos id están en `ids`, o todos si `ids` es None, ordenados por id.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            ids (list or None): IDs a seleccionar.
+
+        Returns:
+            list: Resultados de la consulta.
+        """
+        params = [] if ids is None else [list(ids)]
+
+        def build():
+            query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
+            if ids is not None:
+                query += sql.SQL(" WHERE id = ANY(%s)")
+            return query + sql.SQL(" ORDER BY id")
+        with self.cursor() as cur:
+            self._execute(cur, ("selection_by_ids", table_name, ids is None), build, params)
+            return cur.fetchall()
+
+    def current_lines_with_prices(self, id_recetas=None):
+        """
+        Devuelve la línea vigente de cada ingrediente de cada receta junto con el precio actual
+        del ingrediente, para todas las recetas o sólo las indicadas.
+
+        Args:
+            id_recetas (list or None): IDs de receta a incluir, o None para todas.
+
+        Returns:
+            list: Tuplas (id_receta, id_ingrediente, cantidad, precio_ingrediente, nombre_ingrediente).
+        """
+        params = [] if id_recetas is None else [list(id_recetas)]
+
+        def build():
+            where = sql.SQL("") if id_recetas is None else sql.SQL("WHERE c.id_receta = ANY(%s)")
+            return sql.SQL("""
+                SELECT c.id_receta, c.id_ingrediente, c.cantidad, i.precio, i.nombre
+                FROM cant_ing_actual c
+                JOIN ingredientes i ON i.id = c.id_ingrediente
+                {}
+                ORDER BY c.id_receta, c.id_ingrediente
+            """).format(where)
+        with self.cursor() as cur:
+            self._execute(cur, ("current_lines_with_prices", id_recetas is None), build, params)
+            return cur.fetchall()
+
+    def recipes_using(self, id_ingredientes):
+        """
+        Devuelve las recetas que usan alguno de los ingredientes dados, resuelto con el índice
+        cant_ing_ingrediente_receta_idx sin recorrer el historial completo.
+
+        Args:
+            id_ingredientes (list): IDs de ingredientes.
+
+        Returns:
+            list: IDs de las recetas afectadas, ordenados.
+        """
+        with self.cursor() as cur:
+            self._execute(
+                cur, ("recipes_using",),
+                lambda: "SELECT DISTINCT id_receta FROM cant_ing WHERE id_ingrediente = ANY(%s) ORDER BY id_receta",
+                (list(id_ingredientes),)
+            )
+            return [r[0] for r in cur.fetchall()]
+
+    def costo_recetas(self, id_recetas=None):
+        """
+        Devuelve el desglose de costo calculado en el servidor por la función `costo_receta`, sin
+        traer las líneas de las recetas.
+
+        Args:
+            id_recetas (list, optional): IDs de receta. Por defecto todas.
+
+        Returns:
+            list: Tuplas (id_receta, nombre, lineas, costo_ingredientes, ganancia, costo_unitario,
+                costo_paquete, precio_sugerido) ordenadas por id_receta; los costos son None si la
+                receta no tiene unidades.
+        """
+        with self.cursor() as cur:
+            self._execute(
+                cur, ("costo_recetas",),
+                lambda: "SELECT * FROM costo_receta(%s)",
+                (list(id_recetas) if id_recetas is not None else None,)
+            )
+            return cur.fetchall()
+
+    def guardar_costo_recetas(self, id_recetas=None):
+        """
+        Escribe en `costo_receta` el costo de paquete que calcula el servidor, en una sola sentencia
+        y sin transferir datos. Sólo se actualizan las recetas con líneas y costo válido.
+
+        Args:
+            id_recetas (list, optional): IDs de receta. Por defecto todas.
+
+        Returns:
+            int: Número de recetas actualizadas.
+        """
+        with self.cursor() as cur:
+            self._execute(cur, ("guardar_costo_recetas",), lambda: """
+                UPDATE receta r SET costo_receta = c.costo_paquete
+                FROM costo_receta(%s) c
+                WHERE r.id = c.id_receta AND c.lineas > 0 AND c.costo_paquete IS NOT NULL
+            """, (list(id_recetas) if id_recetas is not None else None,))
+            rows = cur.rowcount
+        self._invalidate("receta")
+        return rows
+
+    def selection_page(self, table_name, after=None, order_by="id", page_size=100):
+        """
+        Selecciona una página de la tabla con paginación por clave (keyset): en lugar de OFFSET se
+        filtra por la última clave de la página anterior, así cada página cuesta lo mismo sin
+        importar cuántas filas la preceden. `order_by` debe ser una columna indexada; se desempata
+        por `id` para que el orden sea total.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            after (tuple or None): Clave devuelta por la página anterior, o None para la primera.
+            order_by (str): Columna de ordenación.
+            page_size (int): Filas por página.
+
+        Returns:
+            tuple: (filas, clave_siguiente). `clave_siguiente` es None si no hay más páginas.
+        """
+        keys = ["id"] if order_by == "id" else [order_by, "id"]
+        params = list(after or ()) + [page_size]
+
+        def build():
+            key_sql = sql.SQL(", ").join(map(sql.Identifier, keys))
+            query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
+            if after is not None:
+                query += sql.SQL(" WHERE ({}) > ({})").format(key_sql, sql.SQL(", ").join([sql.Placeholder()] * len(keys)))
+            return query + sql.SQL(" ORDER BY {} LIMIT %s").format(key_sql)
+
+        def load():
+            with self.cursor() as cur:
+                self._execute(cur, ("selection_page", table_name, order_by, after is None), build, params)
+                return [tuple(c.name for c in cur.description)] + cur.fetchall()
+        result = self._cached((table_name, "page", after, order_by, page_size), load)
+        columns, rows = list(result[0]), result[1:]
+        if len(rows) < page_size:
+            return rows, None
+        positions = [columns.index(k) for k in keys]
+        return rows, tuple(rows[-1][p] for p in positions)
+
+    def stream(self, query, params=None, itersize=2000):
+        """
+        Ejecuta una consulta con un cursor con nombre (del lado del servidor) y entrega las filas
+        de a una, trayéndolas en lotes de `itersize`. La memoria usada no depende del tamaño del
+        resultado. La conexión queda prestada hasta agotar o cerrar el generador.
+
+        Args:
+            query (str or sql.Composable): Consulta a ejecutar.
+            params (list or None): Parámetros de la consulta.
+            itersize (int): Filas traídas del servidor en cada lote.
+
+        Yields:
+            tuple: Cada fila del resultado.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                cur.itersize = itersize
+                cur.execute(query, params)
+                for row in cur:
+                    yield row
+            conn.commit()
+
+    def iter_selection(self, table_name, order_by="id", itersize=2000):
+        """
+        Recorre toda la tabla en orden mediante `stream`, sin cargarla en memoria.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            order_by (str): Columna de ordenación.
+            itersize (int): Filas traídas del servidor en cada lote.
+
+        Yields:
+            tuple: Cada fila de la tabla.
+        """
+        query = sql.SQL("SELECT * FROM {} ORDER BY {}").format(
+            sql.Identifier(table_name),
+            sql.Identifier(order_by)
+        )
+        yield from self.stream(query, itersize=itersize)
+
+    def reporte_costos(self, itersize=2000):
+        """
+        Recorre el reporte de costos (`COST_REPORT_SQL`) con un cursor del lado del servidor.
+
+        Args:
+            itersize (int): Filas traídas del servidor en cada lote.
+
+        Yields:
+            tuple: Filas del reporte, ver `StorageBackend.reporte_costos`.
+        """
+        yield from self.stream(COST_REPORT_SQL, itersize=itersize)
+
     def init_data(self):
         """
-        Inicializa las tablas en la base de datos usando los esquemas proporcionados en `tables`.
-        """
-        for t in tables[0]:
-            self.create_table(t, tables[0][t])
-
-
-
-
-# import sqlite3
-# from data.data_injection import tables
-
-# class Database_manager:
-#     def __init__(self,db_name):
-#         self.db_name = db_name
-#         self.conn = sqlite3.connect(db_name)
-#         self.cursor = self.conn.cursor()
-#     def connection(self):
-#         self.conn = sqlite3.connect(self.db_name)
-#         self.cursor = self.conn.cursor()
-#         return self.cursor
-
-#     def create_table(self, table_name,columns:dict):
-#         self.connection()
-#         columns_with_types = ", ".join([f"{col} {typ}"for col, typ in columns.items()])
-#         create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ({columns_with_types})"
-#         self.cursor.execute(create_table_sql)
-#         self.conn.commit()
-#         self.conn.close()
-#     def insert(self,table_name, values:list):
-#         self.connection()
-#         keys = ", ".join(values[0].keys())
-#         placeholders = ", ".join("?" * len(values[0]))
-#         global exists
-#         if table_name == "ingredientes":
-#             self.cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE nombre = ?",(values[0]["nombre"],))
-#             exists = self.cursor.fetchone()[0] > 0
-#         elif table_name == "cant_ing":
-#             query = f"INSERT INTO {table_name} ({keys})VALUES ({placeholders})"
-#             datos = [tuple(record.values())for record in values]
-#             self.cursor.executemany(query,datos)
-#             self.conn.commit()
-#         if not exists:
-#             query = f"INSERT INTO {table_name} ({keys})VALUES ({placeholders})"
-#             datos = [tuple(record.values())for record in values]
-#             self.cursor.executemany(query,datos)
-#             self.conn.commit()
-#         self.conn.close()
-#     def delete(self,table_name,id_value,condition=None):
-#         self.connection()
-#         if condition == None:
-#             query = f"DELETE FROM {table_name} WHERE ID = ?"
-#             self.cursor.execute(query,(id_value,))
-
-#             self.conn.commit()
-#         self.conn.close()
-#     def update(self,table_name,values,condition):
-#         pass
-#     def selection(self,table_name,condition=None,param:list=[]):
-#         self.connection()
-#         if condition == None:
-#             query = f"SELECT * FROM {table_name}"
-#             self.cursor.execute(query)
-#             return self.cursor.fetchall()
-#         elif condition:
-#             query = f"SELECT * FROM {table_name} {condition}"
-#             self.cursor.execute(query,(param[0],param[1]))
-#             return self.cursor.fetchone()
-
-#         else:
-#             return {"404":"no hay valores"}
-        
-
-
-#     def init_data(self):
-#         for t in tables[0]:
-#             self.create_table(t,tables[0][t])
+        Lleva el esquema a la última versión de `migrations`. Con el esquema al día sólo cuesta una
+        consulta de versión; si hay migraciones pendientes se aplican todas en una única transacción,
+        bajo un candado consultivo para que dos estaciones no las apliquen a la vez.
+
+        Returns:
+            int: Versión del esquema tras la ejecución.
+        """
+        latest = max(m["version"] for m in migrations)
+        try:
+            with self.cursor() as cur:
+                cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                current = cur.fetchone()[0]
+        except errors.UndefinedTable:
+            current = 0
+        if current >= latest:
+            return current
+
+        with self.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    descripcion TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Otra estación pudo migrar mientras se esperaba el candado.
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = cur.fetchone()[0]
+            for migration in sorted(migrations, key=lambda m: m["version"]):
+                if migration["version"] <= current:
+                    continue
+                for statement in migration["sql"]:
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)",
+                    (migration["version"], migration["descripcion"])
+                )
+                current = migration["version"]
+        # El esquema cambió: las sentencias se vuelven a componer y preparar con nombres nuevos.
+        self.statements.clear()
+        return current
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_db(db_name="turing"):
+    """
+    Devuelve el gestor compartido de la aplicación para la base de datos indicada, creándolo
+    la primera vez. El motor se elige con DB_BACKEND: "postgres" (por defecto) o "sqlite", que
+    guarda la base en el archivo SQLITE_PATH (por defecto `<db_name>.sqlite3`). Ninguno de los
+    dos se conecta al crearse.
+
+    Args:
+        db_name (str): Nombre de la base de datos.
+
+    Returns:
+        StorageBackend: Gestor compartido.
+
+    Raises:
+        ValueError: Si DB_BACKEND no es un motor conocido.
+    """
+    backend = os.getenv("DB_BACKEND", "postgres").lower()
+    with _managers_lock:
+        manager = _managers.get((backend, db_name))
+        if manager is None:
+            if backend == "postgres":
+                manager = PostgresDatabaseManager(db_name)
+            elif backend == "sqlite":
+                manager = SqliteDatabaseManager(db_name, os.getenv("SQLITE_PATH") or f"{db_name}.sqlite3")
+            else:
+                raise ValueError(f"DB_BACKEND desconocido: {backend}; use postgres o sqlite")
+            _managers[(backend, db_name)] = manager
+        return manager
@@ -0,0 +1,376 @@
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+
+from dotenv import load_dotenv
+
+from utils.tracing import tracer
+
+# La configuración se lee al importar el módulo, antes de que otro módulo cargue el .env.
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los intervalos de los histogramas; lo que los supera cae en el último.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_SPACES = re.compile(r"\s+")
+
+
+class Histogram:
+    """
+    Histograma de latencias con intervalos fijos (`BUCKETS_MS`): registrar cuesta lo mismo sin
+    importar cuántas muestras haya y los percentiles se estiman por el intervalo que los contiene.
+    No es seguro entre hilos por sí solo; `QueryMetrics` lo usa con su candado.
+    """
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q):
+        """
+        Estima el percentil `q` (0 a 1) como el límite superior del intervalo que lo contiene.
+
+        Returns:
+            float: Milisegundos; 0 si no hay muestras.
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        """
+        Returns:
+            dict: 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms' y 'buckets'
+                ({'<=límite': muestras}, sólo los intervalos con muestras).
+        """
+        labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+def params_shape(params, many=False):
+    """
+    Describe los parámetros de una sentencia sin sus valores, para el registro de consultas lentas:
+    los tipos y el largo de las listas, que es lo que cambia el plan y el costo de la consulta.
+
+    Args:
+        params: Parámetros pasados al cursor.
+        many (bool): Si `params` es la secuencia de filas de un `executemany`; se resume con la
+            cantidad de filas y la forma de la primera, sin recorrer el lote.
+
+    Returns:
+        str or None: Por ejemplo "(int, str, list[120])" o, con `many`, "list[10000] of (int, str)".
+    """
+    if params is None:
+        return None
+    if many:
+        if not isinstance(params, (list, tuple)):
+            return type(params).__name__
+        return f"{type(params).__name__}[{len(params)}]" + (f" of {params_shape(params[0])}" if params else "")
+
+    def shape(value):
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        if isinstance(value, dict):
+            return f"dict[{len(value)}]"
+        return type(value).__name__
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {shape(v)}" for k, v in params.items()) + "}"
+    if isinstance(params, (list, tuple)):
+        return "(" + ", ".join(shape(v) for v in params) + ")"
+    return shape(params)
+
+
+def _statement_text(text):
+    # Texto de una sentencia en una línea y acotado, para el registro de lentas y las trazas.
+    if isinstance(text, bytes):
+        text = text.decode(errors="replace")
+    text = _SPACES.sub(" ", str(text)).strip()
+    return text if len(text) <= 500 else text[:500] + "..."
+
+
+def _rows(result):
+    # Filas que devolvió una operación según la forma de su resultado.
+    if isinstance(result, bool) or result is None or isinstance(result, dict):
+        return 0
+    if isinstance(result, int):
+        return max(result, 0)
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        if len(result) == 2 and isinstance(result[0], list):  # (filas, clave_siguiente)
+            return len(result[0])
+        if len(result) == 2 and all(isinstance(v, int) for v in result):  # (copiadas, fusionadas)
+            return max(result[1], 0)
+        return 1
+    return 0
+
+
+class _Operation:
+    # Acumulados de una operación: sólo la latencia total lleva histograma.
+    __slots__ = ("latency", "connect_ms", "execute_ms", "rows", "errors", "statements")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.connect_ms = 0.0
+        self.execute_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.statements = 0
+
+
+class _Frame:
+    # Tiempos acumulados por la operación en curso de un hilo.
+    __slots__ = ("name", "connect", "execute", "statements")
+
+    def __init__(self, name):
+        self.name = name
+        self.connect = 0.0
+        self.execute = 0.0
+        self.statements = 0
+
+
+class QueryMetrics:
+    """
+    Métricas de la capa de datos del proceso. Cada operación pública de un `StorageBackend`
+    (`selection`, `upsert`...) registra su latencia total en un histograma, junto con las filas
+    devueltas y cómo se reparte el tiempo: espera y apertura de conexiones (`connect`) frente a
+    ejecución de sentencias (`execute`); el resto es trabajo de Python. Las sentencias que tardan
+    más de `slow_ms` se guardan en un registro acotado de consultas lentas con su texto y la forma
+    de sus parámetros, y se emiten como advertencia en el logger `data.metrics`.
+
+    Las operaciones anidadas (`insert` llama a `upsert`) se cuentan sólo en la exterior.
+
+    Atributos:
+        enabled (bool): Si False no se registra nada.
+        slow_ms (float): Umbral del registro de consultas lentas, en milisegundos.
+        slow (deque): Últimas consultas lentas, hasta `slow_log_size`.
+    """
+    def __init__(self, slow_ms=200.0, slow_log_size=100, enabled=True):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.slow = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Descarta todo lo registrado.
+        """
+        with self._lock:
+            self._operations = {}
+            self._checkout = Histogram()
+            self._opened = Histogram()
+            self._statements = Histogram()
+            self.slow.clear()
+
+    def measured(self, name):
+        """
+        Decorador que mide cada llamada al método como la operación `name`, seguida del nombre de
+        la tabla si el primer argumento es uno. Los generadores se miden hasta agotarse o cerrarse
+        y sus filas son los elementos entregados. Con el trazado activo (`utils.tracing`) cada
+        llamada es además un tramo "db".
+
+        Args:
+            name (str): Nombre de la operación.
+
+        Returns:
+            callable: Decorador.
+        """
+        def decorator(func):
+            if inspect.isgeneratorfunction(func):
+                @wraps(func)
+                def generator(manager, *args, **kwargs):
+                    if not self.enabled or getattr(self._local, "frame", None) is not None:
+                        yield from func(manager, *args, **kwargs)
+                        return
+                    frame = _Frame(self._label(name, args))
+                    gen = func(manager, *args, **kwargs)
+                    rows, failed, start = 0, False, time.perf_counter()
+                    try:
+                        while True:
+                            # La operación sólo está en curso mientras el generador trabaja, no
+                            # mientras quien lo consume procesa cada fila.
+                            self._local.frame = frame
+                            try:
+                                row = next(gen)
+                            except StopIteration:
+                                return
+                            finally:
+                                self._local.frame = None
+                            rows += 1
+                            yield row
+                    except BaseException as e:
+                        failed = not isinstance(e, GeneratorExit)
+                        raise
+                    finally:
+                        gen.close()
+                        seconds = time.perf_counter() - start
+                        self._record(frame, seconds, rows, failed)
+                        tracer.complete(frame.name, "db", seconds, rows=rows)
+                return generator
+
+            @wraps(func)
+            def wrapper(manager, *args, **kwargs):
+                if not self.enabled or getattr(self._local, "frame", None) is not None:
+                    return func(manager, *args, **kwargs)
+                frame = self._local.frame = _Frame(self._label(name, args))
+                start = time.perf_counter()
+                result, failed = None, True
+                try:
+                    if tracer.enabled:
+                        with tracer.span(frame.name, "db"):
+                            result = func(manager, *args, **kwargs)
+                    else:
+                        result = func(manager, *args, **kwargs)
+                    failed = isinstance(result, dict) and ("Error" in result or "error" in result)
+                    return result
+                finally:
+                    self._local.frame = None
+                    self._record(frame, time.perf_counter() - start, _rows(result), failed)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _label(name, args):
+        return f"{name} {args[0]}" if args and isinstance(args[0], str) else name
+
+    def _record(self, frame, seconds, rows, failed):
+        with self._lock:
+            stats = self._operations.get(frame.name)
+            if stats is None:
+                stats = self._operations[frame.name] = _Operation()
+            stats.latency.add(seconds * 1000)
+            stats.connect_ms += frame.connect * 1000
+            stats.execute_ms += frame.execute * 1000
+            stats.rows += rows
+            stats.statements += frame.statements
+            if failed:
+                stats.errors += 1
+
+    def checkout(self, seconds):
+        """
+        Registra el tiempo de espera por una conexión (préstamo del pool o turno de la conexión
+        compartida), incluida su apertura si hizo falta abrirla.
+        """
+        if not self.enabled:
+            return
+        frame = getattr(self._local, "frame", None)
+        if frame is not None:
+            frame.connect += seconds
+        with self._lock:
+            self._checkout.add(seconds * 1000)
+
+    def connection_opened(self, seconds):
+        """
+        Registra la apertura de una conexión nueva con el servidor o el archivo.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._opened.add(seconds * 1000)
+
+    def statement(self, text, params, seconds, many=False):
+        """
+        Registra una sentencia ejecutada; si supera `slow_ms` la agrega al registro de consultas
+        lentas. Con el trazado activo la sentencia es además un tramo "sql".
+
+        Args:
+            text (str or bytes): Texto de la sentencia.
+            params: Parámetros de la sentencia.
+            seconds (float): Tiempo de ejecución.
+            many (bool): Si `params` son las filas de un `executemany` (ver `params_shape`).
+        """
+        if not self.enabled:
+            return
+        frame = getattr(self._local, "frame", None)
+        if frame is not None:
+            frame.execute += seconds
+            frame.statements += 1
+        ms = seconds * 1000
+        with self._lock:
+            self._statements.add(ms)
+        if tracer.enabled:
+            statement = _statement_text(text)
+            tracer.complete(statement[:60], "sql", seconds, statement=statement, params=params_shape(params, many))
+        if ms < self.slow_ms:
+            return
+        entry = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ms": ms,
+            "operation": frame.name if frame is not None else None,
+            "statement": _statement_text(text),
+            "params": params_shape(params, many),
+        }
+        self.slow.append(entry)
+        logger.warning("consulta lenta (%.1f ms) en %s: %s %s", ms, entry["operation"], entry["statement"], entry["params"] or "")
+
+    def snapshot(self):
+        """
+        Devuelve una copia de lo registrado.
+
+        Returns:
+            dict: 'operations' ({operación: {'latency' (`Histogram.summary`), 'connect_ms' y
+                'execute_ms' (totales), 'rows', 'errors', 'statements'}}), 'connections' ('opened',
+                'open', 'checkout'), 'statements' (resumen de todas las sentencias) y 'slow'.
+        """
+        with self._lock:
+            return {
+                "operations": {
+                    name: {
+                        "latency": s.latency.summary(),
+                        "connect_ms": s.connect_ms,
+                        "execute_ms": s.execute_ms,
+                        "rows": s.rows,
+                        "errors": s.errors,
+                        "statements": s.statements,
+                    }
+                    for name, s in self._operations.items()
+                },
+                "connections": {
+                    "opened": self._opened.count,
+                    "open": self._opened.summary(),
+                    "checkout": self._checkout.summary(),
+                },
+                "statements": self._statements.summary(),
+                "slow": list(self.slow),
+            }
+
+
+# Métricas compartidas por todos los gestores del proceso. Se ajustan con METRICS=0 (desactivar),
+# SLOW_QUERY_MS (umbral del registro de consultas lentas) y SLOW_QUERY_LOG_SIZE.
+metrics = QueryMetrics(
+    slow_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+    slow_log_size=int(os.getenv("SLOW_QUERY_LOG_SIZE", "100")),
+    enabled=os.getenv("METRICS", "1") != "0"
+)
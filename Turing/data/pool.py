@@ -0,0 +1,266 @@
+import logging
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from data.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones PostgreSQL seguro entre hilos, compartido por todo el proceso.
+
+    Las conexiones se abren bajo demanda hasta `maxconn` y se devuelven al pool al terminar
+    en vez de cerrarse, de modo que la siguiente operación reutiliza una conexión ya autenticada.
+
+    Atributos:
+        minconn (int): Número de conexiones ociosas que se conservan aunque superen `max_idle`.
+        maxconn (int): Número máximo de conexiones abiertas (ociosas + en uso).
+        max_idle (float): Segundos que una conexión puede estar ociosa antes de cerrarse.
+        leak_timeout (float): Segundos tras los cuales una conexión prestada se reporta como fuga.
+        checkout_timeout (float): Segundos de espera por una conexión libre antes de fallar.
+        conn_kwargs (dict): Parámetros pasados a `psycopg2.connect`.
+    """
+    def __init__(self, minconn=1, maxconn=10, max_idle=300.0, leak_timeout=60.0, checkout_timeout=10.0, **conn_kwargs):
+        """
+        Inicializa el pool sin abrir conexiones; se crean al primer préstamo.
+
+        Args:
+            minconn (int): Conexiones ociosas mínimas a conservar.
+            maxconn (int): Conexiones máximas abiertas.
+            max_idle (float): Tiempo máximo ocioso en segundos.
+            leak_timeout (float): Tiempo en segundos para considerar una conexión como fuga.
+            checkout_timeout (float): Tiempo máximo de espera por una conexión libre.
+            **conn_kwargs: Parámetros de conexión (dbname, user, password, host, port).
+        """
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise PoolError("configuracion invalida del pool: min=%s max=%s" % (minconn, maxconn))
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.leak_timeout = leak_timeout
+        self.checkout_timeout = checkout_timeout
+        self.conn_kwargs = conn_kwargs
+        self._idle = []
+        self._in_use = {}
+        self._opening = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        """
+        Abre una conexión nueva con los parámetros del pool.
+
+        Returns:
+            psycopg2.connection: Conexión recién abierta.
+        """
+        start = time.monotonic()
+        conn = psycopg2.connect(**self.conn_kwargs)
+        metrics.connection_opened(time.monotonic() - start)
+        return conn
+
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def getconn(self):
+        """
+        Presta una conexión del pool. Reutiliza una ociosa si existe, abre una nueva si no se ha
+        alcanzado `maxconn` o espera a que se devuelva alguna.
+
+        Returns:
+            psycopg2.connection: Conexión lista para usarse.
+
+        Raises:
+            PoolError: Si el pool está cerrado o no se libera ninguna conexión a tiempo.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            self._check_leaks()
+            self._reap_idle()
+            while True:
+                if self._closed:
+                    raise PoolError("el pool de conexiones esta cerrado")
+                while self._idle:
+                    conn, _ = self._idle.pop()
+                    if not conn.closed:
+                        self._lend(conn)
+                        return conn
+                if self._total() < self.maxconn:
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise PoolError("no hay conexiones libres (max=%s)" % self.maxconn)
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._lend(conn)
+        return conn
+
+    def _lend(self, conn):
+        self._in_use[id(conn)] = (conn, time.monotonic(), traceback.extract_stack(limit=12)[:-3], [False])
+
+    def putconn(self, conn, close=False):
+        """
+        Devuelve una conexión al pool. Si quedó una transacción abierta se revierte; si está rota o
+        se pide `close` se descarta.
+
+        Args:
+            conn (psycopg2.connection): Conexión prestada previamente con `getconn`.
+            close (bool): Si True, se cierra en lugar de volver al pool.
+        """
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                raise PoolError("la conexion no pertenece a este pool")
+            if not close and not conn.closed:
+                try:
+                    if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    close = True
+            if close or conn.closed or self._closed:
+                if not conn.closed:
+                    conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión durante el bloque `with` y la devuelve al salir. Ante un error se
+        revierte la transacción; si la conexión quedó inservible se descarta.
+
+        Yields:
+            psycopg2.connection: Conexión prestada.
+        """
+        start = time.perf_counter()
+        conn = self.getconn()
+        metrics.checkout(time.perf_counter() - start)
+        try:
+            yield conn
+        except BaseException:
+            # También GeneratorExit: un generador abandonado debe devolver su conexión.
+            broken = conn.closed
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self.putconn(conn, close=broken)
+            raise
+        else:
+            self.putconn(conn)
+
+    def _reap_idle(self):
+        """
+        Cierra las conexiones ociosas que superan `max_idle`, conservando al menos `minconn`.
+        Debe llamarse con el candado tomado.
+        """
+        now = time.monotonic()
+        keep = []
+        # Las más recientes quedan al final de la lista: se recorren primero para conservarlas.
+        for conn, last_used in reversed(self._idle):
+            if len(keep) >= self.minconn and now - last_used > self.max_idle:
+                conn.close()
+            elif not conn.closed:
+                keep.append((conn, last_used))
+        keep.reverse()
+        self._idle = keep
+
+    def _check_leaks(self):
+        """
+        Registra una advertencia (una sola vez por préstamo) por cada conexión que lleva más de
+        `leak_timeout` segundos prestada, con la traza de dónde se pidió. Debe llamarse con el candado tomado.
+        """
+        now = time.monotonic()
+        for conn, since, stack, reported in self._in_use.values():
+            if not reported[0] and now - since > self.leak_timeout:
+                reported[0] = True
+                logger.warning(
+                    "posible fuga de conexion: prestada hace %.1fs desde\n%s",
+                    now - since, "".join(traceback.format_list(stack))
+                )
+
+    def reap(self):
+        """
+        Ejecuta manualmente la limpieza de conexiones ociosas y la detección de fugas.
+        """
+        with self._cond:
+            self._check_leaks()
+            self._reap_idle()
+
+    def stats(self):
+        """
+        Devuelve el estado actual del pool.
+
+        Returns:
+            dict: Conexiones ociosas, en uso y límites configurados.
+        """
+        with self._cond:
+            return {
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min": self.minconn,
+                "max": self.maxconn,
+            }
+
+    def closeall(self):
+        """
+        Cierra todas las conexiones ociosas y marca el pool como cerrado. Las conexiones prestadas
+        se cierran al devolverse.
+        """
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                if not conn.closed:
+                    conn.close()
+            self._idle = []
+            self._cond.notify_all()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(**conn_kwargs):
+    """
+    Devuelve el pool compartido del proceso para los parámetros de conexión dados, creándolo
+    la primera vez. El tamaño se configura con las variables de entorno POOL_MIN, POOL_MAX,
+    POOL_MAX_IDLE, POOL_LEAK_TIMEOUT y POOL_TIMEOUT.
+
+    Args:
+        **conn_kwargs: Parámetros de conexión (dbname, user, password, host, port).
+
+    Returns:
+        ConnectionPool: Pool compartido.
+    """
+    key = tuple(sorted(conn_kwargs.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(
+                minconn=int(os.getenv("POOL_MIN", "1")),
+                maxconn=int(os.getenv("POOL_MAX", "10")),
+                max_idle=float(os.getenv("POOL_MAX_IDLE", "300")),
+                leak_timeout=float(os.getenv("POOL_LEAK_TIMEOUT", "60")),
+                checkout_timeout=float(os.getenv("POOL_TIMEOUT", "10")),
+                **conn_kwargs
+            )
+            _pools[key] = pool
+        return pool
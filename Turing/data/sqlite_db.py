@@ -0,0 +1,713 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from data.backend import StorageBackend
+from data.data_injection import SQLITE_NOW, cached_tables, conflict_keys, sqlite_migrations, sqlite_table_sql
+from data.metrics import metrics
+
+# Marcadores de psycopg2 en las condiciones que llegan de los hooks: %s pasa a ? y %% a %.
+_PLACEHOLDER = re.compile(r"%([s%])")
+
+# Las columnas TIMESTAMP se leen como datetime, igual que con psycopg2.
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+
+class _Cursor(sqlite3.Cursor):
+    # Cursor que registra en `data.metrics` el tiempo de cada sentencia.
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.statement(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.statement(sql, seq_of_parameters, time.perf_counter() - start, many=True)
+
+
+def _q(text):
+    """
+    Traduce los marcadores %s de una sentencia a los ? de sqlite3.
+
+    Args:
+        text (str): Sentencia con marcadores %s.
+
+    Returns:
+        str: Sentencia con marcadores ?.
+    """
+    return _PLACEHOLDER.sub(lambda m: "?" if m.group(1) == "s" else "%", text)
+
+
+def _ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _ids(values):
+    # Las listas de IDs viajan como un arreglo JSON que se abre con json_each: el texto de la
+    # sentencia no depende del número de IDs y sqlite3 la reutiliza desde su caché.
+    return json.dumps([int(v) for v in values])
+
+
+# Desglose de costo de las recetas, con las mismas fórmulas que la función costo_receta de
+# PostgreSQL (migración 6 de `migrations`). `{filtro}` restringe las recetas.
+COSTO_CTE = """
+    WITH totales AS (
+        SELECT r.id, r.nombre, r.porcentaje_venta, r.unidades_x_receta, r.cant_x_paquete,
+               count(l.id_ingrediente) AS lineas,
+               coalesce(sum(round((
+                   CASE WHEN i.nombre = 'panela' THEN i.precio * 2450 / 3300 ELSE i.precio END
+                   * l.cantidad + 0.20), 3)), 0.0) AS costo_ingredientes
+        FROM receta r
+        LEFT JOIN cant_ing_actual l ON l.id_receta = r.id
+        LEFT JOIN ingredientes i ON i.id = l.id_ingrediente
+        {filtro}
+        GROUP BY r.id
+    ), unitario AS (
+        SELECT t.*, t.costo_ingredientes / nullif(t.unidades_x_receta, 0) AS costo_unitario
+        FROM totales t
+    ), paquete AS (
+        SELECT u.*, (u.costo_unitario * u.cant_x_paquete + 0.01 + 0.03) * 1.15 AS costo_paquete
+        FROM unitario u
+    ), costo AS (
+        SELECT p.id AS id_receta, p.nombre, p.lineas, p.costo_ingredientes,
+               p.porcentaje_venta / 100.0 * p.costo_ingredientes AS ganancia,
+               p.costo_unitario, p.costo_paquete,
+               p.costo_paquete * (1 + p.porcentaje_venta / 100.0) AS precio_sugerido
+        FROM paquete p
+    )
+"""
+_FILTRO_RECETAS = "WHERE r.id IN (SELECT value FROM json_each(?))"
+
+CURRENT_LINES_SQL = """
+    SELECT id_cant_ing, id_ingrediente, id_receta, cantidad, precio
+    FROM cant_ing_actual
+    WHERE id_receta = ?
+    ORDER BY id_ingrediente
+"""
+
+
+class SqliteDatabaseManager(StorageBackend):
+    """
+    Gestor de la base de datos en un archivo SQLite local, para estaciones que trabajan solas:
+    las consultas no salen del proceso y cuestan microsegundos. Implementa `StorageBackend` con
+    la misma semántica que `PostgresDatabaseManager` (upsert por `conflict_keys`, línea vigente
+    en cant_ing_actual mantenida por trigger, desglose de costo como CTE).
+
+    Usa una sola conexión persistente, abierta en la primera operación, en modo WAL y con los
+    pragmas de `PRAGMAS`. Los hilos la comparten por turnos con un candado; `transaction()` lo
+    retiene hasta confirmar. `stream` abre una conexión de sólo lectura aparte, que en WAL lee
+    sin bloquear a los escritores. sqlite3 guarda hasta STATEMENT_CACHE_SIZE sentencias
+    compiladas por conexión, el equivalente local de las sentencias preparadas.
+
+    Atributos:
+        db_name (str): Nombre lógico de la base de datos.
+        path (str): Ruta del archivo de la base de datos.
+        cache (CatalogCache): Caché de las lecturas de catálogo (ver `StorageBackend`).
+    """
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        # En WAL, NORMAL sólo sincroniza en los checkpoints: un corte de luz puede perder la última
+        # transacción pero nunca corrompe la base.
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA busy_timeout = 5000",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -65536",
+        "PRAGMA mmap_size = 268435456",
+    )
+
+    def __init__(self, db_name, path=None):
+        """
+        Inicializa el gestor sin abrir el archivo.
+
+        Args:
+            db_name (str): Nombre lógico de la base de datos.
+            path (str, optional): Ruta del archivo. Por defecto `<db_name>.sqlite3`.
+        """
+        super().__init__(db_name)
+        self.path = path or f"{db_name}.sqlite3"
+        self._conn = None
+        self._lock = threading.RLock()
+        self._cached_statements = int(os.getenv("STATEMENT_CACHE_SIZE", "256"))
+
+    def _connect(self, read_only=False):
+        start = time.perf_counter()
+        conn = self._open(read_only)
+        metrics.connection_opened(time.perf_counter() - start)
+        return conn
+
+    def _open(self, read_only):
+        if read_only:
+            conn = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA busy_timeout = 5000")
+            return conn
+        conn = sqlite3.connect(
+            self.path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+            check_same_thread=False, cached_statements=self._cached_statements
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @property
+    def connection(self):
+        """
+        Conexión persistente del gestor, abierta en el primer uso.
+
+        Returns:
+            sqlite3.Connection: Conexión en modo autocommit; las transacciones se abren a mano.
+        """
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def close(self):
+        """
+        Cierra la conexión persistente tras dejar que SQLite actualice sus estadísticas.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("PRAGMA optimize")
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def cursor(self):
+        """
+        Toma la conexión, abre una transacción y entrega un cursor. Al salir del bloque se hace
+        commit; ante un error se revierte. Dentro de `transaction()` no abre ni confirma nada.
+
+        Yields:
+            sqlite3.Cursor: Cursor para ejecutar consultas (con marcadores ?).
+        """
+        conn = self.connection
+        start = time.perf_counter()
+        with self._lock:
+            metrics.checkout(time.perf_counter() - start)
+            cur = conn.cursor(_Cursor)
+            try:
+                if getattr(self._local, "conn", None) is not None:
+                    yield cur
+                    return
+                cur.execute("BEGIN")
+                try:
+                    yield cur
+                except BaseException:
+                    cur.execute("ROLLBACK")
+                    raise
+                cur.execute("COMMIT")
+            finally:
+                cur.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unidad de trabajo: las operaciones hechas en este hilo dentro del bloque se confirman
+        juntas al salir o se revierten ante una excepción. Se abre con BEGIN IMMEDIATE, que toma
+        el candado de escritura del archivo al empezar; los demás hilos esperan a que termine.
+
+        Yields:
+            SqliteDatabaseManager: El mismo gestor.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self
+            return
+        conn = self.connection
+        start = time.perf_counter()
+        with self._lock:
+            metrics.checkout(time.perf_counter() - start)
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.conn = conn
+            self._local.dirty = set()
+            try:
+                yield self
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+            finally:
+                dirty = self._local.dirty
+                self._local.conn = None
+                self._local.dirty = None
+                for table_name in dirty:
+                    self.cache.invalidate(table_name)
+
+    def diagnostics(self):
+        """
+        Agrega a `StorageBackend.diagnostics` la ruta del archivo y su tamaño.
+
+        Returns:
+            dict: Diagnóstico del gestor, con 'sqlite'.
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {**super().diagnostics(), "sqlite": {"path": self.path, "bytes": size, "version": sqlite3.sqlite_version}}
+
+    def catalog_versions(self):
+        """
+        Versión de las tablas de catálogo. PRAGMA data_version cambia cuando otra conexión confirma
+        escrituras en el archivo; las propias ya invalidan la caché al escribir.
+
+        Returns:
+            dict: {tabla: versión}, la misma para todas las tablas.
+        """
+        with self.cursor() as cur:
+            version = cur.execute("PRAGMA data_version").fetchone()[0]
+        return {table_name: version for table_name in cached_tables}
+
+    def create_table(self, table_name, columns: dict):
+        """
+        Crea una nueva tabla si no existe, traduciendo los tipos de PostgreSQL (`sqlite_types`).
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            columns (dict): Diccionario con nombres de columnas y sus tipos de datos.
+        """
+        with self.cursor() as cur:
+            cur.execute(sqlite_table_sql(table_name, columns))
+
+    def _on_conflict(self, table_name, keys, update):
+        """
+        Arma la cláusula ON CONFLICT de un INSERT según `conflict_keys`, como en PostgreSQL.
+
+        Returns:
+            str: Cláusula, vacía si la tabla no tiene clave única.
+        """
+        conflict = conflict_keys.get(table_name)
+        if not conflict:
+            return ""
+        changes = [k for k in keys if k not in conflict]
+        if update and changes:
+            return " ON CONFLICT ({}) DO UPDATE SET {}, updated_at = {}".format(
+                ", ".join(conflict), ", ".join(f"{k} = excluded.{k}" for k in changes), SQLITE_NOW
+            )
+        return " ON CONFLICT ({}) DO NOTHING".format(", ".join(conflict))
+
+    def upsert(self, table_name, values: list, update=True, page_size=5000):
+        """
+        Inserta o actualiza registros con `INSERT ... VALUES (...), (...) ON CONFLICT ... RETURNING`,
+        hasta `page_size` filas por sentencia (y dentro del límite de parámetros de SQLite).
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            values (list): Lista de diccionarios con los valores; todos con las mismas claves.
+            update (bool): Si True los registros existentes se actualizan; si False se omiten.
+            page_size (int): Filas por sentencia.
+
+        Returns:
+            list: IDs de los registros insertados o actualizados.
+        """
+        if not values:
+            return []
+        keys = list(values[0].keys())
+        page_size = max(1, min(page_size, 32766 // len(keys)))
+        row = "(" + ", ".join("?" * len(keys)) + ")"
+        head = f"INSERT INTO {_ident(table_name)} ({', '.join(keys)}) VALUES "
+        tail = self._on_conflict(table_name, keys, update) + " RETURNING id"
+        ids = []
+        with self.cursor() as cur:
+            for start in range(0, len(values), page_size):
+                page = values[start:start + page_size]
+                params = [record[k] for record in page for k in keys]
+                cur.execute(head + ", ".join([row] * len(page)) + tail, params)
+                ids.extend(r[0] for r in cur.fetchall())
+        self._invalidate(table_name)
+        return ids
+
+    def bulk_upsert(self, table_name, columns, rows, update=True):
+        """
+        Carga un volumen grande de registros con memoria constante: `executemany` inserta las filas
+        en una tabla temporal a medida que se leen y un único `INSERT ... SELECT ... ON CONFLICT` las
+        lleva a la tabla. Si una clave única se repite gana la última fila. Todo ocurre en una
+        transacción; dentro de `transaction()` se une a la exterior.
+
+        Args:
+            table_name (str): Nombre de la tabla; debe tener clave en `conflict_keys`.
+            columns (list): Columnas cargadas, incluida la clave única.
+            rows (iterable): Tuplas en el orden de `columns`; se consumen mientras se insertan.
+            update (bool): Si True los registros existentes se actualizan; si False se omiten.
+
+        Returns:
+            tuple: (filas leídas, registros insertados o actualizados).
+        """
+        key = ", ".join(conflict_keys[table_name])
+        staging = _ident(f"staging_{table_name}")
+        cols = ", ".join(columns)
+        copied = 0
+
+        def counted():
+            nonlocal copied
+            for row in rows:
+                copied += 1
+                yield row
+        with self.transaction():
+            with self.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+                cur.execute(f"CREATE TEMP TABLE {staging} (orden INTEGER PRIMARY KEY, {cols})")
+                cur.executemany(
+                    f"INSERT INTO temp.{staging} ({cols}) VALUES ({', '.join('?' * len(columns))})", counted()
+                )
+                # El WHERE del SELECT es obligatorio en SQLite para que ON CONFLICT no se lea como parte del JOIN.
+                cur.execute(
+                    f"INSERT INTO {_ident(table_name)} ({cols}) SELECT {cols} FROM temp.{staging} "
+                    f"WHERE orden IN (SELECT max(orden) FROM temp.{staging} GROUP BY {key})"
+                    + self._on_conflict(table_name, columns, update)
+                )
+                merged = cur.rowcount
+                cur.execute(f"DROP TABLE temp.{staging}")
+            self._invalidate(table_name)
+        return copied, merged
+
+    def delete(self, table_name, id_value, condition=None):
+        """
+        Elimina un registro de la tabla especificada basado en el ID y una condición opcional.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            id_value (int): ID del registro a eliminar.
+            condition (str or None): Condición adicional para la eliminación.
+
+        Returns:
+            bool: True si el registro fue eliminado, False en caso contrario.
+            dict: {'Error': str} en caso de error.
+        """
+        query = f"DELETE FROM {_ident(table_name)} WHERE ID = ?"
+        if condition is not None:
+            query += " AND " + _q(condition)
+        try:
+            with self.cursor() as cur:
+                cur.execute(query, (id_value,))
+                rows_deleted = cur.rowcount
+            self._invalidate(table_name)
+            return rows_deleted > 0
+        except Exception as e:
+            return {"Error": str(e)}
+
+    def update(self, table_name, id_tabla, condition, data=None):
+        """
+        Actualiza registros en la tabla especificada.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            id_tabla (int): ID del registro a actualizar.
+            condition (str): Nuevo valor para actualizar (solo para la tabla "receta").
+            data (dict or None): Diccionario con columnas y valores para actualizar (para otras tablas).
+
+        Returns:
+            dict: {'success': int} con el número de filas afectadas, o {'error': str} en caso de error.
+        """
+        if table_name == "receta":
+            try:
+                with self.cursor() as cur:
+                    cur.execute("UPDATE receta SET costo_receta = ? WHERE id = ?", (condition, id_tabla))
+                    rows = cur.rowcount
+                self._invalidate(table_name)
+                return {"success": rows}
+            except Exception as e:
+                return {"error": str(e)}
+        elif table_name == "ingredientes":
+            set_clause = ", ".join(f"{key} = ?" for key in data)
+            with self.cursor() as cur:
+                cur.execute(
+                    f"UPDATE {_ident(table_name)} SET {set_clause} WHERE id = ?", list(data.values()) + [id_tabla]
+                )
+            self._invalidate(table_name)
+
+    def selection(self, table_name, condition=None, boll=False, param: list = []):
+        """
+        Selecciona datos de la tabla especificada. Puede incluir condiciones y filtros adicionales.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            condition (str or None): Condición para la selección de datos, con marcadores %s.
+            boll (bool): Si True, `condition` es el id de una receta y se devuelve la línea vigente
+                de cada ingrediente de esa receta; sólo aplica a "cant_ing".
+            param (list): Parámetros adicionales para la consulta.
+
+        Returns:
+            list: Resultados de la consulta.
+            dict: {'404': 'no hay valores'} si no hay resultados.
+        """
+        if condition is None:
+            def load():
+                with self.cursor() as cur:
+                    return cur.execute(f"SELECT * FROM {_ident(table_name)}").fetchall()
+            return self._cached((table_name, "all"), load)
+        elif condition and not boll:
+            with self.cursor() as cur:
+                return cur.execute(f"SELECT * FROM {_ident(table_name)} {_q(condition)}", param).fetchone()
+        elif condition and boll:
+            with self.cursor() as cur:
+                return cur.execute(CURRENT_LINES_SQL, (condition,)).fetchall()
+        else:
+            return {"404": "no hay valores"}
+
+    def update_column(self, table_name, column, values: list):
+        """
+        Actualiza una misma columna en muchos registros con una sentencia compilada una vez y
+        ejecutada por cada (id, valor) con `executemany`.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            column (str): Columna a actualizar.
+            values (list): Lista de tuplas (id, valor).
+
+        Returns:
+            int: Número de filas actualizadas.
+        """
+        if not values:
+            return 0
+        with self.cursor() as cur:
+            cur.executemany(
+                f"UPDATE {_ident(table_name)} SET {_ident(column)} = ?, updated_at = {SQLITE_NOW} WHERE id = ?",
+                [(valor, id_value) for id_value, valor in values]
+            )
+            rows = cur.rowcount
+        self._invalidate(table_name)
+        return rows
+
+    def selection_by_ids(self, table_name, ids=None):
+        """
+        Selecciona los registros cuyos id están en `ids`, o todos si `ids` es None, ordenados por id.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            ids (list or None): IDs a seleccionar.
+
+        Returns:
+            list: Resultados de la consulta.
+        """
+        query = f"SELECT * FROM {_ident(table_name)}"
+        params = []
+        if ids is not None:
+            query += " WHERE id IN (SELECT value FROM json_each(?))"
+            params = [_ids(ids)]
+        with self.cursor() as cur:
+            return cur.execute(query + " ORDER BY id", params).fetchall()
+
+    def current_lines_with_prices(self, id_recetas=None):
+        """
+        Devuelve la línea vigente de cada ingrediente de cada receta junto con el precio actual
+        del ingrediente, para todas las recetas o sólo las indicadas.
+
+        Args:
+            id_recetas (list or None): IDs de receta a incluir, o None para todas.
+
+        Returns:
+            list: Tuplas (id_receta, id_ingrediente, cantidad, precio_ingrediente, nombre_ingrediente).
+        """
+        where, params = "", []
+        if id_recetas is not None:
+            where, params = "WHERE c.id_receta IN (SELECT value FROM json_each(?))", [_ids(id_recetas)]
+        with self.cursor() as cur:
+            return cur.execute(f"""
+                SELECT c.id_receta, c.id_ingrediente, c.cantidad, i.precio, i.nombre
+                FROM cant_ing_actual c
+                JOIN ingredientes i ON i.id = c.id_ingrediente
+                {where}
+                ORDER BY c.id_receta, c.id_ingrediente
+            """, params).fetchall()
+
+    def recipes_using(self, id_ingredientes):
+        """
+        Devuelve las recetas que usan alguno de los ingredientes dados, con el índice
+        cant_ing_ingrediente_receta_idx.
+
+        Args:
+            id_ingredientes (list): IDs de ingredientes.
+
+        Returns:
+            list: IDs de las recetas afectadas, ordenados.
+        """
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT id_receta FROM cant_ing "
+                "WHERE id_ingrediente IN (SELECT value FROM json_each(?)) ORDER BY id_receta",
+                (_ids(id_ingredientes),)
+            )
+            return [r[0] for r in cur.fetchall()]
+
+    def _costo(self, id_recetas):
+        # CTE del desglose y sus parámetros, filtrado a `id_recetas` si se indican.
+        if id_recetas is None:
+            return COSTO_CTE.format(filtro=""), []
+        return COSTO_CTE.format(filtro=_FILTRO_RECETAS), [_ids(id_recetas)]
+
+    def costo_recetas(self, id_recetas=None):
+        """
+        Devuelve el desglose de costo de las recetas calculado con `COSTO_CTE`.
+
+        Args:
+            id_recetas (list, optional): IDs de receta. Por defecto todas.
+
+        Returns:
+            list: Tuplas (id_receta, nombre, lineas, costo_ingredientes, ganancia, costo_unitario,
+                costo_paquete, precio_sugerido) ordenadas por id_receta; los costos son None si la
+                receta no tiene unidades.
+        """
+        cte, params = self._costo(id_recetas)
+        with self.cursor() as cur:
+            return cur.execute(cte + "SELECT * FROM costo ORDER BY id_receta", params).fetchall()
+
+    def guardar_costo_recetas(self, id_recetas=None):
+        """
+        Escribe en `costo_receta` el costo de paquete de `COSTO_CTE` en una sola sentencia. Sólo se
+        actualizan las recetas con líneas y costo válido.
+
+        Args:
+            id_recetas (list, optional): IDs de receta. Por defecto todas.
+
+        Returns:
+            int: Número de recetas actualizadas.
+        """
+        cte, params = self._costo(id_recetas)
+        with self.cursor() as cur:
+            cur.execute(cte + """
+                UPDATE receta SET costo_receta = c.costo_paquete
+                FROM costo c
+                WHERE receta.id = c.id_receta AND c.lineas > 0 AND c.costo_paquete IS NOT NULL
+            """, params)
+            # sqlite3 no informa rowcount de las sentencias que empiezan con WITH.
+            rows = cur.execute("SELECT changes()").fetchone()[0]
+        self._invalidate("receta")
+        return rows
+
+    def selection_page(self, table_name, after=None, order_by="id", page_size=100):
+        """
+        Selecciona una página de la tabla con paginación por clave (keyset), como
+        `PostgresDatabaseManager.selection_page`.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            after (tuple or None): Clave devuelta por la página anterior, o None para la primera.
+            order_by (str): Columna de ordenación.
+            page_size (int): Filas por página.
+
+        Returns:
+            tuple: (filas, clave_siguiente). `clave_siguiente` es None si no hay más páginas.
+        """
+        keys = ["id"] if order_by == "id" else [order_by, "id"]
+        key_sql = ", ".join(map(_ident, keys))
+        query = f"SELECT * FROM {_ident(table_name)}"
+        if after is not None:
+            query += f" WHERE ({key_sql}) > ({', '.join('?' * len(keys))})"
+        query += f" ORDER BY {key_sql} LIMIT ?"
+
+        def load():
+            with self.cursor() as cur:
+                cur.execute(query, list(after or ()) + [page_size])
+                return [tuple(c[0] for c in cur.description)] + cur.fetchall()
+        result = self._cached((table_name, "page", after, order_by, page_size), load)
+        columns, rows = list(result[0]), result[1:]
+        if len(rows) < page_size:
+            return rows, None
+        positions = [columns.index(k) for k in keys]
+        return rows, tuple(rows[-1][p] for p in positions)
+
+    def stream(self, query, params=None, itersize=2000):
+        """
+        Ejecuta una consulta en una conexión de sólo lectura propia y entrega las filas de a una,
+        leyéndolas en lotes de `itersize`. No retiene el candado de la conexión persistente, así
+        que la aplicación sigue escribiendo mientras se recorre. La conexión se cierra al agotar
+        o cerrar el generador.
+
+        Args:
+            query (str): Consulta a ejecutar, con marcadores %s.
+            params (list or None): Parámetros de la consulta.
+            itersize (int): Filas leídas en cada lote.
+
+        Yields:
+            tuple: Cada fila del resultado.
+        """
+        self.connection  # El archivo y su esquema deben existir antes de abrirlo en sólo lectura.
+        conn = self._connect(read_only=True)
+        try:
+            cur = conn.cursor(_Cursor)
+            cur.execute(_q(query), params or ())
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_selection(self, table_name, order_by="id", itersize=2000):
+        """
+        Recorre toda la tabla en orden mediante `stream`, sin cargarla en memoria.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            order_by (str): Columna de ordenación.
+            itersize (int): Filas leídas en cada lote.
+
+        Yields:
+            tuple: Cada fila de la tabla.
+        """
+        yield from self.stream(f"SELECT * FROM {_ident(table_name)} ORDER BY {_ident(order_by)}", itersize=itersize)
+
+    def reporte_costos(self, itersize=2000):
+        """
+        Recorre el reporte de costos, con `COSTO_CTE` unido a las líneas vigentes, mediante `stream`.
+
+        Args:
+            itersize (int): Filas leídas en cada lote.
+
+        Yields:
+            tuple: Filas del reporte, ver `StorageBackend.reporte_costos`.
+        """
+        yield from self.stream(COSTO_CTE.format(filtro="") + """
+            SELECT c.id_receta, c.nombre, c.lineas, c.costo_ingredientes, c.ganancia, c.costo_unitario,
+                   c.costo_paquete, c.precio_sugerido, i.nombre, l.cantidad, i.precio, i.kg_gr
+            FROM costo c
+            LEFT JOIN cant_ing_actual l ON l.id_receta = c.id_receta
+            LEFT JOIN ingredientes i ON i.id = l.id_ingrediente
+            ORDER BY c.id_receta, l.id_ingrediente
+        """, itersize=itersize)
+
+    def init_data(self):
+        """
+        Lleva el esquema a la última versión de `sqlite_migrations` en una transacción. BEGIN
+        IMMEDIATE toma el candado de escritura del archivo, así que otro proceso no puede migrar a
+        la vez.
+
+        Returns:
+            int: Versión del esquema tras la ejecución.
+        """
+        with self.transaction():
+            with self.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        descripcion TEXT,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                current = cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+                for migration in sorted(sqlite_migrations, key=lambda m: m["version"]):
+                    if migration["version"] <= current:
+                        continue
+                    for statement in migration["sql"]:
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, descripcion) VALUES (?, ?)",
+                        (migration["version"], migration["descripcion"])
+                    )
+                    current = migration["version"]
+        return current
@@ -0,0 +1,194 @@
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from psycopg2 import extensions
+
+from data.metrics import metrics
+
+# Marcadores de psycopg2 en el texto de una sentencia: %s se numera como $1, $2... y %% queda en %.
+_PLACEHOLDER = re.compile(r"%([s%])")
+# Numeración de los nombres de PREPARE, única en el proceso: varios gestores comparten el pool.
+_names = itertools.count(1)
+
+
+class InstrumentedCursor(extensions.cursor):
+    """
+    Cursor de psycopg2 que registra en `data.metrics` el tiempo de cada sentencia. `shown` es el
+    texto que se registra en lugar de la sentencia ejecutada (el de la consulta detrás de un
+    EXECUTE) y se descarta tras cada ejecución; `template` se registra en todas las del cursor,
+    para que `execute_values` no deje en el registro los valores que incrusta en el texto.
+    """
+    shown = None
+    template = None
+
+    def _timed(self, method, query, vars, many=False):
+        start = time.perf_counter()
+        try:
+            return method(query, vars)
+        finally:
+            shown, self.shown = self.shown, None
+            metrics.statement(shown or self.template or query, vars, time.perf_counter() - start, many)
+
+    def execute(self, query, vars=None):
+        return self._timed(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(super().executemany, query, vars_list, many=True)
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            metrics.statement(sql, None, time.perf_counter() - start)
+
+
+class PreparingConnection(extensions.connection):
+    """
+    Conexión de psycopg2 que recuerda qué sentencias preparó en su sesión. Un PREPARE (y un
+    DEALLOCATE) dura lo que la sesión y no se deshace con un rollback, así que el registro sigue
+    siendo válido mientras la conexión vive en el pool. Sus cursores son `InstrumentedCursor`.
+
+    Atributos:
+        prepared (set): Nombres de las sentencias preparadas en esta sesión.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.cursor_factory = InstrumentedCursor
+
+
+def numbered(text):
+    """
+    Convierte los marcadores de psycopg2 de una sentencia en parámetros posicionales de PostgreSQL.
+
+    Args:
+        text (str): Sentencia con marcadores %s.
+
+    Returns:
+        tuple: (sentencia con $1, $2..., cantidad de parámetros).
+    """
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(1) == "%":
+            return "%"
+        count += 1
+        return f"${count}"
+    return _PLACEHOLDER.sub(replace, text), count
+
+
+class StatementCache:
+    """
+    Caché de sentencias compuestas del gestor, por firma (operación, tabla, columnas...). Cada
+    sentencia se compone con `psycopg2.sql` una sola vez y, si se pide, se prepara en el servidor
+    la primera vez que se usa en cada conexión del pool: las siguientes ejecuciones no vuelven a
+    armar el texto ni a planificar la consulta.
+
+    Las sentencias desalojadas o descartadas con `clear()` siguen preparadas en las conexiones
+    que las usaron. Para que eso no crezca sin límite, una conexión con `max_entries` sentencias
+    preparadas las libera todas (DEALLOCATE ALL) antes de preparar otra, y las que siguen en uso
+    se vuelven a preparar a medida que se ejecutan.
+
+    Atributos:
+        max_entries (int): Número máximo de sentencias guardadas; se desaloja la menos usada.
+        prepare (bool): Si False sólo se guarda el texto y no se usa PREPARE.
+    """
+    def __init__(self, max_entries=256, prepare=True):
+        self.max_entries = max_entries
+        self.prepare = prepare
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def entry(self, key, build, context):
+        """
+        Devuelve la sentencia guardada para la firma, componiéndola la primera vez.
+
+        Args:
+            key (tuple): Firma de la sentencia.
+            build (callable): Función sin argumentos que devuelve la sentencia (str o sql.Composable).
+            context (psycopg2.cursor): Cursor con el que se renderiza la composición.
+
+        Returns:
+            tuple: (nombre para PREPARE, texto con %s, texto con $n, cantidad de parámetros).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        query = build()
+        text = query if isinstance(query, str) else query.as_string(context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Los nombres nunca se reutilizan: una firma desalojada o invalidada se prepara de nuevo
+                # con otro nombre y no choca con lo que ya esté preparado en las conexiones.
+                entry = (f"turing_stmt_{next(_names)}", text) + numbered(text)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return entry
+
+    def text(self, key, build, context):
+        """
+        Devuelve el texto de la sentencia con marcadores %s, para `execute_values` y similares.
+
+        Args:
+            key (tuple): Firma de la sentencia.
+            build (callable): Función que devuelve la sentencia.
+            context (psycopg2.cursor): Cursor con el que se renderiza la composición.
+
+        Returns:
+            str: Texto de la sentencia.
+        """
+        return self.entry(key, build, context)[1]
+
+    def execute(self, cur, key, build, params=(), prepare=True):
+        """
+        Ejecuta la sentencia de la firma en el cursor, preparándola en su conexión si hace falta.
+
+        Args:
+            cur (psycopg2.cursor): Cursor donde se ejecuta.
+            key (tuple): Firma de la sentencia.
+            build (callable): Función que devuelve la sentencia.
+            params (sequence): Valores de los parámetros.
+            prepare (bool): Si False se ejecuta el texto sin preparar (sentencias de un solo uso).
+        """
+        name, text, positional, count = self.entry(key, build, cur)
+        prepared = getattr(cur.connection, "prepared", None)
+        if not (prepare and self.prepare and prepared is not None):
+            cur.execute(text, params)
+            return
+        if name not in prepared:
+            if len(prepared) >= self.max_entries:
+                cur.execute("DEALLOCATE ALL")
+                prepared.clear()
+            cur.execute(f"PREPARE {name} AS {positional}")
+            prepared.add(name)
+        cur.shown = text
+        if count:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * count)})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+    def clear(self):
+        """
+        Descarta todas las sentencias, por ejemplo tras una migración que cambia el esquema.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Devuelve el estado de la caché.
+
+        Returns:
+            dict: Sentencias guardadas y si se usa PREPARE.
+        """
+        with self._lock:
+            return {"statements": len(self._entries), "prepare": self.prepare}
@@ -1,36 +1,107 @@
-from data.db import PostgresDatabaseManager
+import logging
+
+from data.db import get_db
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Costo fijo sumado a cada línea de ingrediente de una receta.
+COSTO_FIJO_LINEA = 0.20
+# La panela se compra por bloque: su precio se lleva a la presentación de 2450 sobre 3300.
+FACTOR_PANELA = 2450 / 3300
+
+
+def armar_lineas(cantidades: dict, catalogo: list, id_receta):
+    """
+    Arma las líneas de una receta uniendo las cantidades elegidas con el catálogo de ingredientes
+    por un índice {id: ingrediente}: cada cantidad se resuelve en O(1), así que el costo crece en
+    forma lineal con el tamaño de la planilla y no con líneas x catálogo.
+
+    Args:
+        cantidades (dict): {id_ingrediente: cantidad}; al ser un dict cada ingrediente aparece una vez.
+        catalogo (list): Ingredientes como tuplas (id, fecha, nombre, cantidad, kg_gr, precio).
+        id_receta (int or str): ID de la receta.
+
+    Returns:
+        list: Diccionarios con id, fecha, id_receta, nombre, precio y cantidad de cada línea.
+
+    Raises:
+        KeyError: Si alguna cantidad no corresponde a un ingrediente del catálogo.
+    """
+    indice = {str(item[0]): item for item in catalogo}
+    lineas = []
+    for id_ingrediente, cantidad in cantidades.items():
+        item = indice[str(id_ingrediente)]
+        lineas.append({
+            "id": item[0],
+            "fecha": item[1],
+            "id_receta": id_receta,
+            "nombre": item[2],
+            "precio": item[-1],
+            "cantidad": cantidad
+        })
+    return lineas
+
 
 class Cant_ing_x_receta:
-    def __init__(self,ing:list):
+    def __init__(self,ing:list,db=None):
         self.ing = ing 
-        self.db = PostgresDatabaseManager("turing")
+        self.db = db if db is not None else get_db()
     @property
+    @traced(cat="hook")
     def total_ing_costo(self):
-        receta_ing = {}
-        data = []
+        # Una línea por (receta, ingrediente), indexada en un dict: si un ingrediente se repite queda
+        # la última cantidad, que es también la que `cant_ing_actual` toma como vigente.
+        data = {}
         for items in self.ing:
+                precio = float(items["precio"])
                 if items["nombre"] == "panela":
-                    items["precio"] = (float(items["precio"]) * 2450) / 3300
-
-                receta_ing["id_ingrediente"] = items["id"]
-                receta_ing["id_receta"] = items["id_receta"]
-                receta_ing["precio"] = round((float(items["precio"])* float(items['cantidad'])+0.20),3)
-                receta_ing["cantidad"] = items["cantidad"]
-                if receta_ing not in data:
-                    data.append(receta_ing)
-                receta_ing = {}
+                    precio = precio * FACTOR_PANELA
+
+                data[(items["id_receta"], items["id"])] = {
+                    "id_ingrediente": items["id"],
+                    "id_receta": items["id_receta"],
+                    "precio": round((precio * float(items['cantidad'])+COSTO_FIJO_LINEA),3),
+                    "cantidad": items["cantidad"],
+                }
+        data = list(data.values())
         total = sum(round(float(i["precio"]),3)for i in data)
         return data, total
 
 
+    @traced(cat="hook")
     def save(self,ingre):
         try:
             self.db.insert("cant_ing",ingre)
             return True
 
-        except Exception as e:
-            print("error: este" ,e)
+        except Exception:
+            logger.exception("no se pudieron guardar las lineas de la receta")
             return False
+
+    @traced(cat="hook")
+    def save_with_cost(self, id_receta):
+        """
+        Guarda las líneas y actualiza el costo de la receta en una sola transacción: si falla
+        cualquier paso no queda ni la línea nueva ni un costo desactualizado.
+
+        Args:
+            id_receta (int or str): ID de la receta a la que pertenecen las líneas.
+
+        Returns:
+            tuple: (bool, dict or None) si se guardó y el resultado de actualizar la receta.
+        """
+        data, _ = self.total_ing_costo
+        try:
+            with self.db.transaction():
+                self.db.insert("cant_ing", data)
+                # El costo lo calcula y guarda el servidor (`costo_receta`) sin traer las líneas.
+                if not self.db.guardar_costo_recetas([int(id_receta)]):
+                    raise ValueError(f"la receta {id_receta} no tiene un costo valido")
+            return True, {"success": 1}
+        except Exception:
+            logger.exception("no se pudieron guardar las lineas ni el costo de la receta %s", id_receta)
+            return False, None
                 
 
 #  for _ in items:
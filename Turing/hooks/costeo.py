@@ -0,0 +1,145 @@
+import numpy as np
+
+from data.db import get_db
+from utils.tracing import traced
+from hooks.cant_ing_receta import COSTO_FIJO_LINEA, FACTOR_PANELA
+from hooks.receta import EMPAQUE, PORCENTAJE_EXTRAS, STIKER
+
+
+def precio_sugerido(porcentaje, costo):
+    """
+    Calcula el precio sugerido de venta (costo más el porcentaje de ganancia) para varios
+    ítems a la vez.
+
+    Args:
+        porcentaje (array-like): Porcentaje de ganancia de cada ítem.
+        costo (array-like): Costo de cada ítem; None se toma como desconocido (NaN).
+
+    Returns:
+        numpy.ndarray: Precio sugerido de cada ítem.
+    """
+    porcentaje = np.asarray(porcentaje, dtype=float)
+    costo = np.asarray(costo, dtype=float)
+    return costo * (1 + porcentaje / 100)
+
+
+class Costeo_Recetas:
+    """
+    Motor de costeo por lotes. Carga las recetas y sus líneas vigentes como arreglos de NumPy y
+    calcula en una sola pasada vectorizada el costo de ingredientes, costo unitario, costo del
+    paquete y precio sugerido de todas las recetas, usando el precio actual de cada ingrediente.
+    Reproduce las fórmulas de `Cant_ing_x_receta.total_ing_costo` y `Receta.costo_empaquetado`,
+    igual que la función `costo_receta` del servidor. Es el que recostea en bloque cuando cambian
+    precios (`propagar_precio` y la importación de listas de precios); `calcular()` sin `guardar()`
+    sirve para simular costos sin escribirlos.
+
+    Atributos:
+        db (StorageBackend): Gestor de la base de datos.
+        stiker (float): Costo del sticker por paquete.
+        empaque (float): Costo del empaque por paquete.
+        ids (numpy.ndarray): IDs de las recetas cargadas, ordenados.
+        nombres (list): Nombres de las recetas cargadas.
+    """
+    def __init__(self, db=None, stikers=STIKER, empaque=EMPAQUE):
+        self.db = db if db is not None else get_db()
+        self.stiker = stikers
+        self.empaque = empaque
+        self.ids = np.empty(0, dtype=np.int64)
+        self.nombres = []
+
+    @traced(cat="hook")
+    def cargar(self, id_recetas=None):
+        """
+        Carga en arreglos las recetas y sus líneas vigentes con dos consultas.
+
+        Args:
+            id_recetas (list, optional): IDs de receta a cargar. Por defecto todas.
+
+        Returns:
+            Costeo_Recetas: La misma instancia, para encadenar `calcular()`.
+        """
+        recetas = self.db.selection_by_ids("receta", id_recetas)
+        lineas = self.db.current_lines_with_prices(id_recetas)
+
+        self.ids = np.array([r[0] for r in recetas], dtype=np.int64)
+        self.nombres = [r[3] for r in recetas]
+        self._porcentaje = np.array([r[4] for r in recetas], dtype=float)
+        self._unidades = np.array([r[6] for r in recetas], dtype=float)
+        self._cant_x_paquete = np.array([r[8] for r in recetas], dtype=float)
+
+        id_receta = np.array([l[0] for l in lineas], dtype=np.int64)
+        self._posicion = np.searchsorted(self.ids, id_receta)
+        self._cantidad = np.array([l[2] for l in lineas], dtype=float)
+        self._precio = np.array([l[3] for l in lineas], dtype=float)
+        self._es_panela = np.array([l[4] == "panela" for l in lineas], dtype=bool)
+        return self
+
+    @traced(cat="hook")
+    def calcular(self):
+        """
+        Calcula los costos de todas las recetas cargadas.
+
+        Returns:
+            dict: Arreglos alineados con `ids`: 'id', 'lineas' (cantidad de líneas), 'costo_ingredientes',
+                'costo_unitario', 'costo_paquete' (con el recargo de extras, lo que se guarda en
+                `costo_receta`) y 'precio_sugerido'.
+        """
+        n = len(self.ids)
+        precio = np.where(self._es_panela, self._precio * FACTOR_PANELA, self._precio)
+        costo_linea = np.round(precio * self._cantidad + COSTO_FIJO_LINEA, 3)
+        costo_ingredientes = np.bincount(self._posicion, weights=costo_linea, minlength=n)
+        lineas = np.bincount(self._posicion, minlength=n)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            costo_unitario = np.where(self._unidades > 0, costo_ingredientes / self._unidades, np.nan)
+        costo_paquete = (costo_unitario * self._cant_x_paquete + self.empaque) + self.stiker
+        costo_paquete = costo_paquete * (1 + PORCENTAJE_EXTRAS / 100)
+        return {
+            "id": self.ids,
+            "lineas": lineas,
+            "costo_ingredientes": costo_ingredientes,
+            "costo_unitario": costo_unitario,
+            "costo_paquete": costo_paquete,
+            "precio_sugerido": precio_sugerido(self._porcentaje, costo_paquete),
+        }
+
+    @traced(cat="hook")
+    def guardar(self, resultado=None):
+        """
+        Escribe `costo_receta` de las recetas con al menos una línea y costo válido, en una sola sentencia.
+
+        Args:
+            resultado (dict, optional): Salida de `calcular()`. Si se omite se calcula.
+
+        Returns:
+            int: Número de recetas actualizadas.
+        """
+        if resultado is None:
+            resultado = self.calcular()
+        validas = (resultado["lineas"] > 0) & np.isfinite(resultado["costo_paquete"])
+        valores = [
+            (int(i), float(c))
+            for i, c in zip(resultado["id"][validas], resultado["costo_paquete"][validas])
+        ]
+        return self.db.update_column("receta", "costo_receta", valores)
+
+
+@traced(cat="hook")
+def propagar_precio(id_ingredientes, db=None):
+    """
+    Recalcula y guarda `costo_receta` sólo de las recetas que usan los ingredientes cuyo precio
+    cambió, con el motor `Costeo_Recetas`: dos consultas para cargarlas y una sola sentencia de
+    actualización.
+
+    Args:
+        id_ingredientes (list): IDs de los ingredientes modificados.
+        db (StorageBackend, optional): Gestor a usar. Por defecto el compartido.
+
+    Returns:
+        int: Número de recetas actualizadas.
+    """
+    db = db if db is not None else get_db()
+    afectadas = db.recipes_using(id_ingredientes)
+    if not afectadas:
+        return 0
+    return Costeo_Recetas(db).cargar(afectadas).guardar()
@@ -0,0 +1,136 @@
+"""
+Exportación del reporte de costos de las recetas.
+
+Uso sin interfaz (desde la carpeta Turing):
+    python -m hooks.exportacion costos.csv [--formato csv|jsonl|parquet]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from itertools import islice
+
+from data.db import get_db
+from utils.tracing import traced
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Dependencia opcional: sólo hace falta para exportar a Parquet.
+    pyarrow = None
+
+COLUMNAS = (
+    "id_receta", "receta", "lineas", "costo_ingredientes", "ganancia", "costo_unitario",
+    "costo_paquete", "precio_sugerido", "ingrediente", "cantidad", "precio_x_gramo", "kg_gr",
+)
+FORMATOS = ("csv", "jsonl", "parquet")
+
+
+def filas_reporte(db=None, itersize=2000):
+    """
+    Recorre el reporte de costos del gestor (`StorageBackend.reporte_costos`), sin cargarlo en memoria.
+
+    Args:
+        db (StorageBackend, optional): Gestor a usar. Por defecto el compartido.
+        itersize (int): Filas traídas de la base de datos en cada lote.
+
+    Yields:
+        tuple: Filas en el orden de `COLUMNAS`.
+    """
+    db = db if db is not None else get_db()
+    yield from db.reporte_costos(itersize=itersize)
+
+
+def escribir_csv(filas, archivo):
+    escritor = csv.writer(archivo)
+    escritor.writerow(COLUMNAS)
+    for fila in filas:
+        escritor.writerow(fila)
+
+
+def escribir_jsonl(filas, archivo):
+    for fila in filas:
+        archivo.write(json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False, default=str))
+        archivo.write("\n")
+
+
+def escribir_parquet(filas, ruta, lote=10000):
+    """
+    Escribe las filas en Parquet por grupos de `lote` filas: en memoria sólo hay un grupo a la vez.
+    """
+    if pyarrow is None:
+        raise RuntimeError("para exportar a Parquet instale pyarrow")
+    # Esquema fijo: un grupo en que una columna viene toda vacía no debe cambiar su tipo.
+    texto, entero, real = pyarrow.string(), pyarrow.int64(), pyarrow.float64()
+    esquema = pyarrow.schema(list(zip(COLUMNAS, (
+        entero, texto, entero, real, real, real, real, real, texto, real, real, texto,
+    ))))
+    with pyarrow.parquet.ParquetWriter(ruta, esquema) as escritor:
+        while True:
+            grupo = list(islice(filas, lote))
+            if not grupo:
+                break
+            escritor.write_table(pyarrow.Table.from_pylist([dict(zip(COLUMNAS, fila)) for fila in grupo], schema=esquema))
+
+
+@traced(cat="hook")
+def exportar_costos(ruta, formato=None, db=None, progreso=None, cada=1000):
+    """
+    Exporta el reporte de costos de las recetas a CSV, JSON Lines o Parquet. Las filas pasan de la
+    base de datos al archivo por una cadena de generadores, así que la memoria usada no
+    depende del tamaño del catálogo.
+
+    Args:
+        ruta (str): Archivo de salida.
+        formato (str, optional): 'csv', 'jsonl' o 'parquet'. Por defecto se deduce de la extensión.
+        db (StorageBackend, optional): Gestor a usar. Por defecto el compartido.
+        progreso (callable, optional): Recibe las filas escritas cada `cada` filas y al final.
+        cada (int): Filas entre avisos de progreso.
+
+    Returns:
+        int: Filas exportadas.
+
+    Raises:
+        ValueError: Si el formato no está soportado.
+    """
+    formato = (formato or os.path.splitext(ruta)[1].lstrip(".")).lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"formato no soportado: {formato}; use {', '.join(FORMATOS)}")
+    escritas = 0
+
+    def contadas():
+        nonlocal escritas
+        for fila in filas_reporte(db):
+            yield fila
+            escritas += 1
+            if progreso and escritas % cada == 0:
+                progreso(escritas)
+
+    filas = contadas()
+    try:
+        if formato == "parquet":
+            escribir_parquet(filas, ruta)
+        else:
+            with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+                (escribir_csv if formato == "csv" else escribir_jsonl)(filas, archivo)
+    finally:
+        # Si la escritura falla a medio camino, cerrar el generador devuelve la conexión al pool.
+        filas.close()
+    if progreso:
+        progreso(escritas)
+    return escritas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el reporte de costos de las recetas")
+    parser.add_argument("ruta")
+    parser.add_argument("--formato", choices=FORMATOS)
+    args = parser.parse_args(argv)
+    filas = exportar_costos(args.ruta, args.formato)
+    print(f"{filas} filas exportadas a {args.ruta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import csv
+import io
+import os
+
+from data.db import get_db
+from utils.tracing import traced
+from hooks.costeo import Costeo_Recetas
+from hooks.ingrediente import Ingredientes
+
+try:
+    import openpyxl
+except ImportError:  # Dependencia opcional: sólo hace falta para importar .xlsx.
+    openpyxl = None
+
+# Columnas de `ingredientes` que se cargan desde la lista de precios.
+COLUMNAS = ("nombre", "cantidad", "kg_gr", "precio")
+# Otros nombres de encabezado aceptados en los archivos de los proveedores.
+ALIAS = {"unidad": "kg_gr", "kg/gr": "kg_gr", "ingrediente": "nombre", "producto": "nombre"}
+
+
+def _encabezado(valores):
+    return [ALIAS.get(str(v).strip().lower(), str(v).strip().lower()) if v is not None else "" for v in valores]
+
+
+def leer_filas(ruta):
+    """
+    Lee una lista de precios CSV o XLSX fila por fila, sin cargar el archivo completo.
+
+    Args:
+        ruta (str): Ruta del archivo.
+
+    Yields:
+        tuple: (dict con los valores de la fila por encabezado, fracción del archivo leída entre 0 y 1).
+
+    Raises:
+        ValueError: Si el formato no es CSV ni XLSX.
+        RuntimeError: Si el archivo es XLSX y openpyxl no está instalado.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        total = os.path.getsize(ruta) or 1
+        with open(ruta, "rb") as raw:
+            texto = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            lector = csv.reader(texto, delimiter=";" if ";" in texto.readline() else ",")
+            texto.seek(0)
+            columnas = _encabezado(next(lector, []))
+            for valores in lector:
+                yield dict(zip(columnas, valores)), min(raw.tell() / total, 1.0)
+    elif extension == ".xlsx":
+        if openpyxl is None:
+            raise RuntimeError("para importar archivos .xlsx instale openpyxl")
+        libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            hoja = libro.active
+            total = hoja.max_row or 1
+            filas = hoja.iter_rows(values_only=True)
+            columnas = _encabezado(next(filas, ()))
+            for numero, valores in enumerate(filas, start=2):
+                yield dict(zip(columnas, valores)), min(numero / total, 1.0)
+        finally:
+            libro.close()
+    else:
+        raise ValueError(f"formato no soportado: {extension or ruta}")
+
+
+def _numero(valor):
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip()
+    if "," in texto and "." not in texto:
+        texto = texto.replace(",", ".")
+    return float(texto)
+
+
+def normalizar(fila, bd=None):
+    """
+    Lleva una fila de la lista de precios a la forma de `Ingredientes.to_dict`: el precio se guarda
+    por gramo según la unidad (kg o gr).
+
+    Args:
+        fila (dict): Valores de la fila por encabezado.
+        bd (StorageBackend, optional): Gestor para construir `Ingredientes`.
+
+    Returns:
+        tuple or None: Valores en el orden de `COLUMNAS`, o None si la fila no es válida.
+    """
+    try:
+        nombre = str(fila.get("nombre") or "").strip()
+        cantidad = _numero(fila["cantidad"])
+        precio = _numero(fila["precio"])
+        kg_gr = str(fila.get("kg_gr") or "").strip()
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not nombre or cantidad <= 0:
+        return None
+    datos = Ingredientes(nombre, cantidad, precio, kg_gr, bd=bd).to_dict()
+    if isinstance(datos["precio"], str):  # Unidad distinta de kg o gr.
+        return None
+    return tuple(datos[c] for c in COLUMNAS)
+
+
+@traced(cat="hook")
+def importar_ingredientes(ruta, db=None, progreso=None, cada=1000):
+    """
+    Importa una lista de precios de proveedor en bloque: las filas se leen, normalizan y copian a
+    la base de datos como un flujo, con memoria constante sin importar el tamaño del archivo, y se
+    fusionan con `ingredientes` en una sola sentencia. En la misma transacción `Costeo_Recetas`
+    recalcula el costo de todas las recetas, que pueden usar cualquiera de los precios nuevos.
+
+    Args:
+        ruta (str): Ruta del archivo CSV o XLSX.
+        db (StorageBackend, optional): Gestor a usar. Por defecto el compartido.
+        progreso (callable, optional): Recibe (filas leídas, fracción leída) cada `cada` filas y al final.
+        cada (int): Filas entre avisos de progreso.
+
+    Returns:
+        dict: 'leidas', 'rechazadas', 'guardadas' (ingredientes insertados o actualizados) y 'recetas'
+            (recetas recosteadas).
+    """
+    db = db if db is not None else get_db()
+    cuenta = {"leidas": 0, "rechazadas": 0}
+
+    def filas():
+        fraccion = 0.0
+        for fila, fraccion in leer_filas(ruta):
+            cuenta["leidas"] += 1
+            valores = normalizar(fila, bd=db)
+            if valores is None:
+                cuenta["rechazadas"] += 1
+            else:
+                yield valores
+            if progreso and cuenta["leidas"] % cada == 0:
+                progreso(cuenta["leidas"], fraccion)
+        if progreso:
+            progreso(cuenta["leidas"], 1.0)
+
+    with db.transaction():
+        _, guardadas = db.bulk_upsert("ingredientes", COLUMNAS, filas())
+        recetas = Costeo_Recetas(db).cargar().guardar()
+    return {**cuenta, "guardadas": guardadas, "recetas": recetas}
@@ -1,8 +1,15 @@
-from data.db import PostgresDatabaseManager
+import logging
+
+from data.db import get_db
+from utils.tracing import traced
+from hooks.costeo import propagar_precio
+
+logger = logging.getLogger(__name__)
 
 class Ingredientes:
-    def __init__(self,nombre:str,cant:int,precio:float,kg_gr:str,id= None, fecha= None):
-        self.bd = PostgresDatabaseManager("turing")
+    def __init__(self,nombre:str,cant:int,precio:float,kg_gr:str,id= None, fecha= None, bd=None):
+        # Crear el objeto no toca la red: el gestor compartido sólo se conecta al operar.
+        self.bd = bd if bd is not None else get_db()
         self.id = id 
         self.fecha = fecha
         self.nombre_i = nombre
@@ -20,21 +27,61 @@ class Ingredientes:
             return costo
         return f"{self.kg_gr} opcion no definida"
     @classmethod
-    def from_data(cls,data):
+    def from_data(cls,data,bd=None):
         (id,fecha, nombre,cant, precio, kg_gr)= data
         return cls(
             nombre = nombre,
             cant = cant,
             precio = precio,
-            kg_gr = kg_gr
+            kg_gr = kg_gr,
+            bd = bd
 
         )
+    def precio_x_gramo(self):
+        """
+        Precio por gramo que se guarda en `ingredientes.precio`, el que usa el costeo de las recetas.
+
+        Returns:
+            float: `valor_x_gramo`.
+
+        Raises:
+            ValueError: Si la unidad no es kg ni gr.
+        """
+        precio = self.valor_x_gramo
+        if isinstance(precio, str):
+            raise ValueError(precio)
+        return precio
+
+    @staticmethod
+    def precio_del_paquete(precio, cant, kg_gr):
+        """
+        Inverso de `valor_x_gramo`: el precio del paquete a partir del precio por gramo guardado,
+        el que se muestra en el formulario al editar un ingrediente.
+
+        Args:
+            precio (float): Precio por gramo guardado en `ingredientes.precio`.
+            cant (float): Cantidad del paquete.
+            kg_gr (str): Unidad de la cantidad ("kg" o "gr").
+
+        Returns:
+            float: Precio del paquete.
+
+        Raises:
+            ValueError: Si la unidad no es kg ni gr.
+        """
+        peso = str(kg_gr).lower()
+        if peso == "kg":
+            return float(precio) * float(cant) * 1000
+        elif peso == "gr":
+            return float(precio) * float(cant)
+        raise ValueError(f"{kg_gr} opcion no definida")
+
     def to_dict_update(self):
         return {
             "nombre":str(self.nombre_i),
             "cantidad":float(self.cantid),
             "kg_gr":str(self.kg_gr),
-            "precio":self.precio,
+            "precio":self.precio_x_gramo(),
             
         }
 
@@ -43,30 +90,37 @@ class Ingredientes:
             "nombre":self.nombre_i,
             "cantidad":self.cantid,
             "kg_gr":self.kg_gr,
-            "precio":self.valor_x_gramo,
+            "precio":self.precio_x_gramo(),
             
         }
 
     def __str__(self):
         return f"{self.nombre_i}->{self.cantid}->{self.precio}->{self.kg_gr}"
 
+    @traced(cat="hook")
     def insert(self,tabla):
         try:
             self.bd.insert(tabla,[self.to_dict()])
             return True
-        except Exception as e:
-            print(("error",e))
+        except Exception:
+            logger.exception("no se pudo guardar el ingrediente %s", self.nombre_i)
             return False
+    @traced(cat="hook")
     def delete(self,id,name):
-        data = self.bd.selection("ingredientes",f"WHERE ID = {id} AND nombre = '{name}'",param=[id,name])
+        data = self.bd.selection("ingredientes","WHERE id = %s AND nombre = %s",param=[id,name])
         if data:
             self.bd.delete("ingredientes",data[0])
             return True
         else:
             return {"Error": "No se encontró el registro para eliminar."}
+    @traced(cat="hook")
     def updated_data(self,tabla_name, id,data, condition=None):
         try:
-            self.bd.update(table_name=tabla_name,id_tabla=str(id),data=data,condition=condition)
+            # El ingrediente y el costo de sus recetas se confirman juntos o no se confirman.
+            with self.bd.transaction():
+                self.bd.update(table_name=tabla_name,id_tabla=str(id),data=data,condition=condition)
+                # El precio pudo cambiar: se recalculan sólo las recetas que usan este ingrediente.
+                propagar_precio([int(id)],db=self.bd)
             return {200:"success"}
         except Exception as e:
             return {"Error":str(e)}
@@ -1,8 +1,20 @@
-from data.db import PostgresDatabaseManager
+import logging
+
+from data.db import get_db
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Costos por paquete y recargo porcentual que se aplican al costo de la receta.
+STIKER = 0.03
+EMPAQUE = 0.01
+PORCENTAJE_EXTRAS = 15
 
 class Receta:
-    def __init__(self, porcentaje,receta, cantidad_receta,precio,unidades,cant_x_paquete,costo_receta=None,stikers=0.03, empaque=0.01):
-        self.db = PostgresDatabaseManager("turing")
+    def __init__(self, porcentaje,receta, cantidad_receta,precio,unidades,cant_x_paquete,costo_receta=None,stikers=STIKER, empaque=EMPAQUE, db=None, id=None):
+        # Crear el objeto no toca la red: el gestor compartido sólo se conecta al operar.
+        self.db = db if db is not None else get_db()
+        self.id = id
         self.nombre = receta
         self.cantidad_producida = cantidad_receta
         self.porcentaje_venta = porcentaje
@@ -13,7 +25,7 @@ class Receta:
         self.empaque = empaque
         self.stiker = stikers
     @classmethod
-    def from_data(cls, data):
+    def from_data(cls, data, db=None):
         # Asumiendo que 'data' es una tupla en el formato dado
         (id, fecha, f_updated,nombre, porcentaje_venta, precio_venta, unidades_x_receta, cantidad_receta, cant_x_paquete, costo_receta) = data
         return cls(
@@ -25,15 +37,19 @@ class Receta:
             cant_x_paquete=cant_x_paquete,
             costo_receta = costo_receta,
             # Opcionales, con valores por defecto
-            stikers=0.03,
-            empaque=0.01
+            stikers=STIKER,
+            empaque=EMPAQUE,
+            db=db,
+            id=id
         )
     @property
+    @traced(cat="hook")
     def costo_total_p_receta(self):
-        seleccion = self.db.selection("receta",f"WHERE nombre ='{self.nombre}'")
-        valores = self.db.selection("cant_ing",int(seleccion[0]),True)
+        id_receta = self.id
+        if id_receta is None:
+            id_receta = self.db.selection("receta","WHERE nombre = %s",param=[self.nombre])[0]
+        valores = self.db.selection("cant_ing",int(id_receta),True)
         price = 0
-        print(valores)
         for precio in valores:
            price  += precio[-1]
         porcentaje = (int(self.porcentaje_venta)  / 100) * float(price)
@@ -44,7 +60,7 @@ class Receta:
 
         costo_unitario = costo_total_receta / float(self.unidades)
         costo_paquete =((costo_unitario * float(self.cant_x_paquete)) + self.empaque) + self.stiker
-        con_porcentaje_extras = ((costo_paquete * 15) /100 )+ costo_paquete
+        con_porcentaje_extras = ((costo_paquete * PORCENTAJE_EXTRAS) /100 )+ costo_paquete
         return con_porcentaje_extras
     def to_dict(self):
         return {
@@ -56,17 +72,19 @@ class Receta:
             "cant_x_paquete":self.cant_x_paquete,
             "costo_receta":self.costo_receta
         }
+    @traced(cat="hook")
     def save_receta(self):
         try:
             self.db.insert("receta",[self.to_dict()])
             return True
-        except Exception as e:
-            print(("error",e))
+        except Exception:
+            logger.exception("no se pudo guardar la receta %s", self.nombre)
             return False
             
+    @traced(cat="hook")
     def delete(self,id,name):
         try:
-            data = self.db.selection("receta",f"WHERE ID = {id} AND nombre = '{name}'",param=[id,name])
+            data = self.db.selection("receta","WHERE id = %s AND nombre = %s",param=[id,name])
             if data:
                 result = self.db.delete("receta",data[0])
                 return result
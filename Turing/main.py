@@ -1,11 +1,36 @@
-import flet as ft
-from components.Interfaces import App
+from utils.startup import startup
+
+import argparse
+import logging
+import os
+
+# Lo que se importa acá (Flet y la capa de datos) se mide como la etapa "imports" del arranque.
+with startup.stage("imports"):
+    import flet as ft
+    from components.Interfaces import App
+    from utils.profiling import profiler
+
+# Los errores de los hooks, las consultas lentas (`data.metrics`) y los tiempos del arranque
+# (`utils.startup`) se registran con logging.
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+
+parser = argparse.ArgumentParser(description="Turing: costos de recetas")
+parser.add_argument("--profile", metavar="CARPETA", help="perfila los manejadores de eventos y guarda los perfiles en CARPETA")
+args, _ = parser.parse_known_args()
+if args.profile:
+    profiler.enable(args.profile)
+
 
 def main(page: ft.Page):
     page.title = "Turing"
     page.scroll = "auto"
     app = App()
     page.add(app)
+    startup.milestone("primera pantalla")
 
 
 ft.app(main)
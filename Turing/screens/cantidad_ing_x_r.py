@@ -1,8 +1,13 @@
+import logging
 import flet as ft 
 from components.base_frame import Base_frame
-from data.db import PostgresDatabaseManager
-from hooks.cant_ing_receta import Cant_ing_x_receta
-from hooks.receta import Receta
+from components.keyed_table import Keyed_Table
+from data.async_db import AsyncDatabaseManager
+from data.db import get_db
+from utils.tracing import traced
+from hooks.cant_ing_receta import Cant_ing_x_receta, armar_lineas
+
+logger = logging.getLogger(__name__)
 
 class Cantidad_Ing(Base_frame):
     """
@@ -12,9 +17,11 @@ class Cantidad_Ing(Base_frame):
     Atributos:
         select_option (list): Lista de ingredientes disponibles para seleccionar.
         select_option_updated_date (list): Lista de ingredientes actualizada para mostrar en el formulario.
-        data_dict (dict): Diccionario que almacena las cantidades de ingredientes seleccionados.
+        data_dict (dict): Cantidades elegidas por ID de ingrediente.
+        nombres (dict): Nombre de cada ingrediente por ID, para mostrar `data_dict`.
         data_list (list): Lista que almacena los datos formateados para insertar en la base de datos.
-        db (PostgresDatabaseManager): Gestor de la base de datos PostgreSQL.
+        db (StorageBackend): Gestor compartido de la base de datos (`get_db`).
+        adb (AsyncDatabaseManager): Fachada asíncrona de `db` usada por los manejadores de eventos.
         ingredientes (ft.RadioGroup): Grupo de botones de radio para seleccionar un ingrediente.
         receta (list): Lista de recetas obtenidas de la base de datos.
         receta_not_date (list): Lista de recetas sin la fecha.
@@ -22,47 +29,37 @@ class Cantidad_Ing(Base_frame):
         quantity (ft.TextField): Campo de texto para introducir la cantidad del ingrediente.
         button_add (ft.ElevatedButton): Botón para agregar la cantidad del ingrediente seleccionado.
         button_save (ft.ElevatedButton): Botón para guardar las cantidades de ingredientes en la base de datos.
-        table (ft.DataTable): Tabla para mostrar los ingredientes y sus cantidades.
+        table (Keyed_Table): Tabla virtualizada, reconciliada por ingrediente, con los ingredientes y sus cantidades.
         contain (ft.Column): Contenedor que organiza los controles del formulario.
 
     """
-    def __init__(self, ing: list = [], **kwargs):
+    def __init__(self, ing: list = [], db=None, recetas=None, **kwargs):
         """
         Inicializa la clase `Cantidad_Ing`, configura los campos del formulario, botones y tabla.
 
         Args:
             ing (list, optional): Lista de ingredientes disponibles para seleccionar. Por defecto es una lista vacía.
+            db (StorageBackend, optional): Gestor a usar. Por defecto el compartido de la aplicación.
+            recetas (list, optional): Recetas ya cargadas para las opciones. Si se omite se consultan.
             **kwargs: Argumentos adicionales para la inicialización.
         """
         super().__init__(**kwargs)
-        self.select_option = ing
-        self.select_option_updated_date = [(i, f_u, n, c, p, kg) for (i, f, f_u, n, c, p, kg) in ing]
         self.data_dict = {}
         self.data_list = []
-        self.db = PostgresDatabaseManager("turing")
+        self.db = db if db is not None else get_db()
+        self.adb = AsyncDatabaseManager(self.db)
         
-        self.ingredientes = ft.RadioGroup(
-            content=ft.Column(
-                controls=[
-                    ft.Radio(value=key[2], label=key[2])
-                    for key in self.select_option_updated_date
-                ]
-            )
-        )
-        self.receta = self.db.selection("receta")
-        self.receta_not_date = [(i, f_u, n, p_v, p, und, c_r, c_p, c) for (i, f, f_u, n, p_v, p, und, c_r, c_p, c) in self.receta]
-        self.name_receta = ft.RadioGroup(
-            content=ft.Row(
-                controls=[
-                    ft.Radio(value=key[0], label=key[2])
-                    for key in self.receta_not_date
-                ]
-            )
-        )
+        self.ingredientes = ft.RadioGroup(content=ft.Column())
+        self.name_receta = ft.RadioGroup(content=ft.Row())
+        self.select_option = None
+        self.receta = None
+        self._opciones(ing, recetas if recetas is not None else self.db.selection("receta"))
         self.quantity = ft.TextField(label="Cantidad", hint_text="Introduzca la cantidad solo numeros", on_change=self.num_validate)
-        self.button_add = ft.ElevatedButton(text="agg", on_click=lambda e: self.add_quantity(), icon=ft.icons.ADD)
-        self.button_save = ft.ElevatedButton(text="Guardar", disabled=True, icon=ft.icons.SAVE, on_click=lambda e: self.save_quantity())
-        self.table = ft.DataTable(
+        self.button_add = ft.ElevatedButton(text="agg", on_click=self.add_quantity, icon=ft.icons.ADD)
+        self.button_save = ft.ElevatedButton(text="Guardar", disabled=True, icon=ft.icons.SAVE, on_click=self.save_quantity)
+        self.table = Keyed_Table(
+            actions=[("create", None, self.edit), (ft.icons.DELETE, "red", self.delete)],
+            window=100,
             columns=[
                 ft.DataColumn(label=ft.Text("Ingrediente", color=ft.colors.BLACK)),
                 ft.DataColumn(label=ft.Text("Cantidad", color=ft.colors.BLACK)),
@@ -96,7 +93,8 @@ class Cantidad_Ing(Base_frame):
                 ft.Row(
                     controls=[self.table],
                     scroll=ft.ScrollMode.ALWAYS,
-                )
+                ),
+                self.table.window_controls()
             ],
             alignment=ft.MainAxisAlignment.CENTER,
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -104,43 +102,85 @@ class Cantidad_Ing(Base_frame):
         )
         self.content.controls.append(self.contain)
 
+    def _opciones(self, ing, recetas):
+        """
+        Arma las opciones de ingredientes y recetas. Sólo reconstruye el grupo cuya lista cambió.
+
+        Args:
+            ing (list): Ingredientes disponibles.
+            recetas (list): Recetas disponibles.
+
+        Returns:
+            list: Grupos de opciones reconstruidos.
+        """
+        cambiados = []
+        if ing != self.select_option:
+            self.select_option = ing
+            self.select_option_updated_date = [(i, f_u, n, c, p, kg) for (i, f, f_u, n, c, p, kg) in ing]
+            self.nombres = {str(i[0]): i[2] for i in self.select_option_updated_date}
+            self.ingredientes.content.controls = [
+                ft.Radio(value=str(key[0]), label=key[2])
+                for key in self.select_option_updated_date
+            ]
+            # Las cantidades de ingredientes que ya no existen se descartan.
+            self.data_dict = {k: v for k, v in self.data_dict.items() if k in self.nombres}
+            cambiados.append(self.ingredientes)
+        if recetas != self.receta:
+            self.receta = recetas
+            self.receta_not_date = [(i, f_u, n, p_v, p, und, c_r, c_p, c) for (i, f, f_u, n, p_v, p, und, c_r, c_p, c) in recetas]
+            self.name_receta.content.controls = [
+                ft.Radio(value=key[0], label=key[2])
+                for key in self.receta_not_date
+            ]
+            cambiados.append(self.name_receta)
+        return cambiados
+
+    async def refresh(self, ing: list = [], recetas=None, **kwargs):
+        """
+        Actualiza las opciones al volver a la pantalla desde la caché de la aplicación, conservando
+        las cantidades que se estaban cargando.
+
+        Args:
+            ing (list): Ingredientes recién consultados.
+            recetas (list, optional): Recetas recién consultadas. Si se omiten se consultan.
+        """
+        if recetas is None:
+            recetas = await self.adb.selection("receta")
+        cambiados = self._opciones(ing, recetas)
+        if cambiados:
+            self.button_save.disabled = len(self.data_dict) < 3
+            self.refresh_controls(*cambiados, self.button_save)
+            await self.show_data()
+
+    @traced(cat="ui")
     def delete(self, r):
         """
-        Método para eliminar un registro basado en los datos proporcionados. Actualmente solo imprime los datos.
+        Método para eliminar un registro basado en los datos proporcionados. Actualmente solo registra los datos.
 
         Args:
             r (tuple): Datos del ingrediente a eliminar.
         """
-        print(r)
+        logger.debug("eliminar linea %s", r)
         
     def edit(self, r):
         """
-        Método para editar un registro basado en los datos proporcionados. Actualmente solo imprime los datos.
+        Método para editar un registro basado en los datos proporcionados. Actualmente solo registra los datos.
 
         Args:
             r (tuple): Datos del ingrediente a editar.
         """
-        print(r)
+        logger.debug("editar linea %s", r)
         
-    def show_data(self):
+    @traced(cat="ui")
+    async def show_data(self, e=None):
         """
-        Muestra los datos de ingredientes y cantidades en la tabla. Actualiza las filas de la tabla con los datos 
-        almacenados en `data_dict`.
+        Muestra los datos de ingredientes y cantidades en la tabla. Reconcilia las filas de la tabla con los datos 
+        almacenados en `data_dict`, enviando sólo las filas que cambiaron.
 
         Modifica:
             self.table.rows: Actualiza las filas de la tabla con los datos de `data_dict`.
         """
-        self.table.rows.clear()
-        
-        self.table.rows = [ft.DataRow(
-            cells=[
-                ft.DataCell(ft.Text(cell, width=150, color=ft.colors.BLACK)) for cell in row
-            ] + [ft.DataCell(ft.Row(controls=[
-                ft.IconButton(icon="create", on_click=lambda e, r=row: self.edit(r)),
-                ft.IconButton(icon=ft.icons.DELETE, icon_color="red", on_click=lambda e, r=row: self.delete(r))
-            ], spacing=15))]
-        ) for row in self.data_dict.items()]
-        self.content.update()
+        self.table.sync((self.nombres[k], cantidad) for k, cantidad in self.data_dict.items())
     
     def call_dialog(self, title, content, icon=None, color=None):
         """
@@ -154,7 +194,8 @@ class Cantidad_Ing(Base_frame):
         """
         self.show_dialog(title, content, icon, color)
 
-    def add_quantity(self):
+    @traced(cat="ui")
+    async def add_quantity(self, e=None):
         """
         Agrega la cantidad del ingrediente seleccionado al diccionario `data_dict`. Habilita el botón de guardar 
         si se han agregado al menos 3 cantidades. Muestra los datos actualizados en la tabla.
@@ -165,7 +206,7 @@ class Cantidad_Ing(Base_frame):
             self.quantity.value: Limpia el campo de cantidad.
             self.ingredientes.value: Limpia la selección de ingrediente.
         """
-        if self.quantity.value not in (None, ""):
+        if self.quantity.value not in (None, "") and self.ingredientes.value in self.nombres:
             self.data_dict[self.ingredientes.value] = self.quantity.value
         else:
             self.show_dialog("Error", "Verifica que has rellenado y seleccionado todos los campos", ft.icons.DANGEROUS, "red")
@@ -177,8 +218,8 @@ class Cantidad_Ing(Base_frame):
         
         self.quantity.value = ""
         self.ingredientes.value = ""
-        self.show_data()
-        self.content.update()
+        self.refresh_controls(self.quantity, self.ingredientes, self.button_save)
+        await self.show_data()
      
     def num_validate(self, event):
         """
@@ -195,7 +236,21 @@ class Cantidad_Ing(Base_frame):
         event.control.value = filtered_value
         event.control.update()
     
-    def save_quantity(self):
+    def _guardar_cantidades(self, id_receta):
+        """
+        Parte de `save_quantity` que accede a la base de datos: guarda las líneas de `data_list` y
+        actualiza el costo de la receta en una sola transacción. Se ejecuta fuera del bucle de eventos.
+
+        Args:
+            id_receta (str): ID de la receta seleccionada.
+
+        Returns:
+            tuple: (bool, dict or None) si las líneas se guardaron y el resultado de actualizar la receta.
+        """
+        return Cant_ing_x_receta(self.data_list, db=self.db).save_with_cost(id_receta)
+
+    @traced(cat="ui")
+    async def save_quantity(self, e=None):
         """
         Guarda las cantidades de ingredientes en la base de datos. Actualiza el costo de la receta y muestra un 
         diálogo de éxito o error según el resultado de la inserción.
@@ -204,36 +259,21 @@ class Cantidad_Ing(Base_frame):
             self.data_dict: Limpia el diccionario de datos.
             self.name_receta.value: Limpia la selección de receta.
             self.quantity.value: Limpia el campo de cantidad.
-            self.data_list: Actualiza la lista de datos para insertar en la base de datos.
-        """
-        for _ in range(len(self.data_dict)):
-            for item in self.select_option_updated_date:
-                if item[2] in self.data_dict:
-                    self.data_list.append({
-                        "id": item[0],
-                        "fecha": item[1],
-                        "id_receta": self.name_receta.value,
-                        "nombre": item[2],
-                        "precio": item[-1],
-                        "cantidad": self.data_dict[item[2]]
-                    })
-        
-        cant = Cant_ing_x_receta(self.data_list)
-        datos = cant.total_ing_costo
-        
-        if cant.save(datos[0]):
+            self.data_list: Reemplaza la lista de datos para insertar en la base de datos.
+        """
+        self.data_list = armar_lineas(self.data_dict, self.select_option_updated_date, self.name_receta.value)
+
+        guardado, result = await self.adb.run(self._guardar_cantidades, self.name_receta.value)
+
+        if guardado:
             self.show_dialog("Insercion Exitosa!", "La data se ha insertado en la base de datos con éxito", ft.icons.CHECK, "#90EE90")
-            receta = self.db.selection("receta", f"WHERE ID= {self.name_receta.value}")
-            (i, _, f_u, n, p_v, p, und, c_r, c_p, c) = receta
-            receta_not_date = (i, _, f_u, n, p_v, p, und, c_r, c_p, c)
-            instancia_receta = Receta.from_data(receta_not_date)
-            result = self.db.update("receta", receta[0], instancia_receta.costo_empaquetado(instancia_receta.costo_total_p_receta[0]))
             if "success" in result:
                 self.show_dialog("Actualizacion Exitosa!", "La receta se ha actualizado correctamente", ft.icons.CHECK, "#90EE90")
                 self.data_dict = {}
                 self.name_receta.value = ""
                 self.quantity.value = ""
-                self.show_data()
+                self.refresh_controls(self.name_receta, self.quantity)
+                await self.show_data()
             else:
                 self.show_dialog("Error interno", "Comuníquese con el técnico", ft.icons.DANGEROUS, "red")
         else:
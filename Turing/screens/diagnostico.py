@@ -0,0 +1,112 @@
+import flet as ft
+from components.base_frame import Base_frame
+from components.keyed_table import Keyed_Table
+from data.async_db import AsyncDatabaseManager
+from data.db import get_db
+from data.metrics import metrics
+from utils.profiling import profiler
+
+
+class Diagnostico_Frame(Base_frame):
+    """
+    Panel de diagnóstico de la capa de datos, oculto en la navegación (se abre con Ctrl+Shift+D).
+    Muestra por operación las llamadas, la latencia y cómo se reparte entre esperar o abrir
+    conexiones y ejecutar sentencias, las filas devueltas, el estado de las conexiones y de la
+    caché, y las últimas consultas lentas.
+
+    Atributos:
+        db (StorageBackend): Gestor de la base de datos.
+        adb (AsyncDatabaseManager): Fachada asíncrona de `db`.
+        table (Keyed_Table): Una fila por operación, de la que más tiempo acumula a la que menos.
+        resumen (ft.Text): Motor, conexiones, caché y sentencias.
+        lentas (ft.Column): Últimas consultas lentas.
+        funciones (ft.Column): Funciones más costosas de los manejadores perfilados, si el perfilado
+            está activo (`utils.profiling`).
+    """
+    def __init__(self, db=None, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db if db is not None else get_db()
+        self.adb = AsyncDatabaseManager(self.db)
+        self.table = Keyed_Table(
+            cell_width=110,
+            columns=[
+                ft.DataColumn(label=ft.Text(c, color=ft.colors.BLACK))
+                for c in ("operacion", "llamadas", "media ms", "p95 ms", "max ms",
+                          "conexion ms", "ejecucion ms", "filas", "sentencias", "errores")
+            ],
+            border=ft.border.all(0.7, "black"),
+            bgcolor="#F5EDED",
+            heading_row_color="#E2DAD6",
+        )
+        self.resumen = ft.Text(selectable=True)
+        self.lentas = ft.Column()
+        self.funciones = ft.Column()
+        self.content.controls.append(
+            ft.Column(
+                controls=[
+                    ft.Text("Diagnostico", size=30),
+                    ft.Row(controls=[
+                        ft.ElevatedButton(text="Actualizar", icon=ft.icons.REFRESH, on_click=self.show_data),
+                        ft.ElevatedButton(text="Reiniciar metricas", on_click=self.reiniciar),
+                    ]),
+                    self.resumen,
+                    ft.Row(controls=[self.table], scroll=ft.ScrollMode.ALWAYS),
+                    ft.Text("Consultas lentas", size=20),
+                    self.lentas,
+                    ft.Text("Funciones mas costosas", size=20),
+                    self.funciones,
+                ]
+            )
+        )
+
+    def did_mount(self):
+        super().did_mount()
+        self.page.run_task(self.show_data)
+
+    async def reiniciar(self, e=None):
+        """
+        Descarta las métricas registradas y vuelve a mostrar el panel.
+        """
+        metrics.reset()
+        await self.show_data()
+
+    async def show_data(self, e=None):
+        """
+        Lee `StorageBackend.diagnostics` y actualiza la tabla, el resumen y las consultas lentas.
+        """
+        diag = await self.adb.diagnostics()
+        operaciones = sorted(
+            diag["metrics"]["operations"].items(), key=lambda item: item[1]["latency"]["total_ms"], reverse=True
+        )
+        self.table.sync([
+            (nombre, o["latency"]["count"], f"{o['latency']['mean_ms']:.2f}", f"{o['latency']['p95_ms']:g}",
+             f"{o['latency']['max_ms']:.2f}", f"{o['connect_ms']:.1f}", f"{o['execute_ms']:.1f}",
+             o["rows"], o["statements"], o["errors"])
+            for nombre, o in operaciones
+        ])
+        conexiones = diag["metrics"]["connections"]
+        lineas = [
+            f"motor: {diag['backend']}",
+            f"conexiones abiertas: {conexiones['opened']} (media {conexiones['open']['mean_ms']:.1f} ms)",
+            f"esperas de conexion: {conexiones['checkout']['count']} (p95 {conexiones['checkout']['p95_ms']:g} ms)",
+            f"sentencias: {diag['metrics']['statements']['count']} (p95 {diag['metrics']['statements']['p95_ms']:g} ms)",
+            f"cache de catalogo: {diag['cache']['hits']} aciertos, {diag['cache']['misses']} fallos",
+        ]
+        if "pool" in diag:
+            lineas.append(f"pool: {diag['pool']['in_use']} en uso, {diag['pool']['idle']} ociosas, max {diag['pool']['max']}")
+        if "sqlite" in diag:
+            lineas.append(f"archivo: {diag['sqlite']['path']} ({diag['sqlite']['bytes'] // 1024} KB)")
+        self.resumen.value = "\n".join(lineas)
+        self.lentas.controls = [
+            ft.Text(f"{s['at']}  {s['ms']:.1f} ms  {s['operation']}  {s['params'] or ''}\n{s['statement']}", selectable=True)
+            for s in reversed(diag["metrics"]["slow"])
+        ] or [ft.Text("sin consultas lentas")]
+        if profiler.enabled:
+            self.funciones.controls = [
+                ft.Text(f"{f['self_ms']:.0f} ms propios, {f['total_ms']:.0f} ms total  {f['function']}  ({', '.join(f['handlers'])})",
+                        selectable=True)
+                for f in profiler.top()
+            ] or [ft.Text("sin manejadores perfilados todavia")]
+        else:
+            self.funciones.controls = [ft.Text("perfilado inactivo (PROFILE_DIR o --profile)")]
+        self.refresh_controls(self.resumen, self.lentas, self.funciones)
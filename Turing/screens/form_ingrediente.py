@@ -1,49 +1,74 @@
+import asyncio
+import logging
 import flet as ft
 from components.base_frame import Base_frame
+from components.keyed_table import Keyed_Table
 from hooks.ingrediente import Ingredientes 
-from data.db import PostgresDatabaseManager
+from hooks.importacion import importar_ingredientes
+from data.async_db import AsyncDatabaseManager
+from data.db import get_db
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
 class Form_Ingrediente(Base_frame):
     """
         Clase que define un formulario para gestionar ingredientes. Hereda de `Base_frame` y proporciona 
         funcionalidades para agregar, editar, eliminar y mostrar datos de ingredientes en una tabla.
 
         Atributos:
-            db (PostgresDatabaseManager): Gestor de la base de datos PostgreSQL.
+            db (StorageBackend): Gestor compartido de la base de datos (`get_db`).
+            adb (AsyncDatabaseManager): Fachada asíncrona de `db` usada por los manejadores de eventos.
             name (ft.TextField): Campo de texto para introducir el nombre del ingrediente.
             quantity (ft.TextField): Campo de texto para introducir la cantidad del ingrediente.
             price (ft.TextField): Campo de texto para introducir el precio del ingrediente.
             mostrar_data (ft.ElevatedButton): Botón para mostrar los datos de los ingredientes.
             _id_and_time (str): Almacena el ID y la fecha del ingrediente actual para editar.
+            _editado (tuple): Cantidad, unidad y precio del paquete con que se rellenó el formulario
+                al editar, y el precio por gramo guardado.
             radio_gr_kg (ft.RadioGroup): Grupo de botones de radio para seleccionar la unidad de medida (kg o gr).
             submit_button (ft.ElevatedButton): Botón para guardar un nuevo ingrediente.
             btn_update (ft.ElevatedButton): Botón para actualizar un ingrediente existente.
-            table (ft.DataTable): Tabla para mostrar los datos de los ingredientes.
+            file_picker (ft.FilePicker): Selector de la lista de precios a importar.
+            btn_importar (ft.ElevatedButton): Botón para importar una lista de precios CSV o XLSX.
+            progress (ft.ProgressBar): Avance de la importación en curso.
+            progress_text (ft.Text): Filas leídas de la importación en curso.
+            table (Keyed_Table): Tabla reconciliada por id para mostrar los datos de los ingredientes.
             form (ft.Column): Contenedor de todos los controles del formulario.
 
     """
-    def __init__(self, **kwargs):
+    def __init__(self, db=None, **kwargs):
         """
             Inicializa la clase `Form_Ingrediente`, configura los campos del formulario, botones y tabla.
 
             Args:
+                db (StorageBackend, optional): Gestor a usar. Por defecto el compartido de la aplicación.
                 **kwargs: Argumentos adicionales para la inicialización.
         """
         super().__init__(**kwargs)
-        self.db = PostgresDatabaseManager("turing")
+        self.db = db if db is not None else get_db()
+        self.adb = AsyncDatabaseManager(self.db)
         self.name = ft.TextField(label="Nombre",hint_text="Introduzca el Nombre de la receta",on_change=lambda e: self.num_validate(e))
         self.quantity = ft.TextField(label="Cantidad",hint_text="Introduzca la cantidad de la receta",on_change=lambda e: self.num_validate(e))
         self.price = ft.TextField(label="Precio",hint_text="Introduzca el precio de la receta",on_change=lambda e: self.num_validate(e))
-        self.mostrar_data = ft.ElevatedButton(text="Mostrar datos",on_click=lambda e:self.show_data())
+        self.mostrar_data = ft.ElevatedButton(text="Mostrar datos",on_click=self.show_data)
         self._id_and_time = ""
+        self._editado = (None, None, None, None)
         self.radio_gr_kg = ft.RadioGroup(content=ft.Column(
             [
                 ft.Radio(value="Kg",label="kilogramos"),
                 ft.Radio(value="gr",label="Gramos")
             ]
         ))
-        self.submit_button = ft.ElevatedButton(text="Guardar",on_click=lambda e:self.submit())
-        self.btn_update = ft.ElevatedButton(text="Actualizar",on_click=lambda e:self.updated(),visible=False)
-        self.table = ft.DataTable(
+        self.submit_button = ft.ElevatedButton(text="Guardar",on_click=self.submit)
+        self.btn_update = ft.ElevatedButton(text="Actualizar",on_click=self.updated,visible=False)
+        self.file_picker = ft.FilePicker(on_result=self.importar)
+        self.btn_importar = ft.ElevatedButton(text="Importar lista",icon=ft.icons.UPLOAD_FILE,on_click=self.pick_file)
+        self.progress = ft.ProgressBar(value=0,width=400,visible=False)
+        self.progress_text = ft.Text(visible=False)
+        self.overlay_controls.append(self.file_picker)
+        self.table = Keyed_Table(
+            actions=[("create",None,self.edit),(ft.icons.DELETE,"red",self.delete)],
             columns=[
                 ft.DataColumn(label=ft.Text("id",color=ft.colors.BLACK)),
                 ft.DataColumn(label=ft.Text("fecha",color=ft.colors.BLACK)),
@@ -73,9 +98,11 @@ class Form_Ingrediente(Base_frame):
                     self.submit_button,
                     self.mostrar_data,
                     self.btn_update,
+                    self.btn_importar,
 
                     ]
                 ),
+                ft.Row(controls=[self.progress, self.progress_text]),
                 ft.Container(
                     content=ft.Row(
                     controls=[
@@ -85,7 +112,8 @@ class Form_Ingrediente(Base_frame):
                     spacing=15
                 ),
                 margin=ft.margin.all(16)
-                )
+                ),
+                self.pagination_controls()
             ],
             scroll=ft.ScrollMode.ALWAYS,
             spacing=20
@@ -93,7 +121,74 @@ class Form_Ingrediente(Base_frame):
         
       
         self.content.controls.append(self.form)
-    def updated(self):
+    def pick_file(self, e=None):
+        """
+        Abre el selector para elegir la lista de precios a importar.
+        """
+        self.file_picker.pick_files(
+            dialog_title="Lista de precios",
+            allowed_extensions=["csv", "xlsx"],
+            allow_multiple=False
+        )
+
+    def _avance(self, leidas, fraccion):
+        """
+        Muestra el avance de la importación.
+
+        Args:
+            leidas (int): Filas leídas.
+            fraccion (float): Fracción del archivo leída entre 0 y 1.
+        """
+        self.progress.value = fraccion
+        self.progress_text.value = f"{leidas} filas"
+        self.refresh_controls(self.progress, self.progress_text)
+
+    @traced(cat="ui")
+    async def importar(self, e):
+        """
+        Importa en bloque la lista de precios elegida en el selector. La importación corre en un hilo
+        y avisa su avance a la barra de progreso a través del bucle de eventos.
+
+        Args:
+            e (ft.FilePickerResultEvent): Resultado del selector.
+
+        Modifica:
+            self.progress: Muestra el avance y se oculta al terminar.
+            self.table.rows: Muestra la página actual con los precios importados.
+        """
+        if not e.files:
+            return
+        ruta = e.files[0].path
+        if ruta is None:
+            self.call_dialog("Error", "La importacion necesita la aplicacion de escritorio", ft.icons.WARNING, "red")
+            return
+        loop = asyncio.get_running_loop()
+
+        def progreso(leidas, fraccion):
+            loop.call_soon_threadsafe(self._avance, leidas, fraccion)
+
+        self.btn_importar.disabled = True
+        self.progress.visible = self.progress_text.visible = True
+        self._avance(0, 0)
+        self.refresh_controls(self.btn_importar)
+        try:
+            resultado = await self.adb.run(importar_ingredientes, ruta, db=self.db, progreso=progreso)
+            await self.show_data()
+            self.call_dialog(
+                "Importacion",
+                f"{resultado['guardadas']} ingredientes guardados, {resultado['rechazadas']} filas rechazadas "
+                f"y {resultado['recetas']} recetas recosteadas",
+                ft.icons.CHECK, "green"
+            )
+        except Exception as ex:
+            self.call_dialog("Error", str(ex), ft.icons.WARNING, "red")
+        finally:
+            self.btn_importar.disabled = False
+            self.progress.visible = self.progress_text.visible = False
+            self.refresh_controls(self.btn_importar, self.progress, self.progress_text)
+
+    @traced(cat="ui")
+    async def updated(self, e=None):
         """
             Actualiza un ingrediente existente con los valores actuales del formulario. Muestra un diálogo 
             de éxito o error según el resultado de la actualización.
@@ -107,16 +202,25 @@ class Form_Ingrediente(Base_frame):
             self.name.value not in (None, "") and
             self.price not in (None, "") and
             self.radio_gr_kg.value not in (None, "")):
-            print("aca")
             data = Ingredientes(
                 self.name.value,
                 float(self.quantity.value),
                 float(self.price.value),
                 self.radio_gr_kg.value,
                 id=self._id_and_time[0],
-                fecha=self._id_and_time[1]
+                fecha=self._id_and_time[1],
+                bd=self.db
             )
-            result = data.updated_data(tabla_name="ingredientes",id=data.id,data=data.to_dict_update())
+            try:
+                valores = data.to_dict_update()
+            except ValueError:
+                self.call_dialog("Actualizacion fallida", "Seleccione kg o gr", ft.icons.WARNING, "red")
+                return
+            cantidad, kg_gr, precio, precio_x_gramo = self._editado
+            if (str(self.quantity.value), self.radio_gr_kg.value, str(self.price.value)) == (cantidad, kg_gr, precio):
+                # Sin cambios en el precio: se guarda el mismo precio por gramo y no se redondea.
+                valores["precio"] = precio_x_gramo
+            result = await self.adb.run(data.updated_data,tabla_name="ingredientes",id=data.id,data=valores)
             if 200 in result:
                 self.name.value = ""
                 self.quantity.value = ""
@@ -124,7 +228,8 @@ class Form_Ingrediente(Base_frame):
                 self.radio_gr_kg.value = ""
                 self.submit_button.disabled =False 
                 self.btn_update.visible = False
-                self.show_data()
+                self.refresh_controls(self.name, self.quantity, self.price, self.radio_gr_kg, self.submit_button, self.btn_update)
+                await self.show_data()
                 self.call_dialog("Actualizacion", "ha sido satisfactoria", ft.icons.CHECK, "green")
             elif "Error" in result:
                 self.call_dialog("Actualizacion fallida", "No se pudo actualizar el valor", ft.icons.WARNING, "green")
@@ -141,18 +246,25 @@ class Form_Ingrediente(Base_frame):
             self.submit_button.disabled: Deshabilita el botón de guardar al editar.
             self.btn_update.visible: Hace visible el botón de actualización durante la edición.
             self._id_and_time: Almacena el ID y la fecha del ingrediente para su actualización.
+            self._editado: Valores con que se rellenó el formulario.
         """
         self.submit_button.disabled = True
         self.btn_update.visible = True
         self.name.value = r[2]
         self.quantity.value = r[3]
-        self.price.value = r[5]
+        # La tabla guarda el precio por gramo; el campo pide el precio del paquete.
+        try:
+            self.price.value = str(round(Ingredientes.precio_del_paquete(r[5], r[3], r[4]), 6))
+        except (TypeError, ValueError):
+            self.price.value = r[5]
         self.radio_gr_kg.value = r[4]
 
         self._id_and_time = (r[0],r[1])
+        self._editado = (str(self.quantity.value), self.radio_gr_kg.value, str(self.price.value), r[5])
         self.name.focus()
-        self.content.update()
-    def delete(self,r):
+        self.refresh_controls(self.name, self.quantity, self.price, self.radio_gr_kg, self.submit_button, self.btn_update)
+    @traced(cat="ui")
+    async def delete(self,r):
         """
         Elimina un ingrediente basado en los datos proporcionados. Muestra un diálogo de éxito o error 
         según el resultado de la eliminación.
@@ -163,13 +275,13 @@ class Form_Ingrediente(Base_frame):
         Modifica:
             Muestra un diálogo de éxito si la eliminación es satisfactoria o un diálogo de error si ocurre un problema.
         """
-        ing = Ingredientes("",0,0.0,"")
+        ing = Ingredientes("",0,0.0,"",bd=self.db)
         try:
             id = r[0]
             name = r[2]
-            result = ing.delete(id=id,name=name)
+            result = await self.adb.run(ing.delete,id=id,name=name)
             if isinstance(result, bool) and result:
-                self.show_data()
+                await self.show_data()
                 self.call_dialog("Eliminación", "La eliminación ha sido satisfactoria", ft.icons.CHECK, "green")
                 return True
             elif isinstance(result, dict) and "Error" in result:
@@ -177,25 +289,21 @@ class Form_Ingrediente(Base_frame):
             else:
                 self.call_dialog("Error", "Falló la eliminación sin un error específico", ft.icons.WARNING, "red")
         except Exception as e:
-            print("error")
+            logger.exception("no se pudo eliminar el ingrediente %s", r[0])
             self.call_dialog("Error",str(e),ft.icons.WARNING,"red")
 
-    def show_data(self):
+    @traced(cat="ui")
+    async def show_data(self, e=None):
         """
-        Muestra los datos de los ingredientes en la tabla. Obtiene los datos de la base de datos y actualiza 
-        las filas de la tabla.
+        Muestra la página actual de ingredientes en la tabla. Obtiene la página de la base de datos y
+        reconcilia las filas de la tabla: sólo se envían a la página las filas nuevas, eliminadas o modificadas.
 
         Modifica:
             self.table.rows: Actualiza las filas de la tabla con los nuevos datos.
         """
-        self.table.rows.clear()
-        ing = self.db.selection("ingredientes")
+        ing = await self.fetch_page("ingredientes")
         data = [(i,f_u,n,c,p,kg) for (i,f,f_u,n,c,p,kg) in ing ]
-        self.table.rows = [ft.DataRow(
-            cells=[
-                ft.DataCell(ft.Text(cell,width=150,color=ft.colors.BLACK))for cell in row] + [ft.DataCell(ft.Row(controls=[ft.IconButton(icon="create",on_click=lambda e, r=row:self.edit(r)),ft.IconButton(icon=ft.icons.DELETE,icon_color="red",on_click=lambda e, r=row:self.delete(r))],spacing=15))]
-                )for row in data] 
-        self.content.update()
+        self.table.sync(data)
 
     def num_validate(self,event):
         """
@@ -228,7 +336,8 @@ class Form_Ingrediente(Base_frame):
             color (str, optional): El color del icono o del fondo del diálogo. Por defecto es None.
         """
         self.show_dialog(title,content,icon,color)
-    def submit(self):
+    @traced(cat="ui")
+    async def submit(self, e=None):
         """
         Inserta un nuevo ingrediente en la base de datos con los valores actuales del formulario. Muestra un 
         diálogo de éxito o error según el resultado de la inserción.
@@ -248,10 +357,11 @@ class Form_Ingrediente(Base_frame):
                 self.name.value,
                 float(self.quantity.value),
                 float(self.price.value),
-                self.radio_gr_kg.value
+                self.radio_gr_kg.value,
+                bd=self.db
             )
         
-            query = data.insert("ingredientes")
+            query = await self.adb.run(data.insert,"ingredientes")
             if query:
                 self.show_dialog("Insercion Exitosa!", "la data se ha insertado en la base de datos con exito",ft.icons.CHECK,"#90EE90")
             else:
@@ -260,7 +370,8 @@ class Form_Ingrediente(Base_frame):
             self.quantity.value = ""
             self.price.value = ""
             self.radio_gr_kg.value = ""
-            self.show_data()
+            self.refresh_controls(self.name, self.quantity, self.price, self.radio_gr_kg)
+            await self.show_data()
         else:
             self.show_dialog("Error ", "Verifica que has rellenado y seleccionado todos los campos",ft.icons.DANGEROUS, "red")
         
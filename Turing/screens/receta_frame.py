@@ -1,7 +1,16 @@
 import flet as ft 
+import asyncio
+import logging
 from components.base_frame import Base_frame
+from components.keyed_table import Keyed_Table
 from hooks.receta import Receta
-from data.db import PostgresDatabaseManager
+from hooks.exportacion import exportar_costos
+from data.async_db import AsyncDatabaseManager
+from data.db import get_db
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
 class Receta_Frame(Base_frame):
     """
     esta clase recibe de instancia la clase padre Base_frame
@@ -10,19 +19,25 @@ class Receta_Frame(Base_frame):
 
     que pasa en una por parametro a la clase rece de la carpeta hooks y esta realiza la funcionalidad de mediados con la base de datos
     """
-    def __init__(self, ing:list=None,**kwargs):
+    def __init__(self, ing:list=None,db=None,**kwargs):
         super().__init__(**kwargs)
-        self.db = PostgresDatabaseManager("turing")
+        self.db = db if db is not None else get_db()
+        self.adb = AsyncDatabaseManager(self.db)
         self.nombre = ft.TextField(label="Nombre",hint_text="Introduzca el Nombre de la Receta")
         self.cantidad = ft.TextField(label="Cantidad",hint_text="Introduzca el cantidad de la Receta elaborada",on_change=lambda e: self.num_validate(e))
         self.porcentaje_venta = ft.TextField(label="Porcentaje",hint_text="Introduzca el porcentaje de  ganancia",on_change=lambda e: self.num_validate(e))
         self.precio_venta = ft.TextField(label="Precio de Venta",hint_text="Introduzca el precio que lo quieres vender",on_change=lambda e: self.num_validate(e))
         self.unidades_x_receta = ft.TextField(label="Unidades arrojadas x receta",hint_text="Introduzca la cantidad que arroja la receta echa",on_change=lambda e: self.num_validate(e))
         self.cant_und_paquete = ft.TextField(label="Cuantas unidades para el paquete",hint_text="Introduzca la cantidad de unidades para el paquete",on_change=lambda e: self.num_validate(e))
-        self.submit = ft.ElevatedButton(text="Guardar",on_click=lambda e:self.save())
-        self.show_Data = ft.ElevatedButton(text="Mostrar Recetas", on_click=lambda e: self.show_data())
+        self.submit = ft.ElevatedButton(text="Guardar",on_click=self.save)
+        self.show_Data = ft.ElevatedButton(text="Mostrar Recetas", on_click=self.show_data)
         self.precio_sugerido_venta = ft.Text(size=25,color=ft.colors.GREEN)
-        self.table = ft.DataTable(
+        self.export_picker = ft.FilePicker(on_result=self.exportar)
+        self.btn_exportar = ft.ElevatedButton(text="Exportar costos",icon=ft.icons.DOWNLOAD,on_click=self.pick_export)
+        self.export_text = ft.Text(visible=False)
+        self.overlay_controls.append(self.export_picker)
+        self.table = Keyed_Table(
+            actions=[("create",None,self.edit),(ft.icons.DELETE,"red",self.delete)],
             columns=[
                 ft.DataColumn(label=ft.Text("id",color=ft.colors.BLACK)),
                 ft.DataColumn(label=ft.Text("fecha",color=ft.colors.BLACK)),
@@ -57,6 +72,8 @@ class Receta_Frame(Base_frame):
                         controls=[
                             self.submit,
                             self.show_Data,
+                            self.btn_exportar,
+                            self.export_text,
                         ]
                     ),ft.Column(
                         controls=[
@@ -75,7 +92,8 @@ class Receta_Frame(Base_frame):
                 ),
                 margin=ft.margin.all(20),
                 padding=ft.padding.all(40),
-                )
+                ),
+                self.pagination_controls()
                 ]
             )
         )
@@ -84,7 +102,8 @@ class Receta_Frame(Base_frame):
         self.content.controls.append(self.form)
 
    
-    def save(self):
+    @traced(cat="ui")
+    async def save(self, e=None):
         if (self.porcentaje_venta.value not in (None, "") and
             self.nombre.value not in (None, "") and
             self.cantidad.value not in (None, "") and
@@ -92,15 +111,60 @@ class Receta_Frame(Base_frame):
             self.unidades_x_receta.value not in (None,"") and
             self.cant_und_paquete.value not in (None,"")
             ):
-            r = Receta(self.porcentaje_venta.value,self.nombre.value,self.cantidad.value,self.precio_venta.value,self.unidades_x_receta.value,self.cant_und_paquete.value)
+            r = Receta(self.porcentaje_venta.value,self.nombre.value,self.cantidad.value,self.precio_venta.value,self.unidades_x_receta.value,self.cant_und_paquete.value,db=self.db)
         else:
-            print("aca")
+            logger.debug("receta sin guardar: faltan valores en el formulario")
             self.show_dialog("Error Guardando", "Verifica que has rellenado todos los valores",ft.icons.DANGEROUS, "red")
-        if r.save_receta():
+            return
+        if await self.adb.run(r.save_receta):
             self.show_dialog("Insercion Exitosa!", "la data se ha insertado en la base de datos con exito",ft.icons.CHECK,"#90EE90")
         else:
             self.show_dialog("Error insertando", "Verifica la data que has ingresado e intentalo de nuevo",ft.icons.DANGEROUS, "red")
 
+    def pick_export(self, e=None):
+        """
+        Abre el selector para elegir dónde guardar el reporte de costos (.csv, .jsonl o .parquet).
+        """
+        self.export_picker.save_file(
+            dialog_title="Exportar costos",
+            file_name="costos.csv",
+            allowed_extensions=["csv", "jsonl", "parquet"]
+        )
+
+    @traced(cat="ui")
+    async def exportar(self, e):
+        """
+        Exporta el reporte de costos de todas las recetas al archivo elegido. Las filas se escriben a
+        medida que llegan del servidor, en un hilo, y el avance se muestra junto al botón.
+
+        Args:
+            e (ft.FilePickerResultEvent): Resultado del selector; `e.path` es el archivo de salida.
+        """
+        if not e.path:
+            return
+        loop = asyncio.get_running_loop()
+
+        def progreso(escritas):
+            loop.call_soon_threadsafe(self._avance_exportacion, escritas)
+
+        self.btn_exportar.disabled = True
+        self.export_text.visible = True
+        self._avance_exportacion(0)
+        self.refresh_controls(self.btn_exportar)
+        try:
+            filas = await self.adb.run(exportar_costos, e.path, db=self.db, progreso=progreso)
+            self.call_dialog("Exportacion", f"{filas} filas exportadas a {e.path}", ft.icons.CHECK, "green")
+        except Exception as ex:
+            self.call_dialog("Error", str(ex), ft.icons.WARNING, "red")
+        finally:
+            self.btn_exportar.disabled = False
+            self.export_text.visible = False
+            self.refresh_controls(self.btn_exportar, self.export_text)
+
+    def _avance_exportacion(self, escritas):
+        self.export_text.value = f"{escritas} filas"
+        self.refresh_controls(self.export_text)
+
     def call_dialog(self,title,content,icon=None, color=None):
         """
             Muestra un diálogo con un título, contenido, y opciones opcionales de icono y color.
@@ -131,14 +195,15 @@ class Receta_Frame(Base_frame):
         filtered_value = "".join(c for c in n_value if c.isdigit() or c in ".,")
         event.control.value = filtered_value
         event.control.update()
-    def edit(self):
+    def edit(self,r=None):
         """
                 Función placeholder para la edición de datos. Actualmente no realiza ninguna acción.
 
         """
         pass
 
-    def delete(self,r):
+    @traced(cat="ui")
+    async def delete(self,r):
         """
             Elimina una entrada de datos basada en la información proporcionada en el parámetro.
 
@@ -150,40 +215,37 @@ class Receta_Frame(Base_frame):
                 Muestra un diálogo de éxito si la eliminación es satisfactoria, o un diálogo de error si ocurre un problema.
 
         """
-        data = Receta.from_data(r)
-        result = data.delete(id=r[0],name=r[2])
+        data = Receta.from_data(r,db=self.db)
+        result = await self.adb.run(data.delete,id=r[0],name=r[2])
         if result:
-                self.show_data()
+                await self.show_data()
                 self.call_dialog("Eliminación", "La eliminación ha sido satisfactoria", ft.icons.CHECK, "green")
                 return True
         elif isinstance(result, dict) and "Error" in result:
             self.call_dialog("Error", result["Error"], ft.icons.WARNING, "red")
         else:
             self.call_dialog("Error", "Falló la eliminación sin un error específico", ft.icons.WARNING, "red")
-    def show_data(self):
+    @traced(cat="ui")
+    async def show_data(self, e=None):
         """
-            Muestra y actualiza los datos en una tabla y muestra un resumen del costo sugerido de venta de cada ítem.
+            Muestra y actualiza la página actual de recetas en una tabla y muestra un resumen del costo sugerido de venta de cada ítem.
 
             Modifica:
-                self.table.rows: Actualiza las filas de la tabla con los nuevos datos.
+                self.table.rows: Reconcilia las filas de la tabla con los nuevos datos.
                 self.precio_sugerido_venta.value: Actualiza el texto del costo sugerido de venta.
-                self.content.update(): Actualiza el contenido para reflejar los cambios en la interfaz de usuario.
 
         """
-        self.table.rows.clear()
-        data = self.db.selection("receta")
+        data = await self.fetch_page("receta")
         new_data = [(i,f_u,n,p_v,p,und,c_r,c_p,c) for (i,f,f_u,n,p_v,p,und,c_r,c_p,c) in data ]
+        # El precio sugerido llega calculado desde el servidor, sin traer las líneas de cada receta.
+        costos = await self.adb.costo_recetas([d[0] for d in new_data]) if new_data else []
         nombre_precio = {}
-        for datos in new_data:
-            costo = ((float(datos[3]) /100 )* float(datos[-1]))+ float(datos[-1])
-            if datos[2] not in nombre_precio:
-                nombre_precio[datos[2]]= (costo,)
+        for (_, nombre, lineas, *_, sugerido) in costos:
+            if nombre not in nombre_precio and lineas and sugerido is not None:
+                nombre_precio[nombre]= (sugerido,)
         
         self.precio_sugerido_venta.value = "\n".join([f"{key.capitalize()} tiene un costo de: {v[0]:.3f}"for key,v in nombre_precio.items()]) +"\n el costo se le ha sumado el porcentaje de ganancia que haz ingresado"
         
-        self.table.rows = [ft.DataRow(
-            cells=[
-                ft.DataCell(ft.Text(cell,width=150,color=ft.colors.BLACK))for cell in row] + [ft.DataCell(ft.Row(controls=[ft.IconButton(icon="create",on_click=lambda e, r=row:self.edit(r)),ft.IconButton(icon=ft.icons.DELETE,icon_color="red",on_click=lambda e, r=row:self.delete(r))],spacing=15))] 
-                )for row in new_data] 
-        self.content.update()
+        self.table.sync(new_data)
+        self.refresh_controls(self.precio_sugerido_venta)
 
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Las pruebas importan los paquetes de la aplicación (`data`, `hooks`, `screens`...) desde Turing.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.sqlite_db import SqliteDatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    Gestor SQLite con el esquema migrado en un archivo temporal.
+    """
+    manager = SqliteDatabaseManager("turing", str(tmp_path / "turing.sqlite3"))
+    manager.init_data()
+    yield manager
+    manager.close()
@@ -0,0 +1,53 @@
+import asyncio
+
+from data.async_db import AsyncDatabaseManager
+from data.backend import OPERATIONS
+
+
+def test_cubre_todas_las_operaciones():
+    faltan = [op for op in OPERATIONS + ("diagnostics",) if not hasattr(AsyncDatabaseManager, op)]
+    assert faltan == []
+
+
+def ingredientes(n):
+    return ((f"ing{i:04d}", 1.0, "gr", i / 1000) for i in range(n))
+
+
+def test_bulk_upsert_y_stream(db):
+    adb = AsyncDatabaseManager(db)
+
+    async def probar():
+        _, guardadas = await adb.bulk_upsert("ingredientes", ("nombre", "cantidad", "kg_gr", "precio"), ingredientes(1200))
+        nombres = [row[3] async for row in adb.iter_selection("ingredientes", itersize=100)]
+        filas = [row async for row in adb.stream("SELECT nombre FROM ingredientes WHERE precio > %s", [1.0], itersize=50)]
+        return guardadas, nombres, filas
+
+    guardadas, nombres, filas = asyncio.run(probar())
+    assert guardadas == 1200
+    assert nombres == [f"ing{i:04d}" for i in range(1200)]
+    assert len(filas) == 199
+
+
+def test_cortar_el_recorrido_cierra_el_generador(db):
+    adb = AsyncDatabaseManager(db)
+    db.bulk_upsert("ingredientes", ("nombre", "cantidad", "kg_gr", "precio"), ingredientes(1000))
+    cerrado = []
+
+    def generador():
+        try:
+            yield from db.iter_selection("ingredientes", itersize=10)
+        finally:
+            cerrado.append(True)
+
+    async def probar():
+        filas = adb.iterate(generador, batch=10)
+        primeras = []
+        async for row in filas:
+            primeras.append(row)
+            if len(primeras) == 25:
+                break
+        await filas.aclose()
+        return primeras
+
+    assert len(asyncio.run(probar())) == 25
+    assert cerrado == [True]
@@ -0,0 +1,66 @@
+import pytest
+
+from hooks.cant_ing_receta import Cant_ing_x_receta
+from hooks.costeo import Costeo_Recetas, propagar_precio
+from hooks.importacion import importar_ingredientes
+
+
+@pytest.fixture
+def recetas(db):
+    db.insert("ingredientes", [
+        {"nombre": "harina", "cantidad": 1000.0, "kg_gr": "gr", "precio": 0.002},
+        {"nombre": "panela", "cantidad": 1000.0, "kg_gr": "gr", "precio": 0.004},
+        {"nombre": "azucar", "cantidad": 1000.0, "kg_gr": "gr", "precio": 0.003},
+    ])
+    db.insert("receta", [
+        {"nombre": n, "porcentaje_venta": 30, "precio_venta": 1, "unidades_x_receta": u,
+         "cantidad_Receta": 1, "cant_x_paquete": 2}
+        for n, u in [("pan", 10), ("torta", 4), ("vacia", 5)]
+    ])
+    ing = db.selection("ingredientes")
+    for id_receta, cantidades in [(1, (100, 200, 300)), (2, (50, 0, 25))]:
+        lineas = [{"id": i[0], "id_receta": id_receta, "nombre": i[3], "precio": i[-1], "cantidad": c}
+                  for i, c in zip(ing, cantidades)]
+        assert Cant_ing_x_receta(lineas, db=db).save_with_cost(id_receta)[0]
+    return ing
+
+
+def costos(db):
+    return {r[0]: r[-1] for r in db.selection("receta")}
+
+
+def test_calcular_coincide_con_el_costo_del_servidor(db, recetas):
+    resultado = Costeo_Recetas(db).cargar().calcular()
+    servidor = {c[0]: c for c in db.costo_recetas()}
+
+    assert list(resultado["id"]) == [1, 2, 3]
+    assert list(resultado["lineas"]) == [3, 3, 0]
+    for i, id_receta in enumerate(resultado["id"]):
+        (_, _, lineas, ingredientes, _, unitario, paquete, _) = servidor[id_receta]
+        if not lineas:
+            continue
+        assert resultado["costo_ingredientes"][i] == pytest.approx(ingredientes)
+        assert resultado["costo_unitario"][i] == pytest.approx(unitario)
+        assert resultado["costo_paquete"][i] == pytest.approx(paquete)
+
+
+def test_propagar_precio_recostea_solo_las_recetas_afectadas(db, recetas):
+    antes = costos(db)
+    db.update("ingredientes", "3", None, {"precio": 0.03})
+
+    assert propagar_precio([3], db=db) == 2
+    despues = costos(db)
+    assert despues[1] > antes[1] and despues[2] > antes[2]
+    assert despues[3] is None
+
+
+def test_importar_lista_recostea_con_el_motor(db, recetas, tmp_path):
+    antes = costos(db)
+    ruta = tmp_path / "precios.csv"
+    ruta.write_text("nombre,cantidad,kg_gr,precio\nharina,1,kg,20\n", encoding="utf-8")
+
+    resultado = importar_ingredientes(str(ruta), db=db)
+    assert resultado["guardadas"] == 1 and resultado["recetas"] == 2
+    esperado = Costeo_Recetas(db).cargar().calcular()
+    assert costos(db)[1] == pytest.approx(esperado["costo_paquete"][0])
+    assert costos(db)[1] > antes[1]
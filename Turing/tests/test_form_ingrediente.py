@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from hooks.cant_ing_receta import Cant_ing_x_receta
+from hooks.ingrediente import Ingredientes
+from screens.form_ingrediente import Form_Ingrediente
+
+
+@pytest.fixture
+def receta(db):
+    # Harina: 1 kg a 10, que se guarda como 0.01 por gramo; la receta usa 500 g.
+    assert Ingredientes("harina", 1, 10, "Kg", bd=db).insert("ingredientes")
+    db.insert("receta", [{"nombre": "pan", "porcentaje_venta": 30, "precio_venta": 1,
+                          "unidades_x_receta": 10, "cantidad_Receta": 1, "cant_x_paquete": 2}])
+    (ing,) = db.selection("ingredientes")
+    lineas = Cant_ing_x_receta([{"id": ing[0], "id_receta": 1, "nombre": "harina", "precio": ing[-1], "cantidad": 500}], db=db)
+    assert lineas.save_with_cost(1)[0]
+    return ing
+
+
+def fila(db):
+    # Fila de la tabla del formulario: (id, updated_at, nombre, cantidad, kg_gr, precio).
+    (i, _, f_u, n, c, kg, p) = db.selection("ingredientes")[0]
+    return (i, f_u, n, c, kg, p)
+
+
+def costo(db):
+    return db.selection("receta")[0][-1]
+
+
+def formulario(db, dialogos):
+    form = Form_Ingrediente(db=db)
+    # Sin página montada: los diálogos se registran y el foco no se envía.
+    form.call_dialog = lambda title, content, *args: dialogos.append((title, content))
+    form.name.focus = lambda: None
+    return form
+
+
+def test_edit_muestra_el_precio_del_paquete(db, receta):
+    form = formulario(db, [])
+    form.edit(fila(db))
+    assert float(form.price.value) == pytest.approx(10)
+    assert form.radio_gr_kg.value == "Kg"
+
+
+def test_guardar_sin_cambios_no_altera_precio_ni_costo(db, receta):
+    dialogos = []
+    form = formulario(db, dialogos)
+    precio, costo_antes = fila(db)[-1], costo(db)
+
+    for _ in range(2):
+        form.edit(fila(db))
+        asyncio.run(form.updated())
+
+    assert dialogos[-1][0] == "Actualizacion"
+    assert fila(db)[-1] == precio
+    assert costo(db) == costo_antes
+
+
+def test_cambiar_el_precio_del_paquete_recalcula_la_receta(db, receta):
+    form = formulario(db, [])
+    costo_antes = costo(db)
+    form.edit(fila(db))
+    form.price.value = "20"
+    asyncio.run(form.updated())
+
+    assert fila(db)[-1] == pytest.approx(0.02)
+    assert costo(db) > costo_antes
@@ -0,0 +1,45 @@
+import flet as ft
+
+from components.keyed_table import Keyed_Table
+
+
+def tabla(**kwargs):
+    return Keyed_Table(columns=[ft.DataColumn(ft.Text("id")), ft.DataColumn(ft.Text("nombre"))], **kwargs)
+
+
+def textos(t):
+    return [row.cells[0].content.value for row in t.rows]
+
+
+def test_no_envia_key_ni_offset_al_cliente():
+    t = tabla(window=2)
+    t.sync([(i, f"n{i}") for i in range(5)])
+    t.scroll(2)
+
+    # Propiedades de la tabla tal como se serializan para el cliente de Flet.
+    attrs = t._build_add_commands()[0].attrs
+    assert "key" not in attrs
+    assert "offset" not in attrs
+
+
+def test_scroll_cambia_las_filas_montadas():
+    t = tabla(window=2)
+    t.sync([(i, f"n{i}") for i in range(5)])
+    assert textos(t) == [0, 1]
+
+    t.scroll(2)
+    assert textos(t) == [2, 3]
+    t.scroll(10)
+    assert textos(t) == [3, 4]
+    t.scroll(-10)
+    assert textos(t) == [0, 1]
+
+
+def test_sync_reconcilia_por_clave():
+    t = tabla(row_key=lambda row: row[1])
+    t.sync([(1, "a"), (2, "b")])
+    fila_b = t.rows[1]
+
+    t.sync([(3, "b"), (4, "c")])
+    assert t.rows[0] is fila_b
+    assert textos(t) == [3, 4]
@@ -1,5 +1,9 @@
+import logging
+
 import flet as ft
 
+logger = logging.getLogger(__name__)
+
 class Dialog(ft.Column):
     """ esta clase es un alertDialog de flet 
     recibe el TITULO EL CONTENIDO DE TEXTO un ICONO y el COLOR  de este estas dos ultimas variables por defecto ya vienen con el color azul y el icono de informacion
@@ -37,12 +41,12 @@ class Dialog(ft.Column):
     def close_d(self):
         # Ocultar el diálogo
         if self.dialog:
-            print("cerrando el dialog")
+            logger.debug("cerrando el dialog")
             self.dialog.visible = False
             self.update()
             self.dialog = None
         else:
-            print("No hay diálogo para cerrar.")
+            logger.debug("No hay diálogo para cerrar.")
         self.update()
     def show(self):
         if self.dialog is None:
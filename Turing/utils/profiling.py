@@ -0,0 +1,296 @@
+import inspect
+import itertools
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import wraps
+
+from dotenv import load_dotenv
+
+# La configuración se lee al importar el módulo, antes de que otro módulo cargue el .env.
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Métodos de los marcos que no son manejadores de eventos aunque Flet los llame.
+_NO_HANDLERS = {"build", "did_mount", "will_unmount", "before_update", "is_isolated"}
+# Funciones en las que un hilo está ocioso (esperando trabajo o eventos): sus muestras se descartan.
+_IDLE = {
+    ("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get"),
+    ("thread.py", "_worker"), ("threading.py", "_wait_for_tstate_lock"),
+}
+_UNSAFE = re.compile(r"[^\w.-]+")
+# Manejador perfilado en curso del contexto; los anidados se cuentan sólo en el exterior.
+_current = ContextVar("profiling_session", default=None)
+
+
+class _Session:
+    # Muestras tomadas mientras corre una llamada a un manejador: {(hilo, pila): muestras}.
+    __slots__ = ("name", "start", "stacks", "samples")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+
+
+class _SampledStats:
+    # Adaptador que `pstats.Stats` acepta como si fuera un perfilador (`create_stats` y `stats`).
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Profiler:
+    """
+    Perfilador por muestreo de los manejadores de eventos, para medir sesiones reales sin tocar el
+    código. Mientras corre un manejador perfilado, un hilo aparte toma cada `interval_ms` la pila
+    de todos los hilos ocupados (el bucle de eventos y los hilos donde `AsyncDatabaseManager`
+    ejecuta las consultas) y la atribuye al manejador. Al terminar la llamada escribe en
+    `directory` su perfil en formato pstats (`python -m pstats archivo.prof`, snakeviz) y sus pilas
+    colapsadas (`flamegraph.pl`, speedscope), y guarda en memoria el tiempo propio por función de
+    las últimas `history` llamadas, del que `top()` saca las funciones más costosas.
+
+    Se usa muestreo y no cProfile porque los manejadores asíncronos se intercalan en el mismo hilo
+    y su trabajo de base de datos corre en otros; además su costo no depende de cuántas funciones
+    se llamen. Las llamadas más cortas que el intervalo pueden no tener muestras y no se escriben;
+    si corren varios manejadores a la vez, cada uno recibe las muestras de todos.
+
+    Atributos:
+        enabled (bool): Si los manejadores se perfilan.
+        directory (str or None): Carpeta de los perfiles.
+        interval (float): Segundos entre muestras.
+        top_size (int): Funciones que devuelve `top()` por defecto.
+    """
+    def __init__(self, directory=None, interval_ms=5.0, top_size=20, history=50):
+        self.enabled = False
+        self.directory = None
+        self.interval = interval_ms / 1000
+        self.top_size = top_size
+        self._recent = deque(maxlen=history)
+        self._active = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._files = itertools.count(1)
+        self._keys = {}
+        if directory:
+            self.enable(directory)
+
+    def enable(self, directory):
+        """
+        Activa el perfilado y arranca el hilo de muestreo.
+
+        Args:
+            directory (str): Carpeta donde se escriben los perfiles; se crea si no existe.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.enabled = True
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        logger.info("perfilado de manejadores activo en %s", directory)
+
+    def disable(self):
+        """
+        Desactiva el perfilado; las llamadas en curso se terminan de registrar.
+        """
+        self.enabled = False
+
+    def profiled(self, name=None):
+        """
+        Decorador que perfila cada llamada a la función (o corrutina) si el perfilado está activo.
+
+        Args:
+            name (str or None): Nombre del perfil; por defecto el nombre calificado de la función.
+
+        Returns:
+            callable: Decorador.
+        """
+        def decorator(func):
+            label = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @wraps(func)
+                async def coroutine(*args, **kwargs):
+                    if not self.enabled or _current.get() is not None:
+                        return await func(*args, **kwargs)
+                    session, token = self._begin(label)
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self._end(session, token)
+                return coroutine
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or _current.get() is not None:
+                    return func(*args, **kwargs)
+                session, token = self._begin(label)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._end(session, token)
+            return wrapper
+        return decorator
+
+    def wrap_handlers(self, cls):
+        """
+        Perfila los manejadores de eventos definidos en una clase de marco: sus corrutinas públicas
+        y los métodos públicos que reciben el evento (`e` o `event`).
+
+        Args:
+            cls (type): Clase de marco; se modifica en el lugar.
+        """
+        for attr, func in list(cls.__dict__.items()):
+            if attr.startswith("_") or attr in _NO_HANDLERS or not inspect.isfunction(func):
+                continue
+            if inspect.iscoroutinefunction(func) or {"e", "event"} & set(inspect.signature(func).parameters):
+                setattr(cls, attr, self.profiled(f"{cls.__name__}.{attr}")(func))
+
+    def _begin(self, label):
+        session = _Session(label)
+        token = _current.set(session)
+        with self._lock:
+            self._active.append(session)
+        self._wake.set()
+        return session, token
+
+    def _end(self, session, token):
+        _current.reset(token)
+        with self._lock:
+            self._active.remove(session)
+        if session.samples:
+            try:
+                self._save(session, time.perf_counter() - session.start)
+            except Exception:
+                logger.exception("no se pudo guardar el perfil de %s", session.name)
+
+    def _run(self):
+        # Hilo de muestreo: duerme mientras no haya manejadores en curso.
+        while True:
+            with self._lock:
+                busy = bool(self._active)
+            if not busy:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            self._sample()
+
+    def _key(self, code):
+        key = self._keys.get(code)
+        if key is None:
+            key = self._keys[code] = (code.co_filename, code.co_firstlineno, code.co_name)
+        return key
+
+    def _sample(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._key(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            stacks.append((names.get(ident, str(ident)), tuple(stack)))
+        if not stacks:
+            return
+        with self._lock:
+            for session in self._active:
+                session.samples += 1
+                session.stacks.update(stacks)
+
+    def _stats(self, session):
+        # Arma la tabla de pstats con las muestras: cada muestra vale `interval` segundos de tiempo
+        # propio para la hoja de la pila y de tiempo acumulado para cada función de la pila; las
+        # "llamadas" son muestras.
+        stats = {}
+        for (_, stack), n in session.stacks.items():
+            seconds = n * self.interval
+            seen = set()
+            for i, key in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.get(key) or (0, 0, 0.0, 0.0, {})
+                leaf = i == len(stack) - 1
+                if key not in seen:
+                    seen.add(key)
+                    ct += seconds
+                if leaf:
+                    tt += seconds
+                if i:
+                    c_cc, c_nc, c_tt, c_ct = callers.get(stack[i - 1], (0, 0, 0.0, 0.0))
+                    callers[stack[i - 1]] = (c_cc + n, c_nc + n, c_tt + (seconds if leaf else 0.0), c_ct + seconds)
+                stats[key] = (cc + n, nc + n, tt, ct, callers)
+        return stats
+
+    @staticmethod
+    def _label(key):
+        filename, line, name = key
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def _save(self, session, seconds):
+        stats = self._stats(session)
+        base = os.path.join(
+            self.directory,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._files):04d}-{_UNSAFE.sub('_', session.name)}"
+        )
+        pstats.Stats(_SampledStats(stats)).dump_stats(base + ".prof")
+        with open(base + ".collapsed", "w", encoding="utf-8") as archivo:
+            for (thread, stack), n in session.stacks.most_common():
+                archivo.write(";".join([thread] + [self._label(k) for k in stack]) + f" {n}\n")
+        self._recent.append((
+            session.name,
+            seconds,
+            {self._label(k): (tt * 1000, ct * 1000) for k, (_, _, tt, ct, _) in stats.items()},
+        ))
+        logger.info("perfil de %s (%.0f ms, %d muestras) en %s.prof", session.name, seconds * 1000, session.samples, base)
+
+    def top(self, n=None):
+        """
+        Funciones más costosas de las últimas llamadas perfiladas, por tiempo propio.
+
+        Args:
+            n (int or None): Cuántas; por defecto `top_size`.
+
+        Returns:
+            list: Diccionarios con 'function', 'self_ms' y 'total_ms' (estimados por muestreo) y
+                'handlers' (manejadores en los que aparece).
+        """
+        totals = {}
+        for name, _, functions in list(self._recent):
+            for label, (self_ms, total_ms) in functions.items():
+                entry = totals.setdefault(label, {"function": label, "self_ms": 0.0, "total_ms": 0.0, "handlers": set()})
+                entry["self_ms"] += self_ms
+                entry["total_ms"] += total_ms
+                entry["handlers"].add(name)
+        ranking = sorted(totals.values(), key=lambda e: e["self_ms"], reverse=True)[:n or self.top_size]
+        for entry in ranking:
+            entry["handlers"] = sorted(entry["handlers"])
+        return ranking
+
+
+# Perfilador del proceso. Se activa con PROFILE_DIR (carpeta de los perfiles) o con
+# `python main.py --profile CARPETA`; PROFILE_INTERVAL_MS ajusta el muestreo, PROFILE_TOP el
+# largo de `top()` y PROFILE_HISTORY cuántas llamadas recientes se recuerdan.
+profiler = Profiler(
+    directory=os.getenv("PROFILE_DIR") or None,
+    interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+    top_size=int(os.getenv("PROFILE_TOP", "20")),
+    history=int(os.getenv("PROFILE_HISTORY", "50")),
+)
+profiled = profiler.profiled
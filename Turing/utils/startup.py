@@ -0,0 +1,68 @@
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Tiempos del arranque de la aplicación. Las etapas (`stage`) miden cuánto dura cada paso,
+    aunque corran en paralelo (la conexión se hace en segundo plano mientras se pinta la
+    ventana); los hitos (`milestone`) marcan cuánto pasó desde el inicio del proceso hasta un
+    momento dado. `report` lo emite en una línea en el logger `utils.startup`.
+
+    Atributos:
+        start (float): Inicio, en segundos de `time.perf_counter`.
+        stages (dict): {etapa: milisegundos}.
+        milestones (dict): {hito: milisegundos desde el inicio}.
+    """
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.stages = {}
+        self.milestones = {}
+        self._reported = False
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Gestor de contexto que mide el bloque como la etapa `name`.
+
+        Args:
+            name (str): Nombre de la etapa.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    def milestone(self, name):
+        """
+        Registra el hito `name` en el momento actual.
+
+        Args:
+            name (str): Nombre del hito.
+        """
+        self.milestones[name] = (time.perf_counter() - self.start) * 1000
+
+    def report(self):
+        """
+        Emite el reporte del arranque la primera vez que se llama.
+
+        Returns:
+            str or None: El reporte, o None si ya se había emitido.
+        """
+        if self._reported:
+            return None
+        self._reported = True
+        etapas = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.stages.items())
+        hitos = ", ".join(f"{name} a los {ms:.0f} ms" for name, ms in self.milestones.items())
+        texto = f"arranque: {etapas}; {hitos}"
+        logger.info(texto)
+        return texto
+
+
+# Tiempos del arranque del proceso; se mide desde que se importa este módulo, lo primero que
+# hace main.py.
+startup = StartupTimer()
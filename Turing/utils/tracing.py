@@ -0,0 +1,208 @@
+import atexit
+import inspect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from dotenv import load_dotenv
+
+# La configuración se lee al importar el módulo, antes de que otro módulo cargue el .env.
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tramo en curso del contexto: cada tarea de asyncio tiene su copia y `asyncio.to_thread` la
+# hereda, así que los tramos abiertos en un hilo del ejecutor cuelgan del manejador que lo lanzó.
+_current = ContextVar("tracing_span", default=None)
+
+
+class Span:
+    """
+    Tramo de una traza: un intervalo con nombre dentro de una interacción.
+
+    Atributos:
+        name (str): Nombre del tramo ("Receta_Frame.save", "selection receta", "sql"...).
+        cat (str): Capa a la que pertenece: "ui", "flet", "hook", "db" o "sql".
+        id (int): Identificador del tramo.
+        root (Span): Tramo raíz de la traza; junta los eventos de sus descendientes.
+        parent (Span or None): Tramo que lo contiene.
+        start (int): Inicio, en nanosegundos de `time.perf_counter_ns`.
+        args (dict): Datos adicionales que se muestran al seleccionar el tramo.
+        events (list): Eventos terminados de la traza (sólo en el tramo raíz).
+    """
+    __slots__ = ("name", "cat", "id", "root", "parent", "start", "args", "events")
+
+    def __init__(self, name, cat, id, parent, start, args):
+        self.name = name
+        self.cat = cat
+        self.id = id
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.start = start
+        self.args = args
+        self.events = [] if parent is None else None
+
+
+class Tracer:
+    """
+    Trazas de extremo a extremo, de un evento de Flet a las sentencias SQL que provoca. Un
+    manejador de la interfaz abre el tramo raíz y los hooks, las operaciones del gestor y cada
+    sentencia abren tramos hijos; al cerrarse la raíz la traza completa se agrega a `path` en el
+    formato de eventos de Chrome (arreglo JSON), que se abre como gráfico de llamas en
+    chrome://tracing, Perfetto o speedscope. Cada traza ocupa su propia fila (tid) para que las
+    interacciones concurrentes no se mezclen.
+
+    Desactivado no registra nada y cada tramo cuesta una comparación.
+
+    Atributos:
+        path (str or None): Archivo de salida; sin él el trazado está desactivado.
+        min_ms (float): Duración mínima del tramo raíz para escribir la traza.
+        enabled (bool): Si se registran tramos.
+    """
+    def __init__(self, path=None, min_ms=0.0):
+        self.path = path
+        self.min_ms = min_ms
+        self.enabled = bool(path)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = os.getpid()
+
+    @contextmanager
+    def span(self, name, cat="app", **args):
+        """
+        Gestor de contexto que registra el bloque como un tramo hijo del tramo en curso, o como
+        raíz de una traza nueva si no hay ninguno. Si el bloque lanza una excepción, el tramo la
+        guarda en 'error'.
+
+        Args:
+            name (str): Nombre del tramo.
+            cat (str): Capa a la que pertenece.
+            **args: Datos adicionales del tramo.
+
+        Yields:
+            Span or None: El tramo abierto; None si el trazado está desactivado.
+        """
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, cat, next(self._ids), _current.get(), time.perf_counter_ns(), args)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = repr(e)
+            raise
+        finally:
+            _current.reset(token)
+            self._finish(span, time.perf_counter_ns())
+
+    def complete(self, name, cat, seconds, **args):
+        """
+        Registra un tramo ya terminado que acaba ahora y duró `seconds`, como hijo del tramo en
+        curso. Lo usan las sentencias SQL, que se miden después de ejecutarse.
+
+        Args:
+            name (str): Nombre del tramo.
+            cat (str): Capa a la que pertenece.
+            seconds (float): Duración.
+            **args: Datos adicionales del tramo.
+        """
+        if not self.enabled:
+            return
+        end = time.perf_counter_ns()
+        span = Span(name, cat, next(self._ids), _current.get(), end - int(seconds * 1e9), args)
+        self._finish(span, end)
+
+    def _finish(self, span, end):
+        args = span.args
+        args["thread"] = threading.current_thread().name
+        event = {
+            "name": span.name,
+            "cat": span.cat,
+            "ph": "X",
+            "ts": span.start / 1000,
+            "dur": (end - span.start) / 1000,
+            "pid": self._pid,
+            "tid": span.root.id,
+            "args": args,
+        }
+        root = span.root
+        if span is not root:
+            # Los hijos pueden terminar en otros hilos; list.append es atómico.
+            root.events.append(event)
+            return
+        if (end - span.start) / 1e6 < self.min_ms:
+            return
+        root.events.append(event)
+        self._write(root.events)
+
+    def _write(self, events):
+        # Formato de arreglo JSON de Chrome: el corchete de cierre es opcional, así que cada traza
+        # se agrega al final sin reescribir el archivo y lo escrito sigue siendo válido si el
+        # proceso termina de golpe.
+        lines = "".join(json.dumps(e, default=str) + ",\n" for e in events)
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "w", encoding="utf-8")
+                    self._file.write("[\n")
+                self._file.write(lines)
+                self._file.flush()
+            except OSError:
+                logger.exception("no se pudo escribir la traza en %s", self.path)
+                self.enabled = False
+
+    def close(self):
+        """
+        Cierra el archivo de trazas.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def traced(self, name=None, cat="app"):
+        """
+        Decorador que registra cada llamada a la función como un tramo. Sirve para funciones,
+        corrutinas (manejadores de Flet) y métodos, también debajo de `property`.
+
+        Args:
+            name (str or None): Nombre del tramo; por defecto el nombre calificado de la función.
+            cat (str): Capa a la que pertenece.
+
+        Returns:
+            callable: Decorador.
+        """
+        def decorator(func):
+            label = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @wraps(func)
+                async def coroutine(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with self.span(label, cat):
+                        return await func(*args, **kwargs)
+                return coroutine
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(label, cat):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+# Trazador del proceso. Se activa con TRACE_FILE (archivo de salida); TRACE_MIN_MS descarta las
+# interacciones más rápidas que ese umbral.
+tracer = Tracer(path=os.getenv("TRACE_FILE") or None, min_ms=float(os.getenv("TRACE_MIN_MS", "0")))
+traced = tracer.traced
+atexit.register(tracer.close)